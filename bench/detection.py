@@ -0,0 +1,74 @@
+"""
+Compares the detection strategies of `find_matches` by time and by the pages found.
+
+Usage:
+    python -m bench.detection [FILE ...] [--repeat N]
+
+Defaults to the PDFs in `test/in` and synthetic invoices with frequent and rare matches.
+Both strategies must find the same pages; a mismatch is reported per file.
+"""
+
+import argparse
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from bench.invoices import InvoiceSpec, generate_invoice
+from src.core.pdf_service import DETECTION_STRATEGIES, find_matches, open_pdf_stream
+
+DEFAULT_INPUT_DIR = Path(__file__).parent.parent.joinpath("test", "in")
+SYNTHETIC_SPECS = {
+    "typical": InvoiceSpec(pages=25),
+    "rare-matches": InvoiceSpec(pages=100, match_frequency=0.002),
+    "no-matches": InvoiceSpec(pages=100, match_frequency=0.0),
+}
+
+
+def bench_detection(data: bytes, repeat: int):
+    """
+    Returns the median detection time and the pages found by every strategy, for the
+    given PDF. Each run opens the document afresh, so no page text is cached.
+    """
+    results = {}
+    for strategy in DETECTION_STRATEGIES:
+        timings = []
+        for _ in range(repeat):
+            with open_pdf_stream(data) as document:
+                start = perf_counter()
+                found = find_matches(document, strategy=strategy)
+                timings.append(perf_counter() - start)
+        results[strategy] = (median(timings), [matches.page for matches in found])
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    inputs = [(file.name, file.read_bytes()) for file in args.files]
+    if not inputs:
+        inputs = [
+            (file.name, file.read_bytes())
+            for file in sorted(DEFAULT_INPUT_DIR.glob("*.pdf"))
+        ]
+        inputs.extend(
+            (name, generate_invoice(spec)) for name, spec in SYNTHETIC_SPECS.items()
+        )
+
+    print(
+        f"{'file':<16}{'pages':>8}" + "".join(f"{s:>12}" for s in DETECTION_STRATEGIES)
+    )
+    for name, data in inputs:
+        results = bench_detection(data, args.repeat)
+        pages = {strategy: found for strategy, (_, found) in results.items()}
+        row = f"{name:<16}{len(next(iter(pages.values()))):>8}"
+        row += "".join(f"{seconds * 1000:>10.2f}ms" for seconds, _ in results.values())
+        print(row)
+        if len({tuple(found) for found in pages.values()}) > 1:
+            print(f"{name:<16}strategies found different pages: {pages}")
+
+
+if __name__ == "__main__":
+    main()
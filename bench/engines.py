@@ -0,0 +1,65 @@
+"""
+Compares the page rewrite engines of `replace_matches_in_pdf` on the same inputs.
+
+Usage:
+    python -m bench.engines [FILE ...] [--repeat N]
+
+Defaults to the PDFs in `test/in`.
+"""
+
+import argparse
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from src.core.pdf_service import (
+    ENGINES,
+    get_pages_with_credit_notes,
+    open_pdf_document,
+    replace_matches_in_pdf,
+)
+
+DEFAULT_INPUT_DIR = Path(__file__).parent.parent.joinpath("test", "in")
+
+
+def bench_engine(file_path: str, engine: str, repeat: int):
+    timings = []
+    size = 0
+    with open_pdf_document(file_path) as document:
+        pages = get_pages_with_credit_notes(document)
+        for _ in range(repeat):
+            start = perf_counter()
+            modified_document = replace_matches_in_pdf(document, pages, engine=engine)
+            size = len(modified_document.tobytes(deflate=True))
+            timings.append(perf_counter() - start)
+            modified_document.close()
+    return median(timings), size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    files = args.files or sorted(DEFAULT_INPUT_DIR.glob("*.pdf"))
+    totals = {engine: 0.0 for engine in ENGINES}
+
+    print(f"{'file':<24}" + "".join(f"{engine:>24}" for engine in ENGINES))
+    for file in files:
+        row = f"{file.name:<24}"
+        for engine in ENGINES:
+            seconds, size = bench_engine(file.as_posix(), engine, args.repeat)
+            totals[engine] += seconds
+            row += f"{seconds * 1000:>12.2f} ms {size:>8} B"
+        print(row)
+
+    baseline = totals[ENGINES[0]]
+    print(f"{'total':<24}" + "".join(f"{totals[e] * 1000:>21.2f} ms" for e in ENGINES))
+    for engine in ENGINES[1:]:
+        if totals[engine]:
+            print(f"{engine}: {baseline / totals[engine]:.2f}x vs {ENGINES[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Generates synthetic invoices for benchmarking, with adjustable page count, text
+density, vector-path density, image count and credit note match frequency.
+"""
+
+import random
+from typing import NamedTuple, Optional
+
+import fitz
+
+
+class InvoiceSpec(NamedTuple):
+    """
+    The shape of a synthetic invoice.
+
+    Attributes:
+        pages (int): The number of pages.
+        spans (int): The number of text lines per page.
+        paths (int): The number of vector paths (table rules and boxes) per page.
+        images (int): The number of distinct images, each placed on every page.
+        match_frequency (float): The fraction of text lines holding a credit note
+            reference. At least one line of the first page matches if this is above 0.
+        reference_line (Optional[int]): A text line holding a credit note reference on
+            every page, as on invoices printed from the same template.
+        seed (int): Seeds the generator, so the same spec yields the same document.
+    """
+
+    pages: int = 1
+    spans: int = 40
+    paths: int = 40
+    images: int = 1
+    match_frequency: float = 0.05
+    reference_line: Optional[int] = None
+    seed: int = 0
+
+
+def _make_image(index: int) -> bytes:
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 96, 96), False)
+    pixmap.clear_with(40 + (index * 37) % 200)
+    pixmap.set_rect(fitz.IRect(0, 0, 48, 48), (index * 53 % 256, 90, 160))
+    return pixmap.tobytes("png")
+
+
+def _draw_paths(page: fitz.Page, count: int, rng: random.Random):
+    shape = page.new_shape()
+    width, height = page.rect.width, page.rect.height
+    for index in range(count):
+        x = rng.uniform(20, width - 120)
+        y = rng.uniform(120, height - 40)
+        if index % 3:
+            shape.draw_line((x, y), (x + rng.uniform(40, 100), y))
+            shape.finish(color=(0.6, 0.6, 0.6), width=0.5)
+        else:
+            shape.draw_rect(fitz.Rect(x, y, x + rng.uniform(20, 100), y + 12))
+            shape.finish(color=(0.3, 0.3, 0.3), fill=(0.95, 0.95, 0.95), width=0.5)
+    shape.commit()
+
+
+def generate_invoice(spec: InvoiceSpec) -> bytes:
+    """
+    Builds a synthetic invoice as described by the spec.
+
+    Returns:
+        bytes: The generated PDF.
+    """
+    rng = random.Random(spec.seed)
+    images = [_make_image(index) for index in range(spec.images)]
+
+    document = fitz.open()
+    for page_num in range(spec.pages):
+        page = document.new_page()
+        _draw_paths(page, spec.paths, rng)
+
+        for index, image in enumerate(images):
+            left = 20 + (index % 6) * 90
+            top = 20 + (index // 6) * 90
+            page.insert_image(fitz.Rect(left, top, left + 80, top + 80), stream=image)
+
+        line_height = (page.rect.height - 140) / max(spec.spans, 1)
+        for line in range(spec.spans):
+            point = (30, 120 + line * line_height)
+            is_match = (
+                rng.random() < spec.match_frequency
+                or (spec.match_frequency > 0 and page_num == 0 and line == 0)
+                or line == spec.reference_line
+            )
+            if is_match:
+                text = f"Credit Note: CN{rng.randint(1000, 9999)}/{page_num + 1}"
+            else:
+                quantity, price = rng.randint(1, 9), rng.uniform(1, 999)
+                text = f"Item {line + 1:04d}  Widget x{quantity}  R {price:.2f}"
+            page.insert_text(point, text, fontsize=min(9, line_height * 0.8))
+
+    data = document.tobytes(deflate=True, no_new_id=True)
+    document.close()
+    return data
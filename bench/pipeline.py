@@ -0,0 +1,231 @@
+"""
+Times each stage of the processing pipeline on synthetic invoices.
+
+Usage:
+    python -m bench.pipeline [--scenario NAME ...] [--repeat N] [--engine ENGINE]
+                             [--template-cache] [--output FILE] [--baseline FILE]
+                             [--threshold RATIO]
+
+The median time of every stage is written as JSON to `--output`. When a baseline
+written by an earlier run is given, every stage is compared against it and the exit
+status is 1 if any stage is slower than the baseline by more than `--threshold`.
+
+With `--template-cache`, the redact engine is given a template cache that learns the
+regions of the invoice in an untimed run, so comparing against a baseline run without
+it measures the clipped text extraction.
+"""
+
+import argparse
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import platform
+from statistics import median
+import sys
+import tempfile
+from time import perf_counter
+from unittest import mock
+
+import fitz
+
+from bench.invoices import InvoiceSpec, generate_invoice
+from src.core import pdf_service
+from src.core.error import NothingToModifyException
+from src.core.pdf_service import (
+    ENGINES,
+    RECONSTRUCT_ENGINE,
+    get_pages_with_credit_notes,
+    open_pdf_document,
+    replace_matches_in_pdf,
+    save_modified_document,
+)
+from src.core.template_cache import TemplateCache
+
+SCENARIOS = {
+    "typical": InvoiceSpec(),
+    "many-pages": InvoiceSpec(pages=25),
+    "dense-text": InvoiceSpec(spans=400),
+    "dense-graphics": InvoiceSpec(paths=1500),
+    "many-images": InvoiceSpec(images=12),
+    "rare-matches": InvoiceSpec(pages=25, match_frequency=0.002),
+    "every-line-matches": InvoiceSpec(match_frequency=1.0),
+    "templated": InvoiceSpec(
+        pages=25, spans=200, match_frequency=0.0, reference_line=0
+    ),
+}
+
+STAGES = ("open", "detect", "replace", "graphics", "images", "text", "save")
+
+# The drawing steps of the reconstruct engine, timed as sub-stages of "replace"
+_SUB_STAGES = {
+    "graphics": "_draw_graphics_onto_canvas",
+    "images": "_draw_images_onto_page",
+    "text": "_draw_text_onto_page",
+}
+
+
+@contextmanager
+def _timed_sub_stages(timings: dict):
+    def timed(stage, function):
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings[stage] += perf_counter() - start
+
+        return wrapper
+
+    patches = [
+        mock.patch.object(pdf_service, name, timed(stage, getattr(pdf_service, name)))
+        for stage, name in _SUB_STAGES.items()
+    ]
+    for patch in patches:
+        patch.start()
+    try:
+        yield
+    finally:
+        for patch in patches:
+            patch.stop()
+
+
+def _run_once(file_path: str, output_dir: str, engine: str, templates=None):
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    start = perf_counter()
+    with open_pdf_document(file_path) as document:
+        timings["open"] = perf_counter() - start
+
+        start = perf_counter()
+        pages = get_pages_with_credit_notes(document)
+        timings["detect"] = perf_counter() - start
+
+        start = perf_counter()
+        with _timed_sub_stages(timings):
+            try:
+                modified_document = replace_matches_in_pdf(
+                    document, pages, engine=engine, templates=templates
+                )
+            except NothingToModifyException:
+                modified_document = None
+        timings["replace"] = perf_counter() - start
+
+        if modified_document is not None:
+            start = perf_counter()
+            save_modified_document(
+                modified_document, document.name, Path(output_dir), engine=engine
+            )
+            timings["save"] = perf_counter() - start
+    return timings, len(pages)
+
+
+def run_scenario(
+    spec: InvoiceSpec, repeat=5, engine=RECONSTRUCT_ENGINE, template_cache=False
+):
+    """
+    Times every stage of the pipeline on the invoice described by the spec.
+
+    The graphics, images and text stages are only measured for the reconstruct engine,
+    and the replace and save stages are 0 if no page matches. With `template_cache`,
+    the invoice is processed once untimed so that the cache learns its templates.
+
+    Returns:
+        dict: The spec, the number of matched pages and the median seconds per stage.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        file_path = os.path.join(work_dir, "invoice.pdf")
+        with open(file_path, "wb") as f:
+            f.write(generate_invoice(spec))
+
+        templates = None
+        if template_cache:
+            templates = TemplateCache(os.path.join(work_dir, "templates.json"))
+            _run_once(file_path, work_dir, engine, templates)
+
+        runs = []
+        for _ in range(repeat):
+            timings, matched_pages = _run_once(file_path, work_dir, engine, templates)
+            runs.append(timings)
+
+    return {
+        "spec": spec._asdict(),
+        "matched_pages": matched_pages,
+        "seconds": {stage: median(run[stage] for run in runs) for stage in STAGES},
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """
+    Compares the stage timings of two runs.
+
+    Returns:
+        list[tuple[str, str, float, float]]: The scenario, stage, baseline seconds and
+            current seconds of every stage slower than the baseline by more than the
+            threshold ratio.
+    """
+    regressions = []
+    for scenario, result in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        for stage, seconds in result["seconds"].items():
+            before = previous["seconds"].get(stage, 0.0)
+            # Ignore stages too short to measure reliably
+            if before >= 0.001 and seconds > before * threshold:
+                regressions.append((scenario, stage, before, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scenario", action="append", choices=SCENARIOS, dest="scenarios"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--engine", choices=ENGINES, default=RECONSTRUCT_ENGINE)
+    parser.add_argument("--template-cache", action="store_true")
+    parser.add_argument("--output", type=Path, default=Path("bench-results.json"))
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    results = {
+        "engine": args.engine,
+        "template_cache": args.template_cache,
+        "repeat": args.repeat,
+        "pymupdf": fitz.VersionBind,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenarios": {},
+    }
+
+    print(f"{'scenario':<20}" + "".join(f"{stage:>10}" for stage in STAGES))
+    for name in args.scenarios or SCENARIOS:
+        result = run_scenario(
+            SCENARIOS[name], args.repeat, args.engine, args.template_cache
+        )
+        results["scenarios"][name] = result
+        print(
+            f"{name:<20}"
+            + "".join(f"{result['seconds'][s] * 1000:>8.1f}ms" for s in STAGES)
+        )
+
+    args.output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.threshold)
+        for scenario, stage, before, after in regressions:
+            print(
+                f"REGRESSION {scenario}/{stage}: "
+                f"{before * 1000:.1f}ms -> {after * 1000:.1f}ms ({after / before:.2f}x)"
+            )
+        if regressions:
+            sys.exit(1)
+        print(f"No stage slower than {args.threshold:.2f}x the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares the save profiles of `save_modified_document` by save time and output size.
+
+Usage:
+    python -m bench.profiles [FILE ...] [--repeat N]
+
+Defaults to the PDFs in `test/in` and a synthetic text-dense invoice.
+"""
+
+import argparse
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from bench.invoices import InvoiceSpec, generate_invoice
+from src.core.pdf_service import (
+    SAVE_PROFILES,
+    get_pages_with_credit_notes,
+    get_save_options,
+    open_pdf_stream,
+    replace_matches_in_pdf,
+)
+
+DEFAULT_INPUT_DIR = Path(__file__).parent.parent.joinpath("test", "in")
+SYNTHETIC_SPEC = InvoiceSpec(pages=10, spans=300, paths=200, images=2)
+
+
+def bench_profiles(data: bytes, repeat: int):
+    """
+    Returns the median save time and the output size of every profile, for the
+    modified document produced from the given PDF.
+    """
+    results = {}
+    with open_pdf_stream(data) as document:
+        pages = get_pages_with_credit_notes(document)
+        modified_document = replace_matches_in_pdf(document, pages)
+        for profile in SAVE_PROFILES:
+            options = get_save_options(profile)
+            timings = []
+            for _ in range(repeat):
+                start = perf_counter()
+                size = len(modified_document.tobytes(**options))
+                timings.append(perf_counter() - start)
+            results[profile] = (median(timings), size)
+        modified_document.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    inputs = [(file.name, file.read_bytes()) for file in args.files]
+    if not inputs:
+        inputs = [
+            (file.name, file.read_bytes())
+            for file in sorted(DEFAULT_INPUT_DIR.glob("*.pdf"))
+        ]
+        inputs.append(("synthetic", generate_invoice(SYNTHETIC_SPEC)))
+
+    totals = {profile: [0.0, 0] for profile in SAVE_PROFILES}
+    print(f"{'file':<16}" + "".join(f"{profile:>24}" for profile in SAVE_PROFILES))
+    for name, data in inputs:
+        row = f"{name:<16}"
+        for profile, (seconds, size) in bench_profiles(data, args.repeat).items():
+            totals[profile][0] += seconds
+            totals[profile][1] += size
+            row += f"{seconds * 1000:>10.2f} ms {size:>9} B"
+        print(row)
+
+    print(
+        f"{'total':<16}"
+        + "".join(
+            f"{seconds * 1000:>10.2f} ms {size:>9} B"
+            for seconds, size in totals.values()
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Measures the import time of each start-up mode and checks it against a budget.
+
+Usage:
+    python -m bench.startup [--mode MODE ...] [--repeat N] [--budget MODE=MS ...]
+
+Each mode is imported in a fresh interpreter with `-X importtime`, the way
+`src.main` imports it, and the best of `--repeat` runs is kept. The exit status is 1
+if any mode takes longer to import than its budget.
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT_DIR = Path(__file__).parent.parent
+
+MODES = {
+    "batch": "src.cli.app",
+    "web": "src.web.app",
+    "desktop": "src.desktop.app",
+}
+
+# Import time budgets in milliseconds. PyMuPDF alone accounts for most of each.
+BUDGETS_MS = {
+    "batch": 500,
+    "web": 800,
+    "desktop": 1000,
+}
+
+
+def parse_importtime(stderr: str, module: str):
+    """
+    Returns the cumulative import time of a module in microseconds, from the output of
+    `python -X importtime`, or None if the module was not imported.
+    """
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.strip() == module:
+            return int(cumulative)
+    return None
+
+
+def measure(module: str):
+    """
+    Imports `src.main` and then a front-end module in a fresh interpreter.
+
+    Returns:
+        tuple[float, float]: The import time of both modules and the wall-clock time
+            of the whole interpreter run, in milliseconds.
+
+    Raises:
+        RuntimeError: If the module cannot be imported.
+    """
+    start = perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import src.main, {module}"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (perf_counter() - start) * 1000
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+    total_us = sum(
+        parse_importtime(process.stderr, name) or 0 for name in ("src.main", module)
+    )
+    return total_us / 1000, wall_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", action="append", choices=MODES, dest="modes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", action="append", default=[], metavar="MODE=MS")
+    args = parser.parse_args(argv)
+
+    budgets = dict(BUDGETS_MS)
+    for budget in args.budget:
+        mode, _, ms = budget.partition("=")
+        budgets[mode] = float(ms)
+
+    over_budget = []
+    print(f"{'mode':<10}{'import':>12}{'process':>12}{'budget':>12}")
+    for mode in args.modes or MODES:
+        try:
+            measure(MODES[mode])  # warm up the bytecode cache
+            runs = [measure(MODES[mode]) for _ in range(args.repeat)]
+        except RuntimeError as err:
+            print(f"{mode:<10}  skipped: {err}")
+            continue
+
+        import_ms = min(run[0] for run in runs)
+        wall_ms = min(run[1] for run in runs)
+        print(
+            f"{mode:<10}{import_ms:>10.1f}ms{wall_ms:>10.1f}ms{budgets[mode]:>10.0f}ms"
+        )
+        if import_ms > budgets[mode]:
+            over_budget.append(mode)
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Compares the batched text redraw of `_draw_text_onto_page` against inserting each span
+on its own, by drawing time, content stream size and saved size.
+
+Usage:
+    python -m bench.text [FILE ...] [--repeat N]
+
+Defaults to the PDFs in `test/in` and a synthetic text-dense invoice. Both paths must
+produce the same words at the same positions; a mismatch is reported per file.
+"""
+
+import argparse
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+import fitz
+
+from bench.invoices import InvoiceSpec, generate_invoice
+from src.core.pdf_service import (
+    _draw_text_onto_page,
+    get_pages_with_credit_notes,
+    get_save_options,
+    open_pdf_stream,
+)
+from src.core.rules import DEFAULT_RULES
+
+DEFAULT_INPUT_DIR = Path(__file__).parent.parent.joinpath("test", "in")
+SYNTHETIC_SPEC = InvoiceSpec(pages=3, spans=400)
+
+
+def draw_text_per_span(page: fitz.Page, text_blocks: list[dict], rules):
+    """
+    The previous text redraw, committing one `insert_text` call per span.
+    """
+    for block in text_blocks:
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                page.insert_text(
+                    (span["bbox"][0], span["bbox"][3]),
+                    rules.sub(span["text"]),
+                    fontsize=span["size"],
+                    fontname="helv",
+                    color=(0, 0, 0),
+                )
+
+
+PATHS = {
+    "per-span": draw_text_per_span,
+    "batched": _draw_text_onto_page,
+}
+
+
+def redraw(document: fitz.Document, pages: list[int], draw):
+    """
+    Redraws the text of the given pages onto blank pages of a new document.
+
+    Returns:
+        tuple[fitz.Document, float]: The new document and the drawing time in seconds.
+    """
+    text_dicts = [document[number].get_text("dict") for number in pages]
+    new_document = fitz.open()
+    start = perf_counter()
+    for number, text_dict in zip(pages, text_dicts):
+        rect = document[number].rect
+        new_page = new_document.new_page(width=rect.width, height=rect.height)
+        draw(new_page, text_dict["blocks"], DEFAULT_RULES)
+    return new_document, perf_counter() - start
+
+
+def bench_text(data: bytes, repeat: int):
+    """
+    Returns the median drawing time, content stream size, saved size and words of
+    every path, for the pages of the given PDF that have matches.
+    """
+    results = {}
+    with open_pdf_stream(data) as document:
+        pages = get_pages_with_credit_notes(document)
+        for name, draw in PATHS.items():
+            timings = []
+            for _ in range(repeat):
+                new_document, seconds = redraw(document, pages, draw)
+                timings.append(seconds)
+            content = sum(len(page.read_contents()) for page in new_document)
+            size = len(new_document.tobytes(**get_save_options()))
+            words = [page.get_text("words") for page in new_document]
+            new_document.close()
+            results[name] = (median(timings), content, size, words)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    inputs = [(file.name, file.read_bytes()) for file in args.files]
+    if not inputs:
+        inputs = [
+            (file.name, file.read_bytes())
+            for file in sorted(DEFAULT_INPUT_DIR.glob("*.pdf"))
+        ]
+        inputs.append(("synthetic", generate_invoice(SYNTHETIC_SPEC)))
+
+    print(f"{'file':<16}{'path':<10}{'draw':>12}{'content':>12}{'saved':>12}")
+    for name, data in inputs:
+        results = bench_text(data, args.repeat)
+        for path, (seconds, content, size, _) in results.items():
+            print(
+                f"{name:<16}{path:<10}{seconds * 1000:>10.2f}ms"
+                f"{content:>10} B{size:>10} B"
+            )
+        if results["per-span"][3] != results["batched"][3]:
+            print(f"{name:<16}text differs between paths")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+"""
+Headless batch processing of PDF files, for scheduled jobs such as a nightly ERP export.
+
+Usage:
+    python -m src.main --batch INPUT [INPUT ...] --output DIR [options]
+
+Each INPUT is a PDF file, a directory or a glob pattern. Input files are read in place
+and never removed; each modified file is written under the output directory, mirroring
+its path relative to the input directory it was found in.
+
+Exit codes:
+    0  Every file was modified, or had nothing to modify.
+    1  At least one file failed.
+    2  Invalid arguments, no input files were found, or two input files would be
+       written to the same output file.
+    130  Interrupted.
+"""
+
+import argparse
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import glob
+from itertools import islice
+import os
+from pathlib import Path
+import sys
+from time import perf_counter
+from typing import NamedTuple
+
+from src.core.error import (
+    NothingToModifyException,
+    PDFCreationFailException,
+    PathNotFoundException,
+    PathNotPDFFileException,
+)
+from src.core.file_service import FileResult, failed_result, new_worker_pool
+from src.core.metrics import DocumentMetrics, record_document
+from src.core.pdf_service import (
+    BALANCED_PROFILE,
+    ENGINES,
+    RECONSTRUCT_ENGINE,
+    SAVE_PROFILES,
+    get_output_path,
+    get_pages_with_credit_notes,
+    open_pdf_document,
+    release_memory,
+    replace_matches_in_pdf,
+    save_modified_document,
+)
+from src.core.rules import DEFAULT_RULES, RuleSet
+from src.core.template_cache import TemplateCache
+
+MODIFIED = "modified"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+class BatchItem(NamedTuple):
+    """
+    A file to process and the directory its modified copy is written to.
+    """
+
+    input_path: Path
+    output_dir: Path
+
+    @property
+    def output_path(self) -> Path:
+        return get_output_path(self.input_path.name, self.output_dir)
+
+
+def _glob_base(pattern: str) -> Path:
+    """
+    Returns the directory a glob pattern is rooted at: its leading components up to
+    the first one holding a wildcard.
+    """
+    parts = Path(pattern).parts
+    for index, part in enumerate(parts):
+        if glob.has_magic(part):
+            return Path(*parts[:index]) if index else Path(".")
+    return Path(pattern).parent
+
+
+def _common_dir(files) -> Path | None:
+    try:
+        return Path(os.path.commonpath([file.absolute().parent for file in files]))
+    except ValueError:
+        return None  # on different drives
+
+
+def find_inputs(inputs, output_dir: Path, recursive=False):
+    """
+    Expands the input arguments into the PDF files to process.
+
+    Output paths mirror the path of each file relative to the directory it was found
+    in: the input directory, the leading directories of a glob pattern up to the first
+    wildcard, or the deepest directory shared by all the files given by name.
+
+    Args:
+        inputs (list[str]): PDF files, directories or glob patterns.
+        output_dir (Path): The directory modified files are written under.
+        recursive (bool): Whether to descend into subdirectories of input directories,
+            and whether `**` in glob patterns matches across directories.
+
+    Returns:
+        list[BatchItem]: The files found, without duplicates, in a stable order.
+    """
+    items = {}
+
+    def add(file: Path, root: Path | None):
+        if file.suffix.lower() != ".pdf" or not file.is_file():
+            return
+        relative_dir = Path()
+        if root is not None:
+            relative_dir = file.absolute().parent.relative_to(root.absolute())
+        items.setdefault(file.resolve(), BatchItem(file, output_dir / relative_dir))
+
+    files = [Path(argument) for argument in inputs if Path(argument).is_file()]
+    files_root = _common_dir(files) if files else None
+    for argument in inputs:
+        path = Path(argument)
+        if path.is_dir():
+            found = path.rglob("*") if recursive else path.iterdir()
+            for file in sorted(found):
+                add(file, path)
+        elif path.is_file():
+            add(path, files_root)
+        else:
+            base = _glob_base(argument)
+            for match in sorted(glob.glob(argument, recursive=recursive)):
+                add(Path(match), base)
+    return list(items.values())
+
+
+def find_collisions(items):
+    """
+    Returns the files of a batch whose modified copies would be written to the same
+    output file, and so overwrite each other.
+
+    Returns:
+        dict[Path, list[BatchItem]]: The files sharing each contested output path.
+    """
+    by_output = {}
+    for item in items:
+        by_output.setdefault(item.output_path, []).append(item)
+    return {path: group for path, group in by_output.items() if len(group) > 1}
+
+
+def process_item(
+    item: BatchItem,
+    rules: RuleSet,
+    engine: str,
+    profile: str = BALANCED_PROFILE,
+    page_workers: int = 1,
+    templates: TemplateCache | None = None,
+    low_memory: bool = False,
+) -> FileResult:
+    """
+    Redacts a single file of the batch, leaving the input file untouched.
+
+    A document without matches is reported with no output and no error. This is a
+    module-level function so that it can be dispatched to worker processes. Long
+    documents are split across `page_workers` processes of their own, and processed a
+    page at a time with `low_memory`.
+    """
+    file_path = str(item.input_path)
+    metrics = DocumentMetrics(file_path)
+    output, error = None, None
+    try:
+        with record_document(metrics):
+            with open_pdf_document(file_path) as document:
+                pages = get_pages_with_credit_notes(
+                    document, rules, low_memory=low_memory
+                )
+                if pages:
+                    item.output_dir.mkdir(parents=True, exist_ok=True)
+                    modified_document = replace_matches_in_pdf(
+                        document,
+                        pages,
+                        rules,
+                        engine,
+                        page_workers,
+                        templates,
+                        low_memory,
+                    )
+                    output = str(
+                        save_modified_document(
+                            modified_document,
+                            document.name,
+                            item.output_dir,
+                            profile,
+                            engine,
+                        )
+                    )
+    except (
+        PathNotFoundException,
+        PathNotPDFFileException,
+        NothingToModifyException,
+        PDFCreationFailException,
+        OSError,
+    ) as err:
+        error = str(err)
+    finally:
+        if low_memory:
+            release_memory()
+    return FileResult(file_path, output, error, metrics.total, metrics.to_dict())
+
+
+def outcome_of(result: FileResult):
+    if result.error:
+        return FAILED
+    return MODIFIED if result.output else UNCHANGED
+
+
+class Progress:
+    """
+    Reports the progress of a batch on stderr, when it is a terminal. The status line is
+    redrawn in place and failures are listed as they happen. Elsewhere, such as under
+    cron, nothing is written and the summary alone lists the failures.
+    """
+
+    def __init__(self, total, quiet=False, stream=sys.stderr):
+        self.total = total
+        self.done = 0
+        self.quiet = quiet
+        self.stream = stream
+        self.interactive = stream.isatty()
+
+    def update(self, result: FileResult):
+        self.done += 1
+        if self.quiet or not self.interactive:
+            return
+        if outcome_of(result) == FAILED:
+            self.__clear()
+            print(f"FAILED {result.file}: {result.error}", file=self.stream)
+        name = os.path.basename(result.file)[:60]
+        self.stream.write(f"\r\033[K[{self.done}/{self.total}] {name}")
+        self.stream.flush()
+
+    def finish(self):
+        self.__clear()
+
+    def __clear(self):
+        if self.interactive and not self.quiet:
+            self.stream.write("\r\033[K")
+            self.stream.flush()
+
+
+def run_batch(
+    items,
+    rules,
+    engine,
+    workers=None,
+    fail_fast=False,
+    progress=None,
+    profile=BALANCED_PROFILE,
+    page_workers=1,
+    templates=None,
+    low_memory=False,
+):
+    """
+    Processes the batch on a pool of worker processes.
+
+    Only a few files per worker are queued at a time, so a batch of thousands of files
+    holds little memory, and `fail_fast` stops the batch soon after the first failure.
+    If a worker dies, the files the pool held fail and the pool is replaced.
+
+    Returns:
+        list[FileResult]: The results of the files processed, in completion order.
+    """
+    results = []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(items)))
+    if workers == 1:
+        for item in items:
+            result = process_item(
+                item, rules, engine, profile, page_workers, templates, low_memory
+            )
+            results.append(result)
+            if progress:
+                progress.update(result)
+            if fail_fast and outcome_of(result) == FAILED:
+                break
+        return results
+
+    def collect(future, item):
+        try:
+            result = future.result()
+        except Exception as err:
+            result = failed_result(item.input_path, err)
+        results.append(result)
+        if progress:
+            progress.update(result)
+        return outcome_of(result) == FAILED
+
+    def submit(item):
+        nonlocal executor
+        args = (
+            process_item,
+            item,
+            rules,
+            engine,
+            profile,
+            page_workers,
+            templates,
+            low_memory,
+        )
+        try:
+            return executor.submit(*args)
+        except BrokenProcessPool:
+            # A worker died, such as one killed for running out of memory. The files
+            # the pool held fail; the rest of the batch goes to a new pool.
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor = new_worker_pool(workers, low_memory)
+            return executor.submit(*args)
+
+    queue = iter(items)
+    executor = new_worker_pool(workers, low_memory)
+    try:
+        pending = {}
+        while True:
+            for item in islice(queue, workers * 4 - len(pending)):
+                pending[submit(item)] = item
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            failed = False
+            for future in done:
+                failed |= collect(future, pending.pop(future))
+
+            if fail_fast and failed:
+                # Files already being processed are let finish; queued ones are dropped
+                for future, item in pending.items():
+                    if not future.cancel():
+                        collect(future, item)
+                break
+    finally:
+        executor.shutdown()
+    return results
+
+
+def summarize(results, total, seconds, stream=sys.stdout):
+    outcomes = [outcome_of(result) for result in results]
+    print(
+        f"Processed {len(results)} of {total} files in {seconds:.1f}s: "
+        f"{outcomes.count(MODIFIED)} modified, "
+        f"{outcomes.count(UNCHANGED)} without credit notes, "
+        f"{outcomes.count(FAILED)} failed",
+        file=stream,
+    )
+    peaks = [result.metrics["peak_rss"] for result in results if result.metrics]
+    if any(peaks):
+        peak = max(peak or 0 for peak in peaks)
+        print(
+            f"Peak memory: {peak / 1024**2:.0f} MB (highest of any file)", file=stream
+        )
+    for result, outcome in zip(results, outcomes):
+        if outcome == FAILED:
+            print(f"  {result.file}: {result.error}", file=stream)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="fiscalpdf --batch",
+        description=__doc__.splitlines()[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__[__doc__.index("Exit codes:") :],
+    )
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or globs")
+    parser.add_argument("-o", "--output", type=Path, required=True)
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="descend into subdirectories"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="defaults to the CPU count"
+    )
+    parser.add_argument(
+        "--page-workers",
+        type=int,
+        default=1,
+        help="split long documents across this many processes each",
+    )
+    parser.add_argument("--engine", choices=ENGINES, default=RECONSTRUCT_ENGINE)
+    parser.add_argument(
+        "--template-cache",
+        type=Path,
+        metavar="FILE",
+        help="remember where matches sit on each page layout (redact engine only)",
+    )
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        help="bound the memory used per document, for very long documents",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=SAVE_PROFILES,
+        default=BALANCED_PROFILE,
+        help="trade save speed against output size",
+    )
+    parser.add_argument(
+        "--fail-fast", action="store_true", help="stop after the first failure"
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="hide progress")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    items = find_inputs(args.inputs, args.output, args.recursive)
+    if not items:
+        print("No PDF files found.", file=sys.stderr)
+        return EXIT_USAGE
+
+    collisions = find_collisions(items)
+    if collisions:
+        print("Several input files would be written to:", file=sys.stderr)
+        for output_path, group in collisions.items():
+            inputs = ", ".join(str(item.input_path) for item in group)
+            print(f"  {output_path}: {inputs}", file=sys.stderr)
+        return EXIT_USAGE
+
+    progress = Progress(len(items), args.quiet)
+    start = perf_counter()
+    try:
+        results = run_batch(
+            items,
+            DEFAULT_RULES,
+            args.engine,
+            workers=args.workers,
+            fail_fast=args.fail_fast,
+            progress=progress,
+            profile=args.profile,
+            page_workers=args.page_workers,
+            templates=args.template_cache and TemplateCache(args.template_cache),
+            low_memory=args.low_memory,
+        )
+    except KeyboardInterrupt:
+        progress.finish()
+        print("Interrupted.", file=sys.stderr)
+        return EXIT_INTERRUPTED
+    progress.finish()
+
+    summarize(results, len(items), perf_counter() - start)
+    if any(outcome_of(result) == FAILED for result in results):
+        return EXIT_FAILED
+    return EXIT_OK
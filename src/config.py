@@ -1,11 +1,49 @@
+import os
 from pathlib import Path
 
-from platformdirs import user_data_dir
 
+# Processed files are kept for RETENTION_DAYS, and the output directory is checked
+# for expired files every SCAN_INTERVAL seconds. If OUTPUT_QUOTA_BYTES is set, the
+# oldest files are also removed once the output directory grows beyond it.
+RETENTION_DAYS = int(os.environ.get("FISCALPDF_RETENTION_DAYS", 30))
+SCAN_INTERVAL = int(os.environ.get("FISCALPDF_SCAN_INTERVAL", 60 * 5))
+OUTPUT_QUOTA_BYTES = int(os.environ.get("FISCALPDF_OUTPUT_QUOTA_BYTES", 0)) or None
 
-APP_DIR = Path(user_data_dir("FiscalPDF", "sagetendo", ensure_exists=True))
-INPUT_DIR = APP_DIR / "uploads"
-OUTPUT_DIR = APP_DIR / "processed"
+# The default save profile of modified files: "fast", "balanced" or "compact".
+SAVE_PROFILE = os.environ.get("FISCALPDF_SAVE_PROFILE", "balanced")
 
-INPUT_DIR.mkdir(exist_ok=True)
-OUTPUT_DIR.mkdir(exist_ok=True)
+# Set FISCALPDF_LOW_MEMORY=1 to bound the memory used per document, at some cost in
+# speed, for documents of a thousand pages or more.
+LOW_MEMORY = os.environ.get("FISCALPDF_LOW_MEMORY", "0") == "1"
+
+# The application directories are resolved, and created, on first access rather than
+# at import time, so modes that never touch them (such as batch mode) skip the work.
+_APP_DIRS = {
+    "INPUT_DIR": "uploads",
+    "OUTPUT_DIR": "processed",
+    "CACHE_DIR": "cache",
+    "THUMBNAIL_DIR": "thumbnails",
+}
+_APP_FILES = {
+    "CATALOG_PATH": "catalog.sqlite3",
+}
+
+
+def _resolve(name):
+    if name == "APP_DIR":
+        from platformdirs import user_data_dir
+
+        return Path(user_data_dir("FiscalPDF", "sagetendo", ensure_exists=True))
+    if name in _APP_DIRS:
+        path = __getattr__("APP_DIR") / _APP_DIRS[name]
+        path.mkdir(exist_ok=True)
+        return path
+    if name in _APP_FILES:
+        return __getattr__("APP_DIR") / _APP_FILES[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __getattr__(name):
+    value = _resolve(name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,108 @@
+from collections import Counter
+from pathlib import PurePosixPath
+import zipfile
+
+from src.core.logger import get_logger
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _safe_parts(filename: str):
+    """
+    Returns the components of a member's path, without the root, drive, `.` and `..`
+    components, which have no place in the name of an output.
+    """
+    parts = PurePosixPath(filename.replace("\\", "/")).parts
+    return [part for part in parts if part not in ("/", ".", "..") and ":" not in part]
+
+
+def pdf_members(archive: zipfile.ZipFile):
+    """
+    Returns the PDF files held in a ZIP archive, skipping directories and other files.
+
+    Each file is named after its file name alone, as outputs are written side by side.
+    Files of the same name stored under different directories, such as
+    `jan/invoice.pdf` and `feb/invoice.pdf`, are named after their whole path instead
+    (`jan_invoice.pdf` and `feb_invoice.pdf`), so that neither output overwrites the
+    other.
+
+    Returns:
+        list[tuple[zipfile.ZipInfo, str]]: Each PDF member and its unique file name.
+    """
+    found = []
+    for info in archive.infolist():
+        parts = _safe_parts(info.filename)
+        if not info.is_dir() and parts and parts[-1].lower().endswith(".pdf"):
+            found.append((info, parts))
+
+    counts = Counter(parts[-1].lower() for _, parts in found)
+    members, taken = [], set()
+    for info, parts in found:
+        name = parts[-1] if counts[parts[-1].lower()] == 1 else "_".join(parts)
+        stem, suffix = name[: -len(".pdf")], name[-len(".pdf") :]
+        number = 1
+        while name.lower() in taken:
+            number += 1
+            name = f"{stem} ({number}){suffix}"
+        taken.add(name.lower())
+        members.append((info, name))
+    return members
+
+
+class _ChunkBuffer:
+    """
+    A write-only, non-seekable file that hands out what has been written to it. A
+    `zipfile.ZipFile` writing to it falls back to data descriptors, so entries never
+    need to be rewritten once emitted.
+    """
+
+    def __init__(self):
+        self.__chunks = []
+        self.__position = 0
+
+    def write(self, data):
+        self.__chunks.append(bytes(data))
+        self.__position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.__position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.__chunks)
+        self.__chunks.clear()
+        return data
+
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE):
+    """
+    Generates a ZIP archive of the given files as it is produced, without building it
+    in memory or on disk. Files are stored uncompressed, as PDFs are compressed
+    already, and read `chunk_size` bytes at a time.
+
+    Args:
+        entries (Iterable[tuple[str, Path]]): The name of each file within the archive
+            and the path to read it from. Files that no longer exist are skipped.
+
+    Yields:
+        bytes: The successive parts of the archive.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, path in entries:
+            try:
+                source = open(path, "rb")
+            except OSError as err:
+                get_logger("fiscalpdf.archive").on_error(f"Skipping {name}: {err}")
+                continue
+            with source, archive.open(name, "w", force_zip64=True) as target:
+                while chunk := source.read(chunk_size):
+                    target.write(chunk)
+                    if data := buffer.drain():
+                        yield data
+            if data := buffer.drain():
+                yield data
+    yield buffer.drain()  # the central directory
@@ -0,0 +1,153 @@
+from contextlib import closing
+from datetime import datetime
+import os
+from pathlib import Path
+import sqlite3
+from typing import NamedTuple
+
+
+SORT_COLUMNS = {"name": "name", "date": "modified", "size": "size"}
+
+
+class CatalogEntry(NamedTuple):
+    """
+    A processed file recorded in the catalog.
+
+    Attributes:
+        name (str): The path of the file, relative to the output directory.
+        modified (float): The modification time of the file, as a timestamp.
+        size (int): The size of the file in bytes.
+    """
+
+    name: str
+    modified: float
+    size: int
+
+    @property
+    def date_modified(self):
+        return datetime.fromtimestamp(self.modified).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Catalog:
+    """
+    Persistent SQLite index of the processed files in the output directory.
+
+    Listing and sorting the processed files is answered from the index, so neither UI
+    has to list and stat the output directory on every page load or refresh. A
+    connection is opened per operation, which keeps the catalog safe to use from
+    several threads and worker processes at once.
+
+    Args:
+        db_path (Path): The SQLite database file.
+        output_dir (Path): The directory the catalogued files live in.
+    """
+
+    def __init__(self, db_path, output_dir):
+        self.db_path = Path(db_path)
+        self.output_dir = Path(output_dir)
+        with closing(self.__connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "name TEXT PRIMARY KEY, modified REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS files_modified ON files (modified)"
+            )
+
+    def __connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def __name(self, path):
+        return Path(path).relative_to(self.output_dir).as_posix()
+
+    def add(self, path):
+        """
+        Records a file written into the output directory, replacing any previous entry.
+        """
+        stat = os.stat(path)
+        with closing(self.__connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO files (name, modified, size) VALUES (?, ?, ?)",
+                (self.__name(path), stat.st_mtime, stat.st_size),
+            )
+
+    def remove(self, path):
+        with closing(self.__connect()) as connection, connection:
+            connection.execute("DELETE FROM files WHERE name = ?", (self.__name(path),))
+
+    def remove_shard(self, shard):
+        """
+        Removes every entry stored under a shard directory of the output directory.
+        """
+        prefix = f"{self.__name(shard)}/"
+        with closing(self.__connect()) as connection, connection:
+            connection.execute(
+                "DELETE FROM files WHERE substr(name, 1, ?) = ?", (len(prefix), prefix)
+            )
+
+    def count(self) -> int:
+        with closing(self.__connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def total_size(self) -> int:
+        with closing(self.__connect()) as connection:
+            return connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM files"
+            ).fetchone()[0]
+
+    def page(self, offset=0, limit=50, sort="date", descending=True):
+        """
+        Returns a sorted slice of the catalogued files.
+
+        Args:
+            offset (int): The number of entries to skip.
+            limit (int): The maximum number of entries to return.
+            sort (str): The key to sort by, one of `SORT_COLUMNS`.
+            descending (bool): Whether to sort in descending order.
+
+        Returns:
+            list[CatalogEntry]: The entries of the requested slice.
+        """
+        column = SORT_COLUMNS.get(sort, SORT_COLUMNS["date"])
+        order = "DESC" if descending else "ASC"
+        with closing(self.__connect()) as connection:
+            rows = connection.execute(
+                f"SELECT name, modified, size FROM files "
+                f"ORDER BY {column} {order}, name {order} LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [CatalogEntry(*row) for row in rows]
+
+    def sync(self):
+        """
+        Reconciles the catalog with the output directory, for files that were added or
+        removed while the application was not running.
+        """
+        on_disk = {}
+        for file in self.output_dir.rglob("*.pdf"):
+            try:
+                stat = file.stat()
+            except OSError:
+                continue
+            on_disk[self.__name(file)] = (stat.st_mtime, stat.st_size)
+
+        with closing(self.__connect()) as connection, connection:
+            catalogued = {
+                name: (modified, size)
+                for name, modified, size in connection.execute(
+                    "SELECT name, modified, size FROM files"
+                )
+            }
+            connection.executemany(
+                "DELETE FROM files WHERE name = ?",
+                [(name,) for name in catalogued.keys() - on_disk.keys()],
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO files (name, modified, size) VALUES (?, ?, ?)",
+                [
+                    (name, *entry)
+                    for name, entry in on_disk.items()
+                    if catalogued.get(name) != entry
+                ],
+            )
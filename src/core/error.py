@@ -16,3 +16,8 @@ class PathNotFoundException(Exception):
 class PathNotPDFFileException(Exception):
     def __init__(self, path):
         super().__init__(f"Path {path} is not a PDF file.")
+
+
+class ArchiveWithoutPDFsException(Exception):
+    def __init__(self, path):
+        super().__init__(f"Archive {path} contains no PDF files.")
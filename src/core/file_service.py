@@ -1,30 +1,341 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
+from itertools import islice
 import os
+from pathlib import Path
+import shutil
+import sqlite3
 import sys
 from threading import Thread
 from time import sleep
+from typing import NamedTuple, Optional
 
+from src.core.catalog import Catalog, CatalogEntry, SORT_COLUMNS
 from src.core.error import (
     NothingToModifyException,
     PDFCreationFailException,
     PathNotFoundException,
     PathNotPDFFileException,
 )
+from src.core.logger import get_logger
+from src.core.metrics import DocumentMetrics, observe, record_document
+from src.core.result_cache import ResultCache
+from src.core.template_cache import TemplateCache
+from src.core.rules import DEFAULT_RULES, RuleSet
 from src.core.pdf_service import (
+    BALANCED_PROFILE,
+    ENGINE_VERSION,
+    RECONSTRUCT_ENGINE,
+    WORKER_CONTEXT,
+    get_output_path,
     get_pages_with_credit_notes,
     open_pdf_document,
+    process_pdf_bytes,
+    release_memory,
     replace_matches_in_pdf,
     save_modified_document,
 )
 
 
+SHARD_FORMAT = "%Y-%m-%d"
+
+# In low-memory mode, worker processes are replaced after this many files, so that the
+# memory they hold on to once a long document is done is returned to the system.
+LOW_MEMORY_TASKS_PER_WORKER = 8
+
+
+def _logger():
+    return get_logger("fiscalpdf.files")
+
+
+def get_shard_dir(output_dir, date=None):
+    """
+    Returns the directory that outputs written on a given day are stored in, creating
+    it if needed. Outputs are sharded by day so that expired days can be dropped as a
+    whole instead of checking the age of every file.
+
+    Args:
+        output_dir (Path): The output directory.
+        date (Optional[datetime]): The day of the shard. Defaults to today.
+    """
+    shard_dir = Path(output_dir).joinpath(
+        (date or datetime.now()).strftime(SHARD_FORMAT)
+    )
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    return shard_dir
+
+
+def new_worker_pool(workers, low_memory=False) -> ProcessPoolExecutor:
+    """
+    Returns a pool of worker processes to process files on. Workers are started with
+    `pdf_service.WORKER_CONTEXT`, as pools are created while other threads may be using
+    PyMuPDF. In low-memory mode, on Python 3.11 and later, each worker is replaced after
+    `LOW_MEMORY_TASKS_PER_WORKER` files.
+    """
+    if low_memory and sys.version_info >= (3, 11):
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=WORKER_CONTEXT,
+            max_tasks_per_child=LOW_MEMORY_TASKS_PER_WORKER,
+        )
+    return ProcessPoolExecutor(max_workers=workers, mp_context=WORKER_CONTEXT)
+
+
+class FileResult(NamedTuple):
+    """
+    The outcome of processing a single file as part of a batch.
+
+    Attributes:
+        file (str): The input path that was processed.
+        output (Optional[str]): The path of the modified document, if one was written.
+        error (Optional[str]): An error message if the processing failed, otherwise None.
+        seconds (float): The time spent processing the file.
+        metrics (Optional[dict]): The stage timings and counters of the file, as
+            returned by `DocumentMetrics.to_dict`.
+    """
+
+    file: str
+    output: Optional[str]
+    error: Optional[str]
+    seconds: float = 0.0
+    metrics: Optional[dict] = None
+
+
+class ProcessingOptions(NamedTuple):
+    """
+    The settings applied to every file processed by a `FileService`. They are passed
+    to worker processes along with each file, so they must stay picklable.
+
+    Attributes:
+        output_dir (Path): The directory to save modified files into.
+        rules (RuleSet): The redaction rules to apply.
+        engine (str): The engine used to rewrite matched pages (see `pdf_service.ENGINES`).
+        result_cache (Optional[ResultCache]): Serves previously produced outputs for
+            identical inputs. Caching is disabled if None.
+        catalog (Optional[Catalog]): The index that written outputs are recorded in.
+        save_profile (str): The profile modified files are saved with (see
+            `pdf_service.SAVE_PROFILES`).
+        template_cache (Optional[TemplateCache]): The regions of known page templates
+            where matches are found, used by `pdf_service.REDACT_ENGINE`.
+        low_memory (bool): Whether to bound the memory held while processing each file
+            (see `pdf_service.replace_matches_in_pdf`), at some cost in speed.
+    """
+
+    output_dir: Path
+    rules: RuleSet = DEFAULT_RULES
+    engine: str = RECONSTRUCT_ENGINE
+    result_cache: Optional[ResultCache] = None
+    catalog: Optional[Catalog] = None
+    save_profile: str = BALANCED_PROFILE
+    template_cache: Optional[TemplateCache] = None
+    low_memory: bool = False
+
+    def cache_key(self, digest):
+        return ResultCache.key(
+            digest,
+            self.rules.fingerprint,
+            self.engine,
+            ENGINE_VERSION,
+            self.save_profile,
+        )
+
+    def record(self, output_path):
+        if self.catalog is None:
+            return
+        try:
+            self.catalog.add(output_path)
+        except (OSError, sqlite3.Error) as err:
+            _logger().on_error(f"Cannot add {output_path} to the catalog: {err}")
+
+
+def failed_result(name, err: Exception) -> FileResult:
+    """
+    The result of a file whose processing raised an unexpected error, such as a
+    worker process crashing.
+    """
+    metrics = DocumentMetrics(name)
+    metrics.error = type(err).__name__
+    return FileResult(str(name), None, str(err), metrics=metrics.to_dict())
+
+
+def _process_file(file_path, options: ProcessingOptions, metrics: DocumentMetrics):
+    cache_key = None
+    if options.result_cache and Path(file_path).is_file():
+        cache_key = options.cache_key(ResultCache.digest_file(file_path))
+        output_path = get_output_path(file_path, get_shard_dir(options.output_dir))
+        if options.result_cache.link(cache_key, output_path):
+            metrics.cache_hit = True
+            options.record(output_path)
+            return output_path
+
+    try:
+        with open_pdf_document(file_path) as document:
+            credit_notes_pages = get_pages_with_credit_notes(
+                document, options.rules, low_memory=options.low_memory
+            )
+            modified_document = replace_matches_in_pdf(
+                document,
+                credit_notes_pages,
+                options.rules,
+                engine=options.engine,
+                templates=options.template_cache,
+                low_memory=options.low_memory,
+            )
+            output_path = save_modified_document(
+                modified_document,
+                document.name,
+                get_shard_dir(options.output_dir),
+                options.save_profile,
+                options.engine,
+            )
+    finally:
+        if options.low_memory:
+            release_memory()
+    if cache_key:
+        options.result_cache.store_file(cache_key, output_path)
+    options.record(output_path)
+    return output_path
+
+
+def process_file(file_path, options: ProcessingOptions, keep_input=False) -> FileResult:
+    """
+    Opens a PDF file, redacts credit note information and saves the modified file.
+    Unless `keep_input` is set, the input file is removed once processing completes,
+    whether it succeeded or not.
+
+    If the options carry a result cache and the same input was processed before with
+    the same settings, the cached output is linked into place without opening the file.
+
+    This is a module-level function so that it can be dispatched to worker processes.
+
+    Args:
+        file_path (str): The path to the PDF file to process.
+        options (ProcessingOptions): The settings to process the file with.
+        keep_input (bool): Whether to leave the input file in place, such as a file the
+            user picked, which is only ever read.
+
+    Returns:
+        FileResult: The output path on success, or the error message on failure,
+            along with the metrics collected while processing the file.
+    """
+    file_path = str(file_path)
+    metrics = DocumentMetrics(file_path)
+    output, error = None, None
+    try:
+        with record_document(metrics):
+            output = str(_process_file(file_path, options, metrics))
+    except (
+        PathNotFoundException,
+        PathNotPDFFileException,
+        NothingToModifyException,
+        PDFCreationFailException,
+    ) as err:
+        error = str(err)
+    finally:
+        try:
+            if not keep_input and os.path.exists(file_path):
+                os.remove(file_path)
+        except OSError:
+            # TODO: Log error
+            pass
+    return FileResult(file_path, output, error, metrics.total, metrics.to_dict())
+
+
+def write_output(filename, data, output_dir):
+    output_path = get_output_path(filename, output_dir)
+    with open(output_path, "wb") as f:
+        f.write(data)
+    return output_path
+
+
+def _process_upload(data, filename, options: ProcessingOptions, metrics):
+    cache_key = None
+    if options.result_cache:
+        cache_key = options.cache_key(ResultCache.digest_bytes(data))
+        output_path = get_output_path(filename, get_shard_dir(options.output_dir))
+        if options.result_cache.link(cache_key, output_path):
+            metrics.cache_hit = True
+            options.record(output_path)
+            return output_path
+
+    output = process_pdf_bytes(
+        data,
+        options.rules,
+        options.engine,
+        filename,
+        options.save_profile,
+        options.template_cache,
+        options.low_memory,
+    )
+    output_path = write_output(filename, output, get_shard_dir(options.output_dir))
+    if cache_key:
+        options.result_cache.store_file(cache_key, output_path)
+    options.record(output_path)
+    return output_path
+
+
+def process_upload(data, filename, options: ProcessingOptions) -> FileResult:
+    """
+    Redacts an uploaded PDF held in memory and writes the modified file into the
+    output directory. Like `process_file`, it can be dispatched to worker processes,
+    and it is served from the result cache when possible.
+
+    Args:
+        data (bytes): The contents of the uploaded PDF file.
+        filename (str): The name of the uploaded file.
+        options (ProcessingOptions): The settings to process the file with.
+
+    Returns:
+        FileResult: The output path on success, or the error message on failure,
+            along with the metrics collected while processing the file.
+    """
+    metrics = DocumentMetrics(filename)
+    output, error = None, None
+    try:
+        with record_document(metrics):
+            output = str(_process_upload(data, filename, options, metrics))
+    except (
+        PathNotPDFFileException,
+        NothingToModifyException,
+        PDFCreationFailException,
+    ) as err:
+        error = str(err)
+    return FileResult(filename, output, error, metrics.total, metrics.to_dict())
+
+
 class FileService:
-    def __init__(self, input_dir, output_dir):
+    def __init__(
+        self,
+        input_dir,
+        output_dir,
+        rules=DEFAULT_RULES,
+        engine=RECONSTRUCT_ENGINE,
+        result_cache=None,
+        catalog=None,
+        retention_days=30,
+        scan_interval=60 * 5,
+        quota_bytes=None,
+        save_profile=BALANCED_PROFILE,
+        template_cache=None,
+        thumbnail_cache=None,
+        low_memory=False,
+    ):
         self.PLATFORM = sys.platform
         self.input_dir = input_dir
         self.output_dir = output_dir
+        self.rules = rules
+        self.engine = engine
+        self.save_profile = save_profile
+        self.template_cache = template_cache
+        self.result_cache = result_cache
+        self.thumbnail_cache = thumbnail_cache
+        self.low_memory = low_memory
+        self.catalog = catalog
+        self.retention_days = retention_days
+        self.quota_bytes = quota_bytes
         self.file_watch_thread = Thread(target=self.__stale_file_watcher, daemon=True)
-        self.SLEEP_TIME = 60 * 5  # 5 minutes
+        self.SLEEP_TIME = scan_interval
         self.running = False
 
     def __is_file_older_than_x_days(self, file, days):
@@ -33,19 +344,83 @@ class FileService:
         return modification_time < cutoff_time.timestamp()
 
     def __stale_file_watcher(self):
+        if self.catalog:
+            self.catalog.sync()
         while True:
             self.handle_old_files()
             sleep(self.SLEEP_TIME)
 
     def handle_old_files(self):
-        for file in self.output_dir.iterdir():
-            if file.is_file() and file.suffix == ".pdf":
-                if self.__is_file_older_than_x_days(file, days=30):
-                    try:
-                        os.remove(file)
-                    except OSError:
-                        # TODO: Log error
-                        pass
+        """
+        Removes processed files older than the retention period, then, if a quota is
+        set, the oldest processed files until the output directory fits within it.
+
+        Expired day shards are removed as a whole. Only files left in the top level of
+        the output directory by earlier versions are checked one by one.
+        """
+        cutoff_date = (datetime.now() - timedelta(days=self.retention_days)).date()
+        today = datetime.now().date()
+        for entry in self.output_dir.iterdir():
+            try:
+                if entry.is_dir():
+                    self.__handle_shard(entry, cutoff_date, today)
+                elif entry.suffix == ".pdf" and self.__is_file_older_than_x_days(
+                    entry, days=self.retention_days
+                ):
+                    self.__remove(entry)
+            except OSError as err:
+                _logger().on_error(f"Cannot remove the expired {entry.name}: {err}")
+
+        if self.quota_bytes:
+            self.__enforce_quota()
+
+        if self.result_cache:
+            self.result_cache.evict()
+        if self.thumbnail_cache:
+            self.thumbnail_cache.evict()
+
+    def __handle_shard(self, shard, cutoff_date, today):
+        try:
+            shard_date = datetime.strptime(shard.name, SHARD_FORMAT).date()
+        except ValueError:
+            return  # not a shard
+
+        if shard_date < cutoff_date:
+            try:
+                shutil.rmtree(shard)
+            except OSError as err:
+                _logger().on_error(f"Cannot remove the expired {shard.name}: {err}")
+            if self.catalog:
+                self.catalog.remove_shard(shard)
+                # A shard only partly removed keeps the files that are left catalogued
+                for file in shard.rglob("*.pdf"):
+                    self.catalog.add(file)
+            if self.thumbnail_cache:
+                self.thumbnail_cache.remove_shard(shard)
+        elif shard_date < today and not any(shard.iterdir()):
+            shard.rmdir()
+
+    def __enforce_quota(self):
+        if self.catalog:
+            total = self.catalog.total_size()
+            entries = self.iter_files("date", descending=False)
+        else:
+            entries, _ = self.list_files(0, sys.maxsize, "date", descending=False)
+            total = sum(entry.size for entry in entries)
+
+        excess = total - self.quota_bytes
+        evicted = []
+        for entry in entries:
+            if excess <= 0:
+                break
+            evicted.append(entry)
+            excess -= entry.size
+
+        for entry in evicted:
+            try:
+                self.__remove(self.output_dir.joinpath(entry.name))
+            except OSError as err:
+                _logger().on_error(f"Cannot evict {entry.name} over quota: {err}")
 
     def handle_file_processing(self, file_path):
         """
@@ -58,25 +433,176 @@ class FileService:
         Returns:
             Optional[str]: An error message if the processing fails, otherwise None.
         """
+        result = process_file(file_path, self.get_options())
+        observe(result.metrics)
+        return result.error
+
+    def handle_batch(self, paths, workers=None):
+        """
+        This function handles the processing of multiple PDF files.
+        Files are fanned out to a bounded pool of worker processes, as the PDF work is
+        CPU-bound and would otherwise be serialised by the GIL.
+
+        Args:
+            paths (list[str]): The paths to the PDF files to process.
+            workers (Optional[int]): The maximum number of worker processes to use.
+                Defaults to the number of CPUs available.
+
+        Returns:
+            list[FileResult]: One result per input path, in input order.
+        """
+        paths = [str(path) for path in paths]
+        if not paths:
+            return []
+
+        workers = min(workers or os.cpu_count() or 1, len(paths))
+        if workers <= 1:
+            results = [process_file(path, self.get_options()) for path in paths]
+        else:
+            results = []
+            with new_worker_pool(workers, self.low_memory) as executor:
+                futures = [
+                    executor.submit(process_file, path, self.get_options())
+                    for path in paths
+                ]
+                for path, future in zip(paths, futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as err:
+                        results.append(failed_result(path, err))
+
+        for result in results:
+            observe(result.metrics)
+        return results
+
+    def iter_batch(self, paths, workers=None, cancelled=None, keep_inputs=False):
+        """
+        Processes multiple PDF files like `handle_batch`, but yields each result as soon
+        as its file is done, so that callers can report progress while the batch runs.
+
+        Only a few files per worker are queued at a time, so a cancelled batch stops
+        soon after the request. If a worker dies, the files the pool held fail and the
+        pool is replaced.
+
+        Args:
+            paths (list[str]): The paths to the PDF files to process.
+            workers (Optional[int]): The maximum number of worker processes to use.
+                Defaults to the number of CPUs available.
+            cancelled (Optional[threading.Event]): Once set, files that have not been
+                started are skipped. Files already being processed are let finish.
+            keep_inputs (bool): Whether to process the files in place and leave them
+                there, rather than removing them once processed (see `process_file`).
+
+        Yields:
+            FileResult: One result per processed file, in completion order.
+        """
+        paths = [str(path) for path in paths]
+        workers = min(workers or os.cpu_count() or 1, len(paths))
+        if workers <= 1:
+            for path in paths:
+                if cancelled is not None and cancelled.is_set():
+                    return
+                result = process_file(path, self.get_options(), keep_inputs)
+                observe(result.metrics)
+                yield result
+            return
+
+        def submit(path):
+            nonlocal executor
+            args = (process_file, path, self.get_options(), keep_inputs)
+            try:
+                return executor.submit(*args)
+            except BrokenProcessPool:
+                # A worker died, such as one killed for running out of memory. The
+                # files the pool held fail; the rest go to a new pool.
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = new_worker_pool(workers, self.low_memory)
+                return executor.submit(*args)
+
+        queue = iter(paths)
+        executor = new_worker_pool(workers, self.low_memory)
         try:
-            with open_pdf_document(file_path) as document:
-                credit_notes_pages = get_pages_with_credit_notes(document)
-                modified_document = replace_matches_in_pdf(document, credit_notes_pages)
-                save_modified_document(modified_document, document.name)
+            pending = {}
+            while True:
+                if cancelled is None or not cancelled.is_set():
+                    for path in islice(queue, workers * 4 - len(pending)):
+                        pending[submit(path)] = path
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as err:
+                        result = failed_result(path, err)
+                    observe(result.metrics)
+                    yield result
+        finally:
+            executor.shutdown()
+
+    def handle_bytes(self, data, filename, save_profile=None):
+        """
+        This function handles the processing of a PDF file held in memory.
+        Nothing is written to disk; the modified PDF is returned to the caller.
+
+        Args:
+            data (bytes): The contents of the PDF file to process.
+            filename (str): The name of the uploaded file, used in error messages.
+            save_profile (Optional[str]): Overrides the service's save profile.
+
+        Returns:
+            tuple[Optional[bytes], Optional[str]]: The modified PDF on success,
+                or an error message if the processing fails.
+        """
+        metrics = DocumentMetrics(filename)
+        output, error = None, None
+        try:
+            with record_document(metrics):
+                options = self.get_options(save_profile)
+                output = self.__process_bytes(data, filename, options, metrics)
         except (
-            PathNotFoundException,
             PathNotPDFFileException,
             NothingToModifyException,
             PDFCreationFailException,
         ) as err:
-            return str(err)
-        finally:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except OSError:
-                # TODO: Log error
-                pass
+            error = str(err)
+        observe(metrics.to_dict())
+        return output, error
+
+    def __process_bytes(self, data, filename, options, metrics):
+        cache_key = None
+        if options.result_cache:
+            cache_key = options.cache_key(ResultCache.digest_bytes(data))
+            output = options.result_cache.read(cache_key)
+            if output is not None:
+                metrics.cache_hit = True
+                return output
+
+        output = process_pdf_bytes(
+            data,
+            options.rules,
+            options.engine,
+            filename,
+            options.save_profile,
+            options.template_cache,
+            options.low_memory,
+        )
+        if cache_key:
+            options.result_cache.store_bytes(cache_key, output)
+        return output
+
+    def save_output(self, filename, data):
+        """
+        Writes a modified PDF produced by `handle_bytes` into the output directory.
+
+        Returns:
+            Path: The path the modified PDF was written to.
+        """
+        output_path = write_output(filename, data, get_shard_dir(self.output_dir))
+        self.get_options().record(output_path)
+        return output_path
 
     def handle_open(self, file=None):
         """
@@ -96,7 +622,75 @@ class FileService:
 
     def handle_delete(self, file):
         if file and file.is_file() and file.suffix == ".pdf":
+            self.__remove(file)
+
+    def __remove(self, file):
+        try:
             os.remove(file)
+        except FileNotFoundError:
+            pass  # already gone, but may still be catalogued
+        if self.catalog:
+            self.catalog.remove(file)
+        if self.thumbnail_cache:
+            self.thumbnail_cache.remove(file)
+
+    def list_files(self, offset=0, limit=50, sort="date", descending=True):
+        """
+        Returns a sorted slice of the processed files and the total number of files.
+        The slice is read from the catalog when there is one; otherwise the output
+        directory is listed.
+
+        Args:
+            offset (int): The number of files to skip.
+            limit (int): The maximum number of files to return.
+            sort (str): The key to sort by: "name", "date" or "size".
+            descending (bool): Whether to sort in descending order.
+
+        Returns:
+            tuple[list[CatalogEntry], int]: The requested files and the total count.
+        """
+        if self.catalog:
+            return (
+                self.catalog.page(offset, limit, sort, descending),
+                self.catalog.count(),
+            )
+
+        entries = []
+        for file in self.output_dir.rglob("*.pdf"):
+            if file.is_file():
+                stat = file.stat()
+                name = file.relative_to(self.output_dir).as_posix()
+                entries.append(CatalogEntry(name, stat.st_mtime, stat.st_size))
+        column = list(SORT_COLUMNS).index(sort) if sort in SORT_COLUMNS else 1
+        entries.sort(key=lambda entry: (entry[column], entry.name), reverse=descending)
+        return entries[offset : offset + limit], len(entries)
+
+    def iter_files(self, sort="date", descending=True, batch_size=500):
+        """
+        Yields every processed file, sorted as in `list_files`. With a catalog, files
+        are read `batch_size` at a time, so walking a large output directory holds
+        little memory.
+
+        Yields:
+            CatalogEntry: Each processed file.
+        """
+        if not self.catalog:
+            yield from self.list_files(0, sys.maxsize, sort, descending)[0]
+            return
+
+        offset = 0
+        while entries := self.catalog.page(offset, batch_size, sort, descending):
+            yield from entries
+            offset += len(entries)
+
+    def get_thumbnail(self, file):
+        """
+        Returns the first-page preview of a processed file, or None if previews are
+        disabled or the file cannot be rendered.
+        """
+        if not self.thumbnail_cache or not Path(file).is_file():
+            return None
+        return self.thumbnail_cache.get(file)
 
     def get_input_dir(self):
         return self.input_dir
@@ -104,6 +698,22 @@ class FileService:
     def get_output_dir(self):
         return self.output_dir
 
+    def get_options(self, save_profile=None):
+        """
+        Returns the settings files are processed with, optionally overriding the save
+        profile for a single job.
+        """
+        return ProcessingOptions(
+            self.output_dir,
+            self.rules,
+            self.engine,
+            self.result_cache,
+            self.catalog,
+            save_profile or self.save_profile,
+            self.template_cache,
+            self.low_memory,
+        )
+
     def run(self):
         if not self.running:
             self.file_watch_thread.start()
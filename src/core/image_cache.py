@@ -0,0 +1,104 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+
+import fitz
+
+
+class ImageCache:
+    """
+    LRU cache of decoded images bounded by their total size, keyed by a digest of
+    their content.
+
+    Documents produced by the same system tend to embed the same images (letterheads,
+    logos, stamps) under different xrefs. Keying by content lets a batch decode each
+    distinct image once per process, instead of once per occurrence.
+
+    The cache is shared by the threads of a process, such as the request threads of
+    the web app, so lookups are serialised by a lock.
+
+    Attributes:
+        max_bytes (int): The maximum total size of the decoded images held at once. An
+            image larger than this on its own is decoded every time.
+        hits (int): The number of lookups served from the cache.
+        misses (int): The number of lookups that required decoding the image.
+    """
+
+    def __init__(self, max_bytes=32 * 1024**2):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.__lock = Lock()
+        self.__pixmaps: OrderedDict[str, fitz.Pixmap] = OrderedDict()
+        self.__size = 0
+
+    @property
+    def size(self):
+        """
+        The total size of the decoded images held, in bytes.
+        """
+        return self.__size
+
+    def __len__(self):
+        return len(self.__pixmaps)
+
+    @staticmethod
+    def digest(document: fitz.Document, xref: int) -> str:
+        """
+        Computes the content digest of an image from its raw (still encoded) stream and
+        its object definition, which holds the filters and colour space used to decode it.
+        """
+        digest = blake2b(digest_size=20)
+        digest.update(document.xref_object(xref, compressed=True).encode("utf-8"))
+        digest.update(document.xref_stream_raw(xref) or b"")
+        return digest.hexdigest()
+
+    def get_pixmap(self, document: fitz.Document, xref: int, digest=None):
+        """
+        Returns the decoded image for an xref, decoding it only if an image with the
+        same content is not already cached.
+
+        Args:
+            document (fitz.Document): The document containing the image.
+            xref (int): The image reference ID in the document.
+            digest (Optional[str]): The content digest of the image, if already known.
+
+        Returns:
+            fitz.Pixmap: The decoded image.
+
+        Raises:
+            ValueError: If the xref does not refer to a decodable image.
+        """
+        if digest is None:
+            digest = self.digest(document, xref)
+
+        with self.__lock:
+            pixmap = self.__pixmaps.get(digest)
+            if pixmap is not None:
+                self.hits += 1
+                self.__pixmaps.move_to_end(digest)
+                return pixmap
+            self.misses += 1
+
+        pixmap = fitz.Pixmap(document, xref)
+        if pixmap.size > self.max_bytes:
+            return pixmap
+
+        with self.__lock:
+            if digest not in self.__pixmaps:
+                self.__pixmaps[digest] = pixmap
+                self.__size += pixmap.size
+            while self.__size > self.max_bytes:
+                _, evicted = self.__pixmaps.popitem(last=False)
+                self.__size -= evicted.size
+        return pixmap
+
+    def clear(self):
+        with self.__lock:
+            self.__pixmaps.clear()
+            self.__size = 0
+            self.hits = 0
+            self.misses = 0
+
+
+IMAGE_CACHE = ImageCache()
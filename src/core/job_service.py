@@ -0,0 +1,276 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+import os
+from threading import BoundedSemaphore, Lock, Thread
+from uuid import uuid4
+import zipfile
+
+from src.core.archive import pdf_members
+from src.core.error import ArchiveWithoutPDFsException
+from src.core.file_service import (
+    FileResult,
+    FileService,
+    failed_result,
+    new_worker_pool,
+    process_upload,
+)
+from src.core.logger import get_logger
+from src.core.metrics import observe
+
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class FileStatus:
+    """
+    The progress of a single file within a job.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.future: Future | None = None
+
+    @property
+    def result(self) -> FileResult | None:
+        if self.future is None or not self.future.done():
+            return None
+        try:
+            return self.future.result()
+        except Exception as err:
+            return failed_result(self.name, err)
+
+    @property
+    def state(self):
+        if self.result is not None:
+            return FAILED if self.result.error else DONE
+        if self.future is not None and self.future.running():
+            return RUNNING
+        return PENDING
+
+    @property
+    def finished(self):
+        return self.result is not None
+
+    @property
+    def output(self):
+        return self.result.output if self.result else None
+
+    @property
+    def error(self):
+        return self.result.error if self.result else None
+
+    @property
+    def seconds(self):
+        return round(self.result.seconds, 3) if self.result else None
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "state": self.state,
+            "output": os.path.basename(self.output) if self.output else None,
+            "error": self.error,
+            "seconds": self.seconds,
+        }
+
+
+class Job:
+    """
+    A batch of uploaded files, processed in the background by a `JobService`.
+    """
+
+    def __init__(self, names):
+        self.id = uuid4().hex
+        self.created = datetime.now()
+        self.files = [FileStatus(name) for name in names]
+
+    @property
+    def finished(self):
+        return all(file.finished for file in self.files)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "created": self.created.strftime("%Y-%m-%d %H:%M:%S"),
+            "finished": self.finished,
+            "total": len(self.files),
+            "completed": sum(file.finished for file in self.files),
+            "failed": sum(file.state == FAILED for file in self.files),
+            "files": [file.to_dict() for file in self.files],
+        }
+
+
+class JobService:
+    """
+    Accepts batches of uploaded files and processes them on a pool of worker processes,
+    so that callers (such as HTTP request handlers) can return as soon as the files
+    are queued and poll the job for progress.
+
+    Args:
+        file_service (FileService): Provides the settings files are processed with.
+        workers (Optional[int]): The number of worker processes. Defaults to the
+            number of CPUs available.
+        max_jobs (int): The number of jobs kept for status queries. The oldest finished
+            jobs are forgotten first.
+
+    Notes:
+        - If a worker process dies, such as one killed for running out of memory, the
+          files being processed by the pool fail and the pool is replaced, so that
+          later files are processed by a new pool.
+    """
+
+    def __init__(self, file_service: FileService, workers=None, max_jobs=100):
+        self.file_service = file_service
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.__jobs: OrderedDict[str, Job] = OrderedDict()
+        self.__lock = Lock()
+        self.__executor = None
+
+    def __get_executor(self):
+        if self.__executor is None:
+            self.__executor = new_worker_pool(
+                self.workers, self.file_service.low_memory
+            )
+        return self.__executor
+
+    def __submit(self, data, name, options) -> Future:
+        with self.__lock:
+            executor = self.__get_executor()
+        try:
+            return executor.submit(process_upload, data, name, options)
+        except BrokenProcessPool:
+            with self.__lock:
+                if self.__executor is executor:
+                    self.__executor = None
+                    executor.shutdown(wait=False, cancel_futures=True)
+                executor = self.__get_executor()
+        try:
+            return executor.submit(process_upload, data, name, options)
+        except BrokenProcessPool as err:
+            future = Future()
+            future.set_exception(err)
+            return future
+
+    def __forget_old_jobs(self):
+        finished = [job_id for job_id, job in self.__jobs.items() if job.finished]
+        while len(self.__jobs) > self.max_jobs and finished:
+            del self.__jobs[finished.pop(0)]
+
+    def submit(self, uploads, save_profile=None) -> Job:
+        """
+        Queues uploaded files for processing and returns immediately.
+
+        Args:
+            uploads (list[tuple[str, bytes]]): The name and contents of each file.
+            save_profile (Optional[str]): The save profile of the job's files. Defaults
+                to the file service's profile.
+
+        Returns:
+            Job: The job tracking the queued files.
+        """
+        job = Job([name for name, _ in uploads])
+        options = self.file_service.get_options(save_profile)
+        for status, (name, data) in zip(job.files, uploads):
+            future = self.__submit(data, name, options)
+            status.future = future
+            future.add_done_callback(lambda _, status=status: self.__observe(status))
+
+        with self.__lock:
+            self.__jobs[job.id] = job
+            self.__forget_old_jobs()
+        return job
+
+    def submit_archive(self, archive_path, save_profile=None) -> Job:
+        """
+        Queues the PDF files of a ZIP archive for processing and returns immediately.
+
+        The members are read from the archive one at a time by a background thread,
+        and only a few files per worker are held in memory at once, so an archive of
+        any size is processed with flat memory use. The archive is removed once every
+        member has been read.
+
+        Args:
+            archive_path (Path): The ZIP archive saved from the upload.
+            save_profile (Optional[str]): The save profile of the job's files.
+
+        Returns:
+            Job: The job tracking the PDF files of the archive.
+
+        Raises:
+            zipfile.BadZipFile: If the file is not a ZIP archive. It is removed.
+            ArchiveWithoutPDFsException: If the archive holds no PDF files. It is
+                removed, and no job is created.
+        """
+        try:
+            archive = zipfile.ZipFile(archive_path)
+        except (zipfile.BadZipFile, OSError):
+            os.remove(archive_path)
+            raise
+
+        members = pdf_members(archive)
+        if not members:
+            archive.close()
+            os.remove(archive_path)
+            raise ArchiveWithoutPDFsException(archive_path)
+
+        job = Job([name for _, name in members])
+        with self.__lock:
+            self.__jobs[job.id] = job
+            self.__forget_old_jobs()
+
+        options = self.file_service.get_options(save_profile)
+        Thread(
+            target=self.__feed_archive,
+            args=(archive, archive_path, members, job, options),
+            daemon=True,
+        ).start()
+        return job
+
+    def __feed_archive(self, archive, archive_path, members, job, options):
+        in_flight = BoundedSemaphore(self.workers * 2)
+        try:
+            for status, (info, name) in zip(job.files, members):
+                in_flight.acquire()
+                try:
+                    data = archive.read(info)
+                    future = self.__submit(data, name, options)
+                except Exception as err:  # such as a corrupt member
+                    future = Future()
+                    future.set_exception(err)
+                data = None
+                status.future = future
+                future.add_done_callback(
+                    lambda _, status=status: self.__finish(status, in_flight)
+                )
+        finally:
+            archive.close()
+            try:
+                os.remove(archive_path)
+            except OSError as err:
+                get_logger("fiscalpdf.jobs").on_error(
+                    f"Cannot remove the archive {archive_path}: {err}"
+                )
+
+    @classmethod
+    def __finish(cls, status: FileStatus, in_flight: BoundedSemaphore):
+        in_flight.release()
+        cls.__observe(status)
+
+    @staticmethod
+    def __observe(status: FileStatus):
+        if status.result is not None:
+            observe(status.result.metrics)
+
+    def get(self, job_id):
+        with self.__lock:
+            return self.__jobs.get(job_id)
+
+    def shutdown(self):
+        if self.__executor is not None:
+            self.__executor.shutdown(cancel_futures=True)
+            self.__executor = None
@@ -1,6 +1,7 @@
 import logging
+from threading import Lock
 
-from src.config import APP_DIR
+from src import config
 
 
 class Logger:
@@ -16,7 +17,7 @@ class Logger:
         self.__logger.setLevel(log_level)
 
         stream_handler = logging.StreamHandler()
-        file_handler = logging.FileHandler(APP_DIR.joinpath("logs.txt"))
+        file_handler = logging.FileHandler(config.APP_DIR.joinpath("logs.txt"))
         stream_handler.setFormatter(self.get_formatter())
         self.__logger.addHandler(stream_handler)
         self.__logger.addHandler(file_handler)
@@ -51,3 +52,18 @@ class Logger:
     def get_formatter():
         formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
         return formatter
+
+
+_loggers = {}
+_loggers_lock = Lock()
+
+
+def get_logger(name):
+    """
+    Returns the logger of the given name, creating it on first use. Loggers are
+    shared so that their handlers are only added once.
+    """
+    with _loggers_lock:
+        if name not in _loggers:
+            _loggers[name] = Logger(name)
+        return _loggers[name]
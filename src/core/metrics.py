@@ -0,0 +1,297 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import sys
+from threading import Lock
+from time import perf_counter
+
+from src.core.error import (
+    NothingToModifyException,
+    PDFCreationFailException,
+    PathNotFoundException,
+    PathNotPDFFileException,
+)
+from src.core.logger import get_logger
+
+
+STAGES = ("open", "detect", "graphics", "images", "text", "save")
+COUNTERS = ("pages", "spans", "paths", "images", "matches")
+ERROR_TYPES = tuple(
+    error.__name__
+    for error in (
+        NothingToModifyException,
+        PDFCreationFailException,
+        PathNotFoundException,
+        PathNotPDFFileException,
+    )
+)
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # resets the peak resident set size of the process
+    except OSError:
+        pass  # not Linux, so the peak of the whole process is reported
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in bytes, or None if it cannot
+    be measured on this platform.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass  # not Linux
+
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class DocumentMetrics:
+    """
+    The stage timings and counters collected while processing a single document.
+
+    Metrics are plain data so that worker processes can return them alongside their
+    results, to be aggregated by the parent process.
+
+    The peak resident set size is that of the process while the document was recorded.
+    On Linux, it is reset when recording starts, so it is attributed to the document as
+    long as the process handles one document at a time. Elsewhere it is the peak of the
+    whole process so far, which only a fresh worker process per document attributes
+    to that document.
+    """
+
+    def __init__(self, name):
+        self.name = str(name)
+        self.seconds = {}
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.error = None
+        self.cache_hit = False
+        self.total = 0.0
+        self.peak_rss = None
+
+    def add_time(self, stage, seconds):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def count(self, counter, n=1):
+        self.counts[counter] += n
+
+    def record_peak_rss(self, peak):
+        if peak is not None:
+            self.peak_rss = max(self.peak_rss or 0, peak)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "seconds": {stage: round(s, 6) for stage, s in self.seconds.items()},
+            "total": round(self.total, 6),
+            "counts": dict(self.counts),
+            "cache_hit": self.cache_hit,
+            "error": self.error,
+            "peak_rss": self.peak_rss,
+        }
+
+
+_current: ContextVar[DocumentMetrics | None] = ContextVar(
+    "document_metrics", default=None
+)
+
+
+@contextmanager
+def record_document(metrics: DocumentMetrics):
+    """
+    Collects the timers and counters of the pipeline into the given metrics while the
+    block runs. The total time and the peak resident set size are recorded, along with
+    the type of any error raised.
+    """
+    token = _current.set(metrics)
+    _reset_peak_rss()
+    start = perf_counter()
+    try:
+        yield metrics
+    except Exception as err:
+        metrics.error = type(err).__name__
+        raise
+    finally:
+        metrics.total = perf_counter() - start
+        metrics.record_peak_rss(peak_rss())
+        _current.reset(token)
+
+
+@contextmanager
+def timer(stage):
+    """
+    Adds the time spent in the block to a stage of the document being recorded, if any.
+    Time spent in the same stage several times (such as once per page) accumulates.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(stage, perf_counter() - start)
+
+
+def count(counter, n=1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(counter, n)
+
+
+def merge(other: DocumentMetrics):
+    """
+    Adds the stage timings and counters collected by a worker process to the document
+    being recorded, if any. Workers run side by side, so the merged stage timings may
+    add up to more than the total time of the document. The peak resident set size of
+    the document becomes the highest of its own and that of any of its workers.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return
+    for stage, seconds in other.seconds.items():
+        metrics.add_time(stage, seconds)
+    for counter, n in other.counts.items():
+        metrics.count(counter, n)
+    metrics.record_peak_rss(other.peak_rss)
+
+
+class MetricsRegistry:
+    """
+    Aggregates the metrics of processed documents and renders them in the Prometheus
+    text exposition format.
+
+    Stage and document latencies are kept as histograms; pipeline counters, document
+    outcomes and error types as counters. The highest peak resident set size of any
+    document is kept as a gauge, to size the memory of workers against.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__stages = {stage: self.__histogram() for stage in STAGES}
+        self.__documents = self.__histogram()
+        self.__counts = dict.fromkeys(COUNTERS, 0)
+        self.__outcomes = {"processed": 0, "cached": 0, "failed": 0}
+        self.__errors = dict.fromkeys(ERROR_TYPES, 0)
+        self.__peak_rss = 0
+
+    def __histogram(self):
+        return {"buckets": [0] * (len(self.BUCKETS) + 1), "sum": 0.0, "count": 0}
+
+    def __observe(self, histogram, seconds):
+        histogram["buckets"][bisect_left(self.BUCKETS, seconds)] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+    def observe(self, metrics: dict):
+        """
+        Adds the metrics of a processed document, as returned by `DocumentMetrics.to_dict`.
+        """
+        with self.__lock:
+            for stage, seconds in metrics["seconds"].items():
+                if stage not in self.__stages:
+                    self.__stages[stage] = self.__histogram()
+                self.__observe(self.__stages[stage], seconds)
+            self.__observe(self.__documents, metrics["total"])
+
+            for counter, n in metrics["counts"].items():
+                self.__counts[counter] = self.__counts.get(counter, 0) + n
+            self.__peak_rss = max(self.__peak_rss, metrics.get("peak_rss") or 0)
+
+            if metrics["error"]:
+                self.__outcomes["failed"] += 1
+                error = metrics["error"]
+                self.__errors[error] = self.__errors.get(error, 0) + 1
+            elif metrics["cache_hit"]:
+                self.__outcomes["cached"] += 1
+            else:
+                self.__outcomes["processed"] += 1
+
+    def __render_histogram(self, lines, name, histogram, labels=""):
+        cumulative = 0
+        for bound, n in zip((*self.BUCKETS, "+Inf"), histogram["buckets"]):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        suffix = f"{{{labels.rstrip(',')}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {histogram['sum']}")
+        lines.append(f"{name}_count{suffix} {histogram['count']}")
+
+    def render(self) -> str:
+        lines = []
+        with self.__lock:
+            lines.append(
+                "# HELP fiscalpdf_stage_seconds Time spent in each processing stage "
+                "per document."
+            )
+            lines.append("# TYPE fiscalpdf_stage_seconds histogram")
+            for stage, histogram in self.__stages.items():
+                self.__render_histogram(
+                    lines, "fiscalpdf_stage_seconds", histogram, f'stage="{stage}",'
+                )
+
+            lines.append(
+                "# HELP fiscalpdf_document_seconds Time spent processing each document."
+            )
+            lines.append("# TYPE fiscalpdf_document_seconds histogram")
+            self.__render_histogram(
+                lines, "fiscalpdf_document_seconds", self.__documents
+            )
+
+            lines.append("# HELP fiscalpdf_documents_total Documents by outcome.")
+            lines.append("# TYPE fiscalpdf_documents_total counter")
+            for outcome, n in self.__outcomes.items():
+                lines.append(f'fiscalpdf_documents_total{{outcome="{outcome}"}} {n}')
+
+            lines.append(
+                "# HELP fiscalpdf_items_total Pages, spans, paths, images and matches "
+                "processed."
+            )
+            lines.append("# TYPE fiscalpdf_items_total counter")
+            for counter, n in self.__counts.items():
+                lines.append(f'fiscalpdf_items_total{{kind="{counter}"}} {n}')
+
+            lines.append(
+                "# HELP fiscalpdf_errors_total Failed documents by error type."
+            )
+            lines.append("# TYPE fiscalpdf_errors_total counter")
+            for error, n in self.__errors.items():
+                lines.append(f'fiscalpdf_errors_total{{type="{error}"}} {n}')
+
+            lines.append(
+                "# HELP fiscalpdf_document_peak_rss_bytes The highest peak resident set "
+                "size of a process while processing a document."
+            )
+            lines.append("# TYPE fiscalpdf_document_peak_rss_bytes gauge")
+            lines.append(f"fiscalpdf_document_peak_rss_bytes {self.__peak_rss}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+def observe(metrics: dict | None):
+    """
+    Adds the metrics of a processed document to `METRICS` and logs them as a single
+    structured (JSON) line.
+    """
+    if not metrics:
+        return
+    METRICS.observe(metrics)
+    get_logger("fiscalpdf.metrics").on_info(
+        json.dumps(metrics, sort_keys=True), prefix="document "
+    )
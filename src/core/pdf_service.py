@@ -1,9 +1,14 @@
-from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+import multiprocessing
+import os
 from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import RLock
+from typing import NamedTuple
 import fitz
 from pymupdf import Document, FileDataError
-import re
 
 from src.core.error import (
     PDFCreationFailException,
@@ -11,10 +16,111 @@ from src.core.error import (
     PathNotPDFFileException,
     NothingToModifyException,
 )
-from src.config import OUTPUT_DIR
+from src.core.image_cache import IMAGE_CACHE, ImageCache
+from src.core.metrics import DocumentMetrics, count, merge, record_document, timer
+from src.core.rules import DEFAULT_RULES, RuleSet
+from src.core.template_cache import TemplateCache
+from src.core.text_cache import (
+    PageTextCache,
+    register_text_cache,
+    release_text_cache,
+    text_cache_for,
+)
+from src import config
+
+
+RECONSTRUCT_ENGINE = "reconstruct"
+REDACT_ENGINE = "redact"
+XOBJECT_ENGINE = "xobject"
+ENGINES = (RECONSTRUCT_ENGINE, REDACT_ENGINE, XOBJECT_ENGINE)
+
+# PyMuPDF is not thread-safe. Every document is opened, processed, saved and closed
+# while holding this lock, so that the threads of a process, such as web request threads
+# or the desktop app's preview thread, take turns. Worker processes each have their own.
+FITZ_LOCK = RLock()
+
+# Worker processes are spawned rather than forked. A forked worker would inherit
+# FITZ_LOCK as held by another thread of the parent, one it does not have, and then
+# block on its first document for good.
+WORKER_CONTEXT = multiprocessing.get_context("spawn")
+
+# Bump whenever a change alters the documents produced, to invalidate cached results.
+ENGINE_VERSION = 3
+
+# Detection strategies of `find_matches`
+TEXT_DETECTION = "text"
+SEARCH_DETECTION = "search"
+DETECTION_STRATEGIES = (TEXT_DETECTION, SEARCH_DETECTION)
+
+# The fewest matched pages worth handing to a worker process of their own. Smaller
+# ranges spend more time starting workers and merging than they save.
+MIN_PAGES_PER_RANGE = 8
+
+# In low-memory mode, MuPDF's store of decoded fonts, images and other resources is
+# emptied after every LOW_MEMORY_STORE_INTERVAL pages rewritten. Emptying it after each
+# page would decode the fonts shared by every page again and again. The new document
+# is written out to a temporary file every LOW_MEMORY_SPILL_INTERVAL pages.
+LOW_MEMORY_STORE_INTERVAL = 16
+LOW_MEMORY_SPILL_INTERVAL = 64
+
+
+class SaveProfile(NamedTuple):
+    """
+    The options a modified document is saved with (see `fitz.Document.save`).
+
+    Attributes:
+        garbage (int): The garbage collection level. 3 and above dedupe objects.
+        deflate (bool): Whether to compress uncompressed streams.
+        deflate_images (bool): Whether to compress uncompressed image streams.
+        deflate_fonts (bool): Whether to compress uncompressed font streams.
+        use_objstms (bool): Whether to pack objects into compressed object streams.
+        compression_effort (int): The compression effort, from 0 (default) to 100.
+    """
+
+    garbage: int = 0
+    deflate: bool = True
+    deflate_images: bool = False
+    deflate_fonts: bool = False
+    use_objstms: bool = False
+    compression_effort: int = 0
+
+
+FAST_PROFILE = "fast"
+BALANCED_PROFILE = "balanced"
+COMPACT_PROFILE = "compact"
+SAVE_PROFILES = {
+    # No compression at all: the quickest save, for bulk runs, at several times the size
+    FAST_PROFILE: SaveProfile(deflate=False),
+    BALANCED_PROFILE: SaveProfile(),
+    # Deduped, garbage collected and fully compressed, for archival
+    COMPACT_PROFILE: SaveProfile(
+        garbage=4,
+        deflate_images=True,
+        deflate_fonts=True,
+        use_objstms=True,
+        compression_effort=100,
+    ),
+}
+
+
+def get_save_options(
+    profile: str = BALANCED_PROFILE, engine: str | None = None
+) -> dict:
+    """
+    Returns the keyword arguments of `fitz.Document.save` for a named save profile.
 
+    Documents rewritten by `REDACT_ENGINE` are always garbage collected, as redaction
+    leaves the content streams it replaced behind, unreferenced.
 
-CREDIT_NOTE_PATTERN = r"Credit Note:\s*[\w/]+"
+    Raises:
+        ValueError: If the profile is not one of `SAVE_PROFILES`.
+    """
+    if profile not in SAVE_PROFILES:
+        raise ValueError(f"Unknown save profile: {profile}")
+    options = SAVE_PROFILES[profile]._asdict()
+    if engine == REDACT_ENGINE:
+        options["garbage"] = max(options["garbage"], 1)
+    return options
 
 
 @contextmanager
@@ -26,33 +132,178 @@ def open_pdf_document(file_path: str):
     if not Path.is_file(path) or path.suffix.lower() != ".pdf":
         raise PathNotPDFFileException(file_path)
 
-    doc = None
-    try:
-        doc = fitz.open(file_path)
-        yield doc
-    except FileDataError as e:
-        raise PathNotPDFFileException(file_path) from e
-    finally:
-        if doc is not None:
-            doc.close()
+    with FITZ_LOCK:
+        doc = None
+        try:
+            with timer("open"):
+                doc = fitz.open(file_path)
+            count("pages", len(doc))
+            register_text_cache(doc)
+            yield doc
+        except FileDataError as e:
+            raise PathNotPDFFileException(file_path) from e
+        finally:
+            if doc is not None:
+                release_text_cache(doc)
+                doc.close()
+
+
+@contextmanager
+def open_pdf_stream(data: bytes, name: str = "<stream>"):
+    """
+    Opens a PDF document from an in-memory buffer, without touching the disk.
+
+    Args:
+        data (bytes): The contents of the PDF file.
+        name (str): The name of the document, used in error messages.
+
+    Raises:
+        PathNotPDFFileException: If the data is empty or not a valid PDF.
+    """
+    with FITZ_LOCK:
+        doc = None
+        try:
+            with timer("open"):
+                doc = fitz.open(stream=data, filetype="pdf")
+            count("pages", len(doc))
+            register_text_cache(doc)
+            yield doc
+        except FileDataError as e:
+            raise PathNotPDFFileException(name) from e
+        finally:
+            if doc is not None:
+                release_text_cache(doc)
+                doc.close()
+
+
+class PageMatches(NamedTuple):
+    """
+    A page of a document that contains matches of a rule set.
+
+    Attributes:
+        page (int): The page index (0-based).
+        rects (list[fitz.Rect]): The areas of the page covered by the matches, one per
+            line of each match. Only `SEARCH_DETECTION` locates matches; it is empty
+            with `TEXT_DETECTION`.
+    """
+
+    page: int
+    rects: list
+
+
+def _search_page(text_cache: PageTextCache, page_num: int, rules: RuleSet):
+    """
+    Returns the areas of a page covered by matches of the rule set, or None if the page
+    has none.
+
+    The rules' literal anchors are first looked up with PyMuPDF's native search, which
+    rejects pages without them before their text is extracted. The regex then runs over
+    the text of the remaining pages, and each distinct match is located on the page by
+    searching for its text, with line breaks folded into spaces. A match that cannot be
+    located still counts, so the page is never missed.
+    """
+    if not any(text_cache.search_for(page_num, anchor) for anchor in rules.anchors):
+        return None
+
+    text = text_cache.get_text(page_num)
+    needles = dict.fromkeys(" ".join(m.group().split()) for m in rules.finditer(text))
+    if not needles:
+        return None
+
+    rects = []
+    for needle in needles:
+        rects.extend(text_cache.search_for(page_num, needle))
+    return rects
+
+
+def find_matches(
+    document: Document,
+    rules: RuleSet = DEFAULT_RULES,
+    strategy: str = TEXT_DETECTION,
+    low_memory: bool = False,
+) -> list[PageMatches]:
+    """
+    Finds the pages of a document that contain matches of the given rule set.
+
+    Two strategies are available:
+    - `TEXT_DETECTION` extracts the plain text of every page and runs the rules over it,
+      after a case-folded check for their anchors. It does not locate the matches.
+    - `SEARCH_DETECTION` rejects pages without an anchor using PyMuPDF's native search,
+      runs the rules over the text of the remaining pages only, and locates the matches.
+
+    Args:
+        document (fitz.Document): The document to search.
+        rules (RuleSet): The redaction rules to look for.
+        strategy (str): The detection strategy, one of `DETECTION_STRATEGIES`.
+        low_memory (bool): Whether to drop the text of every page once it has been
+            searched, so that matched pages are parsed again when rewritten.
+
+    Returns:
+        list[PageMatches]: The pages with matches, in page order.
+
+    Raises:
+        ValueError: If the strategy is not one of `DETECTION_STRATEGIES`.
+
+    Notes:
+        - The text of matched pages stays in the document's text cache, so rewriting
+          those pages does not parse them again. Pages without matches are dropped from
+          the cache. On long documents with many matches this holds the text of most
+          pages at once, which `low_memory` avoids.
+        - PyMuPDF's search ignores ASCII case only, so anchors with other letters are
+          matched exactly by `SEARCH_DETECTION`.
+    """
+    if strategy not in DETECTION_STRATEGIES:
+        raise ValueError(f"Unknown detection strategy: {strategy}")
+
+    found = []
+    with timer("detect"), text_cache_for(document) as text_cache:
+        for page_num in range(len(document)):
+            if strategy == SEARCH_DETECTION:
+                rects = _search_page(text_cache, page_num, rules)
+                matched = rects is not None
+            else:
+                rects = []
+                matched = rules.search(text_cache.get_text(page_num)) is not None
+
+            if matched:
+                found.append(PageMatches(page_num, rects))
+            if low_memory or not matched:
+                text_cache.discard(page_num)
+    return found
+
+
+def get_pages_with_credit_notes(
+    document: Document,
+    rules: RuleSet = DEFAULT_RULES,
+    strategy: str = TEXT_DETECTION,
+    low_memory: bool = False,
+):
+    """
+    Returns the indices of the pages of a document that contain matches of the given
+    rule set, found with the given detection strategy (see `find_matches`).
+    """
+    found = find_matches(document, rules, strategy, low_memory)
+    return [matches.page for matches in found]
 
 
-def get_pages_with_credit_notes(document: Document):
-    pages = []
-    for page_num in range(len(document)):
-        page = document.load_page(page_num)
-        if re.search(CREDIT_NOTE_PATTERN, page.get_text()):  # type: ignore
-            pages.append(page_num)
-    return pages
+def extract_credit_notes(extracted: str, rules: RuleSet = DEFAULT_RULES):
+    return rules.findall(extracted)
 
 
-def extract_credit_notes(extracted: str):
-    return re.findall(CREDIT_NOTE_PATTERN, extracted, re.IGNORECASE)
+def release_memory():
+    """
+    Empties MuPDF's store of decoded fonts, images and other resources, and the cache
+    of decoded images shared across documents. They are decoded again the next time a
+    document needs them.
+    """
+    with FITZ_LOCK:
+        fitz.TOOLS.store_shrink(100)
+    IMAGE_CACHE.clear()
 
 
-def get_output_path(filename: str, output_dir=OUTPUT_DIR):
+def get_output_path(filename: str, output_dir=None):
     output_name = f"modified_{Path(filename).name}"
-    return output_dir.joinpath(output_name)
+    return Path(output_dir or config.OUTPUT_DIR).joinpath(output_name)
 
 
 def _draw_graphics_onto_canvas(paths, canvas):
@@ -156,7 +407,14 @@ def _draw_graphics_onto_canvas(paths, canvas):
     canvas.commit()
 
 
-def _draw_images_onto_page(document, original_page, new_page, image_info_list):
+def _draw_images_onto_page(
+    document,
+    original_page,
+    new_page,
+    image_info_list,
+    inserted_images: dict[str, int],
+    image_cache: ImageCache = IMAGE_CACHE,
+):
     """
     Draws images from an existing PDF page onto a new page, preserving their original positions.
 
@@ -166,6 +424,9 @@ def _draw_images_onto_page(document, original_page, new_page, image_info_list):
     as a fallback. If an image reference (xref) is invalid (0), a default value of 11 is used
     based on empirical observations from previously processed PDFs.
 
+    Each distinct image is embedded into the new document only once. Later occurrences,
+    on the same page or any other page of the new document, reference the embedded copy.
+
     Args:
         document (fitz.Document): The PDF document object containing image references.
         original_page (fitz.Page): The source page from which image bounding boxes are derived.
@@ -174,6 +435,9 @@ def _draw_images_onto_page(document, original_page, new_page, image_info_list):
             Each dictionary should include:
                 - "xref" (int): The image reference ID in the PDF.
                 - "bbox" (fitz.Rect | None): The bounding box defining where the image appears.
+        inserted_images (dict[str, int]): Maps image content digests to the xrefs of the
+            images already embedded in the new document. Updated as images are embedded.
+        image_cache (ImageCache): The cache of decoded images shared across documents.
 
     Raises:
         PDFCreationFailException: If an image cannot be rendered or inserted due to
@@ -183,8 +447,8 @@ def _draw_images_onto_page(document, original_page, new_page, image_info_list):
         - If `bbox` is missing or `None`, the image is drawn over the full page.
         - If `xref` equals 0, it defaults to 11 (a workaround for certain malformed PDFs
           where image references were missing but 11 was valid).
-        - The image is inserted using `page.insert_image(bbox, pixmap=pix)` to preserve
-          aspect ratio and positioning.
+        - The first occurrence is inserted using `page.insert_image(bbox, pixmap=pix)` to
+          preserve aspect ratio and positioning; later ones use `insert_image(bbox, xref=...)`.
     """
     for info in image_info_list:
         xref = info["xref"]
@@ -197,13 +461,19 @@ def _draw_images_onto_page(document, original_page, new_page, image_info_list):
             xref = 11
 
         try:
-            pix = fitz.Pixmap(document, xref)
-            new_page.insert_image(bbox, pixmap=pix)
+            digest = image_cache.digest(document, xref)
+            new_xref = inserted_images.get(digest)
+            if new_xref is not None:
+                new_page.insert_image(bbox, xref=new_xref)
+                continue
+
+            pix = image_cache.get_pixmap(document, xref, digest)
+            inserted_images[digest] = new_page.insert_image(bbox, pixmap=pix)
         except ValueError as err:
             raise PDFCreationFailException(f"Failed to render graphics to page: {err}")
 
 
-def _draw_text_onto_page(page: fitz.Page, text_blocks: list[dict], replace_text: str):
+def _draw_text_onto_page(page: fitz.Page, text_blocks: list[dict], rules: RuleSet):
     """
     Redraws text onto a PDF page, replacing matches of a given pattern with new text,
     while preserving the original positioning of each text span.
@@ -211,7 +481,8 @@ def _draw_text_onto_page(page: fitz.Page, text_blocks: list[dict], replace_text:
     This function iterates through all text blocks and their corresponding lines and spans,
     extracts the bounding box coordinates, and re-inserts the text onto the page. The
     bottom-left point of the bounding box (x1, y2) is used as the insertion point to ensure
-    alignment with the original layout.
+    alignment with the original layout. The spans are collected into a single shape that
+    is committed to the page once, rather than appending a content stream per span.
 
     As Illustrated:
         (x1, y1) -> ---------- <- (x2, y1)
@@ -223,8 +494,7 @@ def _draw_text_onto_page(page: fitz.Page, text_blocks: list[dict], replace_text:
         text_blocks (list[dict]): A list of text block dictionaries obtained from
             `page.get_text("dict")`. Each block contains lines, and each line contains spans
             with text and bounding box coordinates.
-        replace_text (str): The replacement text that substitutes any substring matching
-            `CREDIT_NOTE_PATTERN`.
+        rules (RuleSet): The redaction rules whose matches are substituted in each span.
 
     Raises:
         PDFCreationFailException: If a span is missing a bounding box or text, or if text
@@ -234,10 +504,13 @@ def _draw_text_onto_page(page: fitz.Page, text_blocks: list[dict], replace_text:
         - The indices `0` and `3` from the bounding box represent `x1` (leftmost x-coordinate)
         and `y2` (bottom y-coordinate), ensuring proper alignment with the original text baseline.
         - The inserted text uses the "helv" font (a standard Helvetica font) to prevent
+        missing font errors. Being one of the base-14 fonts, it is referenced rather than
+        embedded; `fitz.TextWriter` would embed a copy of it in every document.
     """
     bbox_x = 0
     bbox_y = 3
 
+    shape = page.new_shape()
     for block in text_blocks:  # type: ignore
         for line in block.get("lines", []):  # type: ignore
             for span in line.get("spans", []):
@@ -253,36 +526,385 @@ def _draw_text_onto_page(page: fitz.Page, text_blocks: list[dict], replace_text:
                         "Failed to redraw text to page: No text found"
                     )
 
-                if re.search(CREDIT_NOTE_PATTERN, text, re.IGNORECASE):
-                    text = re.sub(
-                        CREDIT_NOTE_PATTERN, replace_text, text, flags=re.IGNORECASE
-                    )
-                page.insert_text(
+                text, matches = rules.subn(text)
+                count("spans")
+                count("matches", matches)
+                shape.insert_text(
                     (bbox[bbox_x], bbox[bbox_y]),
                     text,
                     fontsize=span["size"],
                     fontname="helv",  # use standard font to avoid missing font errors
                     color=(0, 0, 0),
                 )
+    shape.commit()
+
+
+def _find_matches_on_page(text_dict: dict, rules: RuleSet):
+    """
+    Locates every match of a rule set on a page at character level.
+
+    Matches are searched for within each text span, mirroring how the reconstruction
+    engine applies replacements. The bounding box of each match is the union of the
+    bounding boxes of its characters.
+
+    Args:
+        text_dict (dict): The page contents, as returned by `page.get_text("rawdict")`.
+        rules (RuleSet): The redaction rules to match.
+
+    Returns:
+        list[tuple[fitz.Rect, fitz.Point, float, str]]: For each match, its bounding box,
+            the origin (baseline start) of its first character, the font size of its span,
+            and the text to write in its place.
+    """
+    matches = []
+    for block in text_dict.get("blocks", []):
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                count("spans")
+                chars = span.get("chars", [])
+                text = "".join(char["c"] for char in chars)
+                for match in rules.finditer(text):
+                    rect = fitz.Rect()
+                    for char in chars[match.start() : match.end()]:
+                        rect |= char["bbox"]
+                    origin = fitz.Point(chars[match.start()]["origin"])
+                    replacement = rules.replacement_for(match)
+                    matches.append((rect, origin, span["size"], replacement))
+    return matches
+
+
+def _redact_matches_on_page(page: fitz.Page, matches: list):
+    """
+    Replaces the matches on a page in place using PyMuPDF's native redaction.
+
+    Only the characters of each match are removed; images, vector graphics and all other
+    text on the page are left untouched. The replacement text is then written at the
+    baseline of the removed match.
+
+    Args:
+        page (fitz.Page): The PDF page to modify.
+        matches (list): The matches on the page, from `_find_matches_on_page`.
+
+    Raises:
+        PDFCreationFailException: If the redactions cannot be applied.
+
+    Notes:
+        - Span bounding boxes include the line spacing and overlap neighbouring lines,
+          so each redaction rectangle is narrowed to the band just above the baseline.
+          This keeps the redaction from removing characters on adjacent lines.
+    """
+    count("matches", len(matches))
+    for rect, origin, size, _ in matches:
+        band = fitz.Rect(rect.x0, origin.y - size * 0.75, rect.x1, origin.y)
+        page.add_redact_annot(band, fill=False)
+
+    try:
+        page.apply_redactions(
+            images=fitz.PDF_REDACT_IMAGE_NONE,
+            graphics=fitz.PDF_REDACT_LINE_ART_NONE,
+        )
+    except (RuntimeError, ValueError) as err:
+        raise PDFCreationFailException(f"Failed to apply redactions to page: {err}")
+
+    shape = page.new_shape()
+    for _, origin, size, replacement in matches:
+        shape.insert_text(
+            origin,
+            replacement,
+            fontsize=size,
+            fontname="helv",  # use standard font to avoid missing font errors
+            color=(0, 0, 0),
+        )
+    shape.commit()
+
+
+def _iter_pages(pages, text_cache: PageTextCache, low_memory: bool = False):
+    """
+    Yields the pages to rewrite, dropping the text of each page from the cache once it
+    has been rewritten. In low-memory mode, MuPDF's store is also emptied every
+    `LOW_MEMORY_STORE_INTERVAL` pages.
+    """
+    for index, page_num in enumerate(pages, 1):
+        yield page_num
+        text_cache.discard(page_num)
+        if low_memory and index % LOW_MEMORY_STORE_INTERVAL == 0:
+            release_memory()
+
+
+def _spill_document(new_document: fitz.Document, spill_path: Path | None):
+    """
+    Writes the pages of a document being built out to a file every
+    `LOW_MEMORY_SPILL_INTERVAL` pages, and reopens the document from it, so that MuPDF
+    drops the objects it holds in memory. The file is saved incrementally after the
+    first time, so only the pages added since are written.
+
+    Returns:
+        fitz.Document: The document to continue building, which is the given document
+            unless it was spilled.
+    """
+    if spill_path is None or len(new_document) % LOW_MEMORY_SPILL_INTERVAL:
+        return new_document
+    if spill_path.exists():
+        new_document.saveIncr()
+    else:
+        new_document.save(spill_path)
+    new_document.close()
+    return fitz.open(spill_path)
+
+
+def _load_spilled_document(new_document: fitz.Document, spill_path: Path | None):
+    """
+    Returns a document built with `_spill_document` opened from memory, so that the
+    file can be removed. Only the saved contents are held, not the parsed objects.
+    """
+    if spill_path is None or not spill_path.exists():
+        return new_document
+    new_document.saveIncr()
+    new_document.close()
+    data = spill_path.read_bytes()
+    os.remove(spill_path)
+    return fitz.open(stream=data, filetype="pdf")
+
+
+def _reconstruct_pages(
+    document: fitz.Document,
+    pages,
+    rules: RuleSet,
+    text_cache: PageTextCache,
+    spill_path: Path | None = None,
+):
+    new_document = fitz.open()
+    inserted_images: dict[str, int] = {}
+    for page_num in _iter_pages(pages, text_cache, spill_path is not None):
+        original_page = text_cache.page(page_num)
+        page_rect = original_page.rect
+        new_page = new_document.new_page(  # type: ignore
+            width=page_rect.width, height=page_rect.height
+        )
+
+        with timer("graphics"):
+            paths = original_page.get_drawings()
+            count("paths", len(paths))
+            shape = new_page.new_shape()
+            _draw_graphics_onto_canvas(paths, shape)
+
+        with timer("images"):
+            image_info_list = original_page.get_image_info(xrefs=True)
+            count("images", len(image_info_list))
+            _draw_images_onto_page(
+                document, original_page, new_page, image_info_list, inserted_images
+            )
+
+        with timer("text"):
+            text_dict = text_cache.get_text(page_num, "dict")
+            if not isinstance(text_dict, dict):
+                raise PDFCreationFailException(
+                    "Could not extract page contents as a text dictionary"
+                )
+            if "blocks" not in text_dict:
+                raise PDFCreationFailException(
+                    "Could not extract content blocks from text dictionory"
+                )
+            _draw_text_onto_page(new_page, text_dict["blocks"], rules)
+        new_document = _spill_document(new_document, spill_path)
+    return new_document
+
+
+def _copy_pages(new_document: fitz.Document, document: fitz.Document, pages):
+    """
+    Appends pages of a document to another in a single pass, with one `insert_pdf` call
+    per run of consecutive pages. The calls share the map of the objects copied so far,
+    so the fonts and images used by several pages are copied once rather than per page.
+    """
+    runs = []
+    for page_num in pages:
+        if runs and runs[-1][1] == page_num - 1:
+            runs[-1][1] = page_num
+        else:
+            runs.append([page_num, page_num])
+    for index, (first, last) in enumerate(runs, 1):
+        new_document.insert_pdf(
+            document, from_page=first, to_page=last, final=index == len(runs)
+        )
+
+
+def _copy_batches(pages, low_memory: bool = False):
+    """
+    Splits the pages to copy with `_copy_pages` into batches: a single batch, or in
+    low-memory mode one batch per `LOW_MEMORY_SPILL_INTERVAL` pages, so that no more
+    pages are copied than are held between spills.
+    """
+    pages = list(pages)
+    batch_size = LOW_MEMORY_SPILL_INTERVAL if low_memory else len(pages)
+    return [
+        pages[start : start + batch_size] for start in range(0, len(pages), batch_size)
+    ]
+
+
+def _find_matches_in_template(
+    text_cache: PageTextCache, page_num: int, rules: RuleSet, templates: TemplateCache
+):
+    """
+    Finds the matches on a page, extracting only the region of its template where
+    matches were seen before, if the template is known and the region spans at most a
+    quarter of the page's height.
+
+    The clipped matches are used only if there are as many as in the page's plain
+    text, and none of them touches the edge of the region, where it may have been cut
+    short. Otherwise the whole page is extracted, and the region of its template is
+    extended to cover the matches found.
+
+    Returns:
+        list[tuple[fitz.Rect, fitz.Point, float, str]]: The matches, as returned by
+            `_find_matches_on_page`.
+    """
+    page = text_cache.page(page_num)
+    fingerprint = templates.fingerprint(page)
+    region = templates.region(fingerprint)
+    # A clipped text page still holds every line crossing the region, so only a band of
+    # a few lines is cheaper to extract than the whole page
+    if region is not None and region.height <= page.rect.height / 4:
+        text_dict = page.get_text("rawdict", clip=region, flags=fitz.TEXTFLAGS_TEXT)
+        matches = _find_matches_on_page(text_dict, rules)
+        inner = region + (1, 1, -1, -1)
+        expected = len(rules.findall(text_cache.get_text(page_num)))
+        if matches and len(matches) >= expected:
+            if all(inner.contains(rect) for rect, _, _, _ in matches):
+                return matches
+
+    matches = _find_matches_on_page(text_cache.get_text(page_num, "rawdict"), rules)
+    templates.record(fingerprint, [rect for rect, _, _, _ in matches])
+    return matches
+
+
+def _redact_pages(
+    document: fitz.Document,
+    pages,
+    rules: RuleSet,
+    text_cache: PageTextCache,
+    templates: TemplateCache | None = None,
+    spill_path: Path | None = None,
+):
+    new_document = fitz.open()
+    for batch in _copy_batches(pages, spill_path is not None):
+        _copy_pages(new_document, document, batch)
+        first = len(new_document) - len(batch)
+        for index, page_num in enumerate(
+            _iter_pages(batch, text_cache, spill_path is not None), first
+        ):
+            # Copied pages keep their coordinates, so the source text locates matches
+            with timer("text"):
+                if templates is None:
+                    text_dict = text_cache.get_text(page_num, "rawdict")
+                    matches = _find_matches_on_page(text_dict, rules)
+                else:
+                    matches = _find_matches_in_template(
+                        text_cache, page_num, rules, templates
+                    )
+                _redact_matches_on_page(new_document[index], matches)
+        new_document = _spill_document(new_document, spill_path)
+    return new_document
+
+
+def _strip_text_from_page(page: fitz.Page):
+    """
+    Removes all text from a page, leaving its images and vector graphics untouched.
+
+    Raises:
+        PDFCreationFailException: If the text cannot be removed.
+    """
+    page.add_redact_annot(page.rect, fill=False)
+    try:
+        page.apply_redactions(
+            images=fitz.PDF_REDACT_IMAGE_NONE,
+            graphics=fitz.PDF_REDACT_LINE_ART_NONE,
+        )
+    except (RuntimeError, ValueError) as err:
+        raise PDFCreationFailException(f"Failed to remove text from page: {err}")
+
+
+def _clone_pages(
+    document: fitz.Document,
+    pages,
+    rules: RuleSet,
+    text_cache: PageTextCache,
+    spill_path: Path | None = None,
+):
+    # Backgrounds must be complete before the first `show_pdf_page` call, as the
+    # new document caches a graft map of the background document's objects.
+    # In low-memory mode, they are spilled to a file of their own as they are made.
+    backgrounds_path = spill_path.with_name("backgrounds.pdf") if spill_path else None
+    backgrounds = fitz.open()
+    with timer("graphics"):
+        for batch in _copy_batches(pages, backgrounds_path is not None):
+            _copy_pages(backgrounds, document, batch)
+            for index in range(len(backgrounds) - len(batch), len(backgrounds)):
+                _strip_text_from_page(backgrounds[index])
+            backgrounds = _spill_document(backgrounds, backgrounds_path)
+        if backgrounds_path and backgrounds_path.exists():
+            backgrounds.saveIncr()
+
+    new_document = fitz.open()
+    low_memory = spill_path is not None
+    for index, page_num in enumerate(_iter_pages(pages, text_cache, low_memory)):
+        page_rect = text_cache.page(page_num).rect
+        new_page = new_document.new_page(  # type: ignore
+            width=page_rect.width, height=page_rect.height
+        )
+
+        with timer("graphics"):
+            new_page.show_pdf_page(new_page.rect, backgrounds, index)
+
+        with timer("text"):
+            text_dict = text_cache.get_text(page_num, "dict")
+            if not isinstance(text_dict, dict) or "blocks" not in text_dict:
+                raise PDFCreationFailException(
+                    "Could not extract content blocks from text dictionory"
+                )
+            _draw_text_onto_page(new_page, text_dict["blocks"], rules)
+        new_document = _spill_document(new_document, spill_path)
+    backgrounds.close()
+    return new_document
 
 
 def replace_matches_in_pdf(
-    document: fitz.Document, pages, replace_text: str = "CN"
+    document: fitz.Document,
+    pages,
+    rules: RuleSet = DEFAULT_RULES,
+    engine: str = RECONSTRUCT_ENGINE,
+    page_workers: int = 1,
+    templates: TemplateCache | None = None,
+    low_memory: bool = False,
 ) -> Document:
     """
     Creates a new PDF document where matched text patterns are replaced with the given text,
     while preserving the original graphics, images, and layout of each page.
 
-    This function reconstructs each specified page by:
-    1. Copying its vector graphics (shapes, lines, rectangles, curves).
-    2. Redrawing embedded images in their original positions.
-    3. Rewriting text content, performing regex-based replacements where applicable.
+    Two engines are available:
+    - `RECONSTRUCT_ENGINE` rebuilds each specified page from scratch by:
+        1. Copying its vector graphics (shapes, lines, rectangles, curves).
+        2. Redrawing embedded images in their original positions.
+        3. Rewriting text content, performing regex-based replacements where applicable.
+    - `REDACT_ENGINE` copies each specified page as-is, removes only the matched text
+      with native redactions and writes the replacement text in its place. Its cost
+      grows with the number of matches rather than with the complexity of the page.
+    - `XOBJECT_ENGINE` strips the text from a copy of each specified page and embeds
+      what remains as a single form XObject, so graphics and images are carried across
+      in one native operation. The text is then redrawn on top, as in reconstruction.
 
     Args:
         document (fitz.Document): The source PDF document to process.
         pages (list[int]): A list of page indices (0-based) to process.
-        replace_text (str): The text that replaces any matches found by
-            the defined regex pattern (typically `CREDIT_NOTE_PATTERN`).
+        rules (RuleSet): The redaction rules applied to the text of each page
+            (defaults to `DEFAULT_RULES`).
+        engine (str): The engine used to produce the modified pages, one of `ENGINES`.
+        page_workers (int): The number of worker processes the pages may be split
+            across (defaults to 1, rebuilding every page in this process).
+        templates (Optional[TemplateCache]): The regions of known page templates where
+            matches are found. Only used by `REDACT_ENGINE`, which then extracts the
+            text of those regions rather than of whole pages.
+        low_memory (bool): Whether to bound the memory held while rewriting long
+            documents, at some cost in speed (see Notes).
 
     Returns:
         fitz.Document: A new PDF document with the replaced text and preserved visual layout.
@@ -291,55 +913,163 @@ def replace_matches_in_pdf(
         NothingToModifyException: If no pages are provided for modification.
         PDFCreationFailException: If any step in extracting or reconstructing page
             contents fails (e.g., missing text blocks, invalid drawing data).
+        ValueError: If the engine is not one of `ENGINES`.
 
     Notes:
         - This function does not modify the original document; it creates a new one.
-        - Text replacement uses case-insensitive regex matching.
+        - Text replacement uses case-insensitive regex matching, in a single pass per span.
         - Vector paths and images are redrawn before text to preserve layering order.
         - The layout (page size, positions, colors) is maintained as closely as possible.
+        - Page text is read from the document's text cache, so pages already parsed by
+          `get_pages_with_credit_notes` are not parsed again. Each page is dropped from
+          the cache once it has been rewritten.
+        - With `page_workers` above 1, a document opened from a file is split into
+          contiguous page ranges of at least `MIN_PAGES_PER_RANGE` pages, each rebuilt
+          by a worker process that opens the file itself. The partial documents are
+          merged in page order, so the output does not depend on which worker finishes
+          first. Documents opened from memory are always rebuilt in this process.
+        - With `low_memory`, MuPDF's store is emptied every `LOW_MEMORY_STORE_INTERVAL`
+          pages, and the new document is spilled to a temporary file every
+          `LOW_MEMORY_SPILL_INTERVAL` pages, as is the stripped copy of the pages made
+          by `XOBJECT_ENGINE`. Paired with `low_memory` detection, only the page being
+          rewritten has its text held.
 
     Example:
         >>> import fitz
         >>> doc = fitz.open("invoice.pdf")
         >>> pages_to_modify = [0, 2]
-        >>> updated_doc = replace_matches_in_pdf(doc, pages_to_modify, "Tax Invoice")
+        >>> rules = RuleSet([RedactionRule(r"Ref:\\s*\\d+", "Tax Invoice", "ref")])
+        >>> updated_doc = replace_matches_in_pdf(doc, pages_to_modify, rules)
         >>> updated_doc.save("updated_invoice.pdf")
     """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+
     if not pages:
         raise NothingToModifyException(document.name)  # type: ignore
 
-    new_document = fitz.open()
-    for page_num in pages:
-        original_page = document.load_page(page_num)
-        page_rect = original_page.rect
-        new_page = new_document.new_page(  # type: ignore
-            width=page_rect.width, height=page_rect.height
+    ranges = split_page_ranges(pages, page_workers)
+    if len(ranges) > 1 and document.name and Path(document.name).is_file():
+        return _replace_matches_in_page_ranges(
+            document.name, ranges, rules, engine, templates, low_memory
         )
 
-        paths = original_page.get_drawings()
-        shape = new_page.new_shape()
-        image_info_list = original_page.get_image_info(xrefs=True)
-        text_dict = original_page.get_text(
-            "dict"
-        )  # pyright: ignore[reportAttributeAccessIssue]
-
-        if not isinstance(text_dict, dict):
-            raise PDFCreationFailException(
-                "Could not extract page contents as a text dictionary"
+    spill_dir = TemporaryDirectory(ignore_cleanup_errors=True) if low_memory else None
+    with text_cache_for(document) as text_cache, spill_dir or nullcontext() as path:
+        spill_path = Path(path, "pages.pdf") if path else None
+        if engine == REDACT_ENGINE:
+            new_document = _redact_pages(
+                document, pages, rules, text_cache, templates, spill_path
             )
-        if "blocks" not in text_dict:
-            raise PDFCreationFailException(
-                "Could not extract content blocks from text dictionory"
+        elif engine == XOBJECT_ENGINE:
+            new_document = _clone_pages(document, pages, rules, text_cache, spill_path)
+        else:
+            new_document = _reconstruct_pages(
+                document, pages, rules, text_cache, spill_path
             )
+        return _load_spilled_document(new_document, spill_path)
+
+
+def split_page_ranges(pages, workers: int, min_pages: int = MIN_PAGES_PER_RANGE):
+    """
+    Splits a list of pages into at most `workers` contiguous ranges of near-equal size,
+    each holding at least `min_pages` pages.
 
-        _draw_graphics_onto_canvas(paths, shape)
-        _draw_images_onto_page(document, original_page, new_page, image_info_list)
-        _draw_text_onto_page(new_page, text_dict["blocks"], replace_text)
+    Returns:
+        list[list[int]]: The ranges, in page order. A single range is returned when the
+            pages are too few to split.
+    """
+    count_ranges = max(1, min(workers, len(pages) // min_pages))
+    size, remainder = divmod(len(pages), count_ranges)
+    ranges = []
+    start = 0
+    for index in range(count_ranges):
+        end = start + size + (1 if index < remainder else 0)
+        ranges.append(list(pages[start:end]))
+        start = end
+    return ranges
+
+
+def _rebuild_page_range(
+    file_path: str,
+    pages,
+    rules: RuleSet,
+    engine: str,
+    templates: TemplateCache | None = None,
+    low_memory: bool = False,
+):
+    """
+    Rebuilds a range of pages of a PDF file in a worker process.
+
+    Returns:
+        tuple[bytes, DocumentMetrics]: The partial document holding the rebuilt pages,
+            and the metrics collected while building it.
+    """
+    metrics = DocumentMetrics(file_path)
+    with record_document(metrics):
+        with timer("open"):
+            document = fitz.open(file_path)
+        register_text_cache(document)
+        try:
+            partial_document = replace_matches_in_pdf(
+                document,
+                pages,
+                rules,
+                engine,
+                templates=templates,
+                low_memory=low_memory,
+            )
+            data = partial_document.tobytes()
+            partial_document.close()
+        finally:
+            release_text_cache(document)
+            document.close()
+    return data, metrics
+
+
+def _replace_matches_in_page_ranges(
+    file_path: str,
+    ranges,
+    rules: RuleSet,
+    engine: str,
+    templates: TemplateCache | None = None,
+    low_memory: bool = False,
+) -> Document:
+    new_document = fitz.open()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=len(ranges), mp_context=WORKER_CONTEXT
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _rebuild_page_range,
+                    file_path,
+                    pages,
+                    rules,
+                    engine,
+                    templates,
+                    low_memory,
+                )
+                for pages in ranges
+            ]
+            # Merged in range order, whichever worker finishes first
+            for future in futures:
+                data, metrics = future.result()
+                merge(metrics)
+                with fitz.open(stream=data, filetype="pdf") as partial_document:
+                    new_document.insert_pdf(partial_document)
+    except BaseException:
+        new_document.close()
+        raise
     return new_document
 
 
 def save_modified_document(
-    modified_document: Document, original_document_name: str | None
+    modified_document: Document,
+    original_document_name: str | None,
+    output_dir=None,
+    profile: str = BALANCED_PROFILE,
+    engine: str | None = None,
 ):
     """
     Saves a modified PDF document to disk using a timestamped or derived filename.
@@ -348,17 +1078,28 @@ def save_modified_document(
     the current date and time in the format:
     `"Tax Invoice DD_MM_YYYY HH_MM_SS.pdf"`.
 
-    The document is saved with compression enabled (`deflate=True`) to reduce file size,
-    and then closed to release resources.
+    The document is saved with the options of the given save profile, and then closed to
+    release resources. The default `BALANCED_PROFILE` compresses streams (`deflate=True`);
+    `FAST_PROFILE` skips compression and `COMPACT_PROFILE` also dedupes objects and
+    compresses images, fonts and object streams.
 
     Args:
         modified_document (fitz.Document): The modified PDF document to be saved.
         original_document_name (str | None): The base name of the original document.
             If `None`, a timestamped filename is generated.
+        output_dir (Optional[Path]): The directory to save the document into. Defaults
+            to `config.OUTPUT_DIR`.
+        profile (str): The save profile, one of `SAVE_PROFILES`.
+        engine (Optional[str]): The engine the document was rewritten with, which may
+            add to the save options (see `get_save_options`).
+
+    Returns:
+        Path: The path the modified document was written to.
 
     Raises:
         PDFCreationFailException: If the document cannot be saved due to file I/O errors
             (recommended to add this exception if `save()` can fail in your pipeline).
+        ValueError: If the profile is not one of `SAVE_PROFILES`.
 
     Notes:
         - The output path is resolved using `get_output_path()`, which determines where
@@ -367,17 +1108,85 @@ def save_modified_document(
           memory leaks or file handle issues.
 
     Example:
-        >>> new_doc = replace_matches_in_pdf(doc, [0], "Tax Invoice")
+        >>> new_doc = replace_matches_in_pdf(doc, [0])
         >>> save_modified_document(new_doc, "Invoice_1234.pdf")
         # Output saved as: ./output/Invoice_1234.pdf
     """
+    save_options = get_save_options(profile, engine)
     if not original_document_name:
         original_document_name = datetime.now().strftime(
             "Tax Invoice %d_%m_%Y %H_%M_%S"
         )
 
     output_path = get_output_path(
-        original_document_name
+        original_document_name, output_dir
     )  # pyright: ignore[reportArgumentType]
-    modified_document.save(output_path, deflate=True)
+    with timer("save"):
+        modified_document.save(output_path, **save_options)
     modified_document.close()
+    return output_path
+
+
+def process_pdf_bytes(
+    data: bytes,
+    rules: RuleSet = DEFAULT_RULES,
+    engine: str = RECONSTRUCT_ENGINE,
+    name: str = "<stream>",
+    profile: str = BALANCED_PROFILE,
+    templates: TemplateCache | None = None,
+    low_memory: bool = False,
+) -> bytes:
+    """
+    Redacts a PDF held in memory and returns the modified PDF, with no temporary files.
+
+    The document is opened from a stream, its matched pages are rewritten as in
+    `replace_matches_in_pdf`, and the result is saved to a buffer with the options of
+    the save profile, as in `save_modified_document`.
+
+    Args:
+        data (bytes): The contents of the PDF file to process.
+        rules (RuleSet): The redaction rules to apply.
+        engine (str): The engine used to rewrite matched pages, one of `ENGINES`.
+        name (str): The name of the document, used in error messages.
+        profile (str): The save profile, one of `SAVE_PROFILES`.
+        templates (Optional[TemplateCache]): The regions of known page templates, as in
+            `replace_matches_in_pdf`.
+        low_memory (bool): Whether to bound the memory held while rewriting, as in
+            `replace_matches_in_pdf`. MuPDF's store is also emptied once done.
+
+    Returns:
+        bytes: The contents of the modified PDF.
+
+    Raises:
+        PathNotPDFFileException: If the data is not a valid PDF.
+        NothingToModifyException: If the document contains no matches.
+        PDFCreationFailException: If the modified document cannot be built.
+        ValueError: If the engine or the save profile is unknown.
+
+    Example:
+        >>> with open("invoice.pdf", "rb") as f:
+        ...     modified = process_pdf_bytes(f.read(), name="invoice.pdf")
+    """
+    save_options = get_save_options(profile, engine)
+    try:
+        with open_pdf_stream(data, name) as document:
+            pages = get_pages_with_credit_notes(document, rules, low_memory=low_memory)
+            if not pages:
+                raise NothingToModifyException(name)
+
+            modified_document = replace_matches_in_pdf(
+                document,
+                pages,
+                rules,
+                engine,
+                templates=templates,
+                low_memory=low_memory,
+            )
+            try:
+                with timer("save"):
+                    return modified_document.tobytes(**save_options)
+            finally:
+                modified_document.close()
+    finally:
+        if low_memory:
+            release_memory()
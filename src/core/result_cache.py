@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+from hashlib import sha256
+import os
+from pathlib import Path
+import shutil
+from tempfile import NamedTemporaryFile
+
+from src.core.logger import get_logger
+
+
+def _logger():
+    return get_logger("fiscalpdf.results")
+
+
+class ResultCache:
+    """
+    On-disk cache of modified documents, keyed by the content of the input file and
+    everything else that determines the output (rules, engine and engine version).
+
+    Re-submitted invoices are served from the cache by linking the stored result into
+    the output directory, without opening the document at all.
+
+    Args:
+        cache_dir (Path): The directory holding the cached results.
+        max_bytes (int): The maximum total size of the cache. The least recently used
+            results are evicted first once it is exceeded.
+        max_age_days (int): Results not used for this many days are evicted.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache_dir, max_bytes=1024**3, max_age_days=30):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def digest_bytes(data: bytes) -> str:
+        return sha256(data).hexdigest()
+
+    @classmethod
+    def digest_file(cls, file_path) -> str:
+        digest = sha256()
+        with open(file_path, "rb") as f:
+            while chunk := f.read(cls.CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(digest: str, *parts) -> str:
+        """
+        Combines the digest of an input with the settings that produced its output.
+
+        Args:
+            digest (str): The SHA-256 digest of the input document.
+            *parts: Everything else the output depends on, such as the rule set
+                fingerprint, the engine and the engine version.
+        """
+        return sha256("\0".join([digest, *map(str, parts)]).encode("utf-8")).hexdigest()
+
+    def __path(self, key):
+        return self.cache_dir.joinpath(f"{key}.pdf")
+
+    def link(self, key, output_path) -> bool:
+        """
+        Places the cached result for a key at the output path.
+
+        The result is hard-linked where possible and copied otherwise. Its modification
+        time is refreshed, which both marks the entry as recently used and gives the
+        output a fresh retention period.
+
+        Returns:
+            bool: True on a cache hit, False if the key is not cached.
+        """
+        cached = self.__path(key)
+        if not cached.is_file():
+            return False
+
+        output_path = Path(output_path)
+        try:
+            if output_path.exists():
+                os.remove(output_path)
+            os.link(cached, output_path)
+        except FileNotFoundError:
+            return False  # evicted between the check and the link
+        except OSError:
+            shutil.copyfile(cached, output_path)
+        os.utime(output_path)
+        os.utime(cached)
+        return True
+
+    def read(self, key):
+        """
+        Returns the cached result for a key, or None if it is not cached.
+        """
+        cached = self.__path(key)
+        try:
+            data = cached.read_bytes()
+            os.utime(cached)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def store_bytes(self, key, data: bytes):
+        with NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+            f.write(data)
+        os.replace(f.name, self.__path(key))
+
+    def store_file(self, key, file_path):
+        with NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+            pass
+        try:
+            os.remove(f.name)
+            os.link(file_path, f.name)
+        except OSError:
+            shutil.copyfile(file_path, f.name)
+        os.replace(f.name, self.__path(key))
+
+    def evict(self):
+        """
+        Removes results that have not been used within `max_age_days`, then the least
+        recently used results until the cache fits within `max_bytes`.
+        """
+        cutoff_time = (datetime.now() - timedelta(days=self.max_age_days)).timestamp()
+        entries = []
+        for file in self.cache_dir.iterdir():
+            try:
+                stat = file.stat()
+                if stat.st_mtime < cutoff_time:
+                    os.remove(file)
+                elif file.suffix == ".pdf":
+                    entries.append((stat.st_mtime, stat.st_size, file))
+            except OSError as err:
+                _logger().on_error(f"Cannot evict the cached result {file}: {err}")
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, file in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(file)
+                total -= size
+            except OSError as err:
+                _logger().on_error(f"Cannot evict the cached result {file}: {err}")
@@ -0,0 +1,122 @@
+from hashlib import sha256
+import re
+from typing import NamedTuple
+
+
+CREDIT_NOTE_PATTERN = r"Credit Note:\s*[\w/]+"
+CREDIT_NOTE_NUMBER_PATTERN = (
+    r"Credit Note (?:No\.?|Number|Ref\.?)\s*:?\s*[\w/]*\d[\w/]*"
+)
+
+
+class RedactionRule(NamedTuple):
+    """
+    A single pattern to redact and the text that replaces it.
+
+    Attributes:
+        pattern (str): The regular expression to match (matched case-insensitively).
+        replacement (str): The literal text that replaces each match.
+        anchor (str): A literal substring present in every match of the pattern. Text
+            without the anchor is rejected before any regex work is done.
+    """
+
+    pattern: str
+    replacement: str
+    anchor: str
+
+
+class RuleSet:
+    """
+    A set of redaction rules compiled into a single combined matcher.
+
+    Each rule's pattern becomes a named alternative of one case-insensitive regex, so a
+    piece of text is scanned once regardless of how many rules there are. Before any
+    regex work, the case-folded text is checked for the rules' literal anchors, which
+    cheaply rejects the vast majority of spans and pages.
+
+    Example:
+        >>> rules = RuleSet([RedactionRule(r"Credit Note:\\s*[\\w/]+", "CN", "credit")])
+        >>> rules.sub("Ref Credit Note: 123/45/C")
+        'Ref CN'
+    """
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        if not self.rules:
+            raise ValueError("A rule set requires at least one rule")
+
+        self.anchors = tuple(
+            dict.fromkeys(rule.anchor.casefold() for rule in self.rules)
+        )
+        self.pattern = re.compile(
+            "|".join(
+                f"(?P<rule{index}>{rule.pattern})"
+                for index, rule in enumerate(self.rules)
+            ),
+            re.IGNORECASE,
+        )
+        self.__groups = tuple(
+            self.pattern.groupindex[f"rule{index}"] for index in range(len(self.rules))
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, RuleSet) and self.rules == other.rules
+
+    def __hash__(self):
+        return hash(self.rules)
+
+    def __repr__(self):
+        return f"RuleSet({list(self.rules)!r})"
+
+    @property
+    def fingerprint(self) -> str:
+        """A stable digest of the rules, for keying cached results."""
+        digest = sha256()
+        for rule in self.rules:
+            digest.update(repr(tuple(rule)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def may_match(self, text: str) -> bool:
+        """Cheap literal prefilter: False means the text cannot contain a match."""
+        folded = text.casefold()
+        return any(anchor in folded for anchor in self.anchors)
+
+    def search(self, text: str):
+        if not self.may_match(text):
+            return None
+        return self.pattern.search(text)
+
+    def finditer(self, text: str):
+        if not self.may_match(text):
+            return iter(())
+        return self.pattern.finditer(text)
+
+    def findall(self, text: str) -> list[str]:
+        return [match.group() for match in self.finditer(text)]
+
+    def replacement_for(self, match: re.Match) -> str:
+        """Returns the replacement text of the rule that produced the match."""
+        for rule, group in zip(self.rules, self.__groups):
+            if match.start(group) != -1:
+                return rule.replacement
+        raise ValueError(f"Match was not produced by this rule set: {match.group()}")
+
+    def sub(self, text: str) -> str:
+        """Replaces every match in the text in a single pass."""
+        if not self.may_match(text):
+            return text
+        return self.pattern.sub(self.replacement_for, text)
+
+    def subn(self, text: str) -> tuple[str, int]:
+        """Like `sub`, but also returns the number of replacements made."""
+        if not self.may_match(text):
+            return text, 0
+        return self.pattern.subn(self.replacement_for, text)
+
+
+DEFAULT_RULES = RuleSet(
+    [
+        RedactionRule(CREDIT_NOTE_PATTERN, "CN", "credit"),
+        RedactionRule(CREDIT_NOTE_NUMBER_PATTERN, "CN", "credit"),
+    ]
+)
@@ -0,0 +1,117 @@
+from hashlib import sha256
+import json
+import os
+import re
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+import fitz
+
+from src.core.logger import get_logger
+
+_OBJECT_REFERENCE = re.compile(r"\d+ \d+ R")
+
+
+def _logger():
+    return get_logger("fiscalpdf.templates")
+
+
+class TemplateCache:
+    """
+    On-disk map from page layouts to the region of the page where matches were found.
+
+    Invoices produced by the same ERP template share their page size and the fonts and
+    images their pages use, and print the credit note reference in the same spot. Pages
+    are keyed by a fingerprint of both, so that later pages of a known template only
+    need their text extracted within that region (see `pdf_service.REDACT_ENGINE`).
+
+    Args:
+        path (Path): The JSON file the regions are persisted to.
+        max_templates (int): The maximum number of templates remembered. The oldest
+            templates are forgotten first once it is exceeded.
+
+    Notes:
+        - The cache is pickled by path, so each task sent to a worker process loads the
+          regions saved so far. Writes replace the file atomically, so concurrent
+          writers can only lose each other's new regions, which are learned again on a
+          later page.
+    """
+
+    # Matched references vary in length between invoices, so regions are padded well
+    # beyond the matches seen, more so horizontally.
+    PADDING = (36.0, 4.0)
+
+    def __init__(self, path, max_templates=1000):
+        self.path = Path(path)
+        self.max_templates = max_templates
+        self.__regions: dict[str, tuple] = {}
+        if not self.path.exists():
+            return
+        try:
+            self.__regions = {
+                fingerprint: tuple(region)
+                for fingerprint, region in json.loads(self.path.read_text()).items()
+            }
+        except (OSError, ValueError) as err:
+            _logger().on_error(f"Cannot load the templates in {self.path}: {err}")
+
+    def __reduce__(self):
+        return self.__class__, (self.path, self.max_templates)
+
+    def __len__(self):
+        return len(self.__regions)
+
+    @staticmethod
+    def fingerprint(page: fitz.Page) -> str:
+        """
+        Returns a digest of the page size, rounded to whole points, and of the page's
+        resource dictionary with object numbers left out, since those differ between
+        files produced by the same template.
+
+        Unlike extracting the page's drawings or fonts, this reads one dictionary and
+        does not parse the content stream.
+        """
+        document = page.parent
+        kind, resources = document.xref_get_key(page.xref, "Resources")
+        if kind == "xref":
+            resources = document.xref_object(int(resources.split()[0]), compressed=True)
+        digest = sha256(repr(tuple(round(v) for v in page.rect)).encode("utf-8"))
+        digest.update(_OBJECT_REFERENCE.sub("R", resources).encode("utf-8"))
+        return digest.hexdigest()
+
+    def region(self, fingerprint):
+        """
+        Returns the region of a template where matches were found, or None if the
+        template is not known.
+        """
+        region = self.__regions.get(fingerprint)
+        return fitz.Rect(region) if region else None
+
+    def record(self, fingerprint, rects):
+        """
+        Extends the region of a template to cover the given match rectangles, and saves
+        the cache if the region changed.
+        """
+        padding_x, padding_y = self.PADDING
+        region = self.region(fingerprint) or fitz.Rect()
+        for rect in rects:
+            region |= fitz.Rect(rect) + (-padding_x, -padding_y, padding_x, padding_y)
+        if region.is_empty or tuple(region) == self.__regions.get(fingerprint):
+            return
+
+        self.__regions.pop(fingerprint, None)
+        self.__regions[fingerprint] = tuple(region)
+        while len(self.__regions) > self.max_templates:
+            del self.__regions[next(iter(self.__regions))]
+        self.__save()
+
+    def __save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile(
+                "w", dir=self.path.parent, suffix=".tmp", delete=False
+            ) as f:
+                json.dump(self.__regions, f)
+            os.replace(f.name, self.path)
+        except OSError as err:
+            _logger().on_error(f"Cannot save the templates to {self.path}: {err}")
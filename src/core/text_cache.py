@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+
+import fitz
+
+
+class PageTextCache:
+    """
+    Per-document cache of extracted page text.
+
+    Each page is parsed into a single `fitz.TextPage`, which is then reused for every
+    text extraction of that page (plain text for detection, dictionaries for rewriting).
+    This avoids parsing the content stream of a matched page more than once.
+
+    Notes:
+        - The text page is built with `TEXTFLAGS_TEXT`, so image blocks are not included
+          in dictionary extractions. Only text blocks are needed for rewriting pages.
+        - Entries hold a reference to their page, so the cache must be cleared before
+          the document is closed.
+    """
+
+    def __init__(self, document: fitz.Document):
+        self.document = document
+        self.__entries: dict[int, tuple[fitz.Page, fitz.TextPage]] = {}
+
+    def __contains__(self, page_num):
+        return page_num in self.__entries
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __entry(self, page_num):
+        entry = self.__entries.get(page_num)
+        if entry is None:
+            page = self.document.load_page(page_num)
+            entry = (page, page.get_textpage(flags=fitz.TEXTFLAGS_TEXT))
+            self.__entries[page_num] = entry
+        return entry
+
+    def page(self, page_num) -> fitz.Page:
+        return self.__entry(page_num)[0]
+
+    def get_text(self, page_num, option="text"):
+        """
+        Extracts the text of a page from its cached text page.
+
+        Args:
+            page_num (int): The page index (0-based).
+            option (str): The extraction format, as accepted by `fitz.Page.get_text`.
+        """
+        page, textpage = self.__entry(page_num)
+        return page.get_text(option, textpage=textpage)
+
+    def search_for(self, page_num, needle: str) -> list:
+        """
+        Returns the areas of a page covered by a literal string, using PyMuPDF's native
+        search over the cached text page. The search ignores ASCII case.
+        """
+        page, textpage = self.__entry(page_num)
+        return page.search_for(needle, textpage=textpage)
+
+    def discard(self, page_num):
+        self.__entries.pop(page_num, None)
+
+    def clear(self):
+        self.__entries.clear()
+
+
+_text_caches: dict[int, PageTextCache] = {}
+
+
+def register_text_cache(document: fitz.Document) -> PageTextCache:
+    cache = PageTextCache(document)
+    _text_caches[id(document)] = cache
+    return cache
+
+
+def release_text_cache(document: fitz.Document):
+    cache = _text_caches.pop(id(document), None)
+    if cache is not None:
+        cache.clear()
+
+
+@contextmanager
+def text_cache_for(document: fitz.Document):
+    """
+    Yields the text cache registered for a document. Documents that were not opened
+    through `open_pdf_document` have no registered cache, so a temporary one is used
+    and released on exit.
+    """
+    cache = _text_caches.get(id(document))
+    if cache is not None:
+        yield cache
+        return
+
+    cache = PageTextCache(document)
+    try:
+        yield cache
+    finally:
+        cache.clear()
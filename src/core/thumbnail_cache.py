@@ -0,0 +1,120 @@
+import os
+from pathlib import Path
+import shutil
+from tempfile import NamedTemporaryFile
+
+import fitz
+from pymupdf import FileDataError
+
+from src.core.logger import get_logger
+from src.core.pdf_service import FITZ_LOCK
+
+
+def _logger():
+    return get_logger("fiscalpdf.thumbnails")
+
+
+class ThumbnailCache:
+    """
+    On-disk cache of first-page previews of the processed files.
+
+    Previews are rendered on first request and stored as PNG files that mirror the
+    layout of the output directory, so the previews of a day shard live in a directory
+    of the same name and are removed with it. A preview older than its PDF is rendered
+    again.
+
+    Previews are rendered while holding `pdf_service.FITZ_LOCK`, as they are requested
+    from other threads than the ones processing files.
+
+    Args:
+        cache_dir (Path): The directory holding the previews.
+        output_dir (Path): The directory of the processed files being previewed.
+        max_bytes (int): The maximum total size of the cache. The least recently used
+            previews are evicted first once it is exceeded.
+        width (int): The width of the previews in pixels.
+    """
+
+    def __init__(self, cache_dir, output_dir, max_bytes=64 * 1024**2, width=160):
+        self.cache_dir = Path(cache_dir)
+        self.output_dir = Path(output_dir)
+        self.max_bytes = max_bytes
+        self.width = width
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def __path(self, pdf_path):
+        relative = Path(pdf_path).relative_to(self.output_dir)
+        return self.cache_dir.joinpath(relative).with_suffix(".png")
+
+    def get(self, pdf_path):
+        """
+        Returns the preview of a processed file, rendering it if it is missing or older
+        than the file.
+
+        Returns:
+            Optional[Path]: The PNG preview, or None if the file cannot be rendered.
+        """
+        thumbnail = self.__path(pdf_path)
+        try:
+            if thumbnail.stat().st_mtime >= os.stat(pdf_path).st_mtime:
+                os.utime(thumbnail)
+                return thumbnail
+        except OSError:
+            pass  # not rendered yet
+
+        try:
+            with FITZ_LOCK, fitz.open(pdf_path) as document:
+                page = document.load_page(0)
+                zoom = self.width / page.rect.width
+                pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                data = pixmap.tobytes("png")
+        except (FileDataError, RuntimeError, ValueError, IndexError) as err:
+            _logger().on_error(f"Cannot render a preview of {pdf_path}: {err}")
+            return None
+
+        thumbnail.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(dir=thumbnail.parent, suffix=".tmp", delete=False) as f:
+            f.write(data)
+        os.replace(f.name, thumbnail)
+        return thumbnail
+
+    def remove(self, pdf_path):
+        try:
+            os.remove(self.__path(pdf_path))
+        except (OSError, ValueError):
+            pass  # never rendered
+
+    def remove_shard(self, shard):
+        """
+        Removes the previews of every file of a day shard of the output directory.
+        """
+        shutil.rmtree(
+            self.cache_dir.joinpath(Path(shard).relative_to(self.output_dir)),
+            ignore_errors=True,
+        )
+
+    def evict(self):
+        """
+        Removes previews whose file no longer exists, then the least recently used
+        previews until the cache fits within `max_bytes`.
+        """
+        entries = []
+        for thumbnail in self.cache_dir.rglob("*.png"):
+            relative = thumbnail.relative_to(self.cache_dir).with_suffix(".pdf")
+            try:
+                if not self.output_dir.joinpath(relative).exists():
+                    os.remove(thumbnail)
+                else:
+                    stat = thumbnail.stat()
+                    entries.append((stat.st_mtime, stat.st_size, thumbnail))
+            except OSError as err:
+                _logger().on_error(f"Cannot evict the preview {thumbnail}: {err}")
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, thumbnail in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(thumbnail)
+                total -= size
+            except OSError as err:
+                _logger().on_error(f"Cannot evict the preview {thumbnail}: {err}")
@@ -1,17 +1,40 @@
+import multiprocessing
 import os
+from pathlib import PurePosixPath
+from queue import Empty, Queue
+from threading import Event, Thread
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from platformdirs import user_documents_dir
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import SUCCESS, OUTLINE
 
-from datetime import datetime
-
-from src.config import INPUT_DIR, OUTPUT_DIR
+from src.config import (
+    CACHE_DIR,
+    CATALOG_PATH,
+    INPUT_DIR,
+    LOW_MEMORY,
+    OUTPUT_DIR,
+    OUTPUT_QUOTA_BYTES,
+    RETENTION_DAYS,
+    SAVE_PROFILE,
+    SCAN_INTERVAL,
+    THUMBNAIL_DIR,
+)
+from src.core.catalog import Catalog
 from src.core.file_service import FileService
+from src.core.result_cache import ResultCache
+from src.core.thumbnail_cache import ThumbnailCache
 
 
 class FiscalPDFApp(tk.Tk):
+    PAGE_SIZE = 100
+    POLL_INTERVAL_MS = 100
+    MAX_LISTED_ERRORS = 10
+    # Previews are shown at a quarter of their cached width, in rows tall enough for them
+    THUMBNAIL_SUBSAMPLE = 4
+    ROW_HEIGHT = 60
+
     def __init__(self, file_service: FileService):
         super().__init__()
         ttk.Style("cosmo")
@@ -23,6 +46,20 @@ class FiscalPDFApp(tk.Tk):
         self.file_service = file_service
         self.input_dir = file_service.get_input_dir()
         self.output_dir = file_service.get_output_dir()
+        self.page = 0
+        self.sort = "date"
+        self.descending = True
+
+        # Files are processed on a worker thread, which reports back through the queue
+        self.results = Queue()
+        self.cancelled = Event()
+        self.worker = None
+        self.errors = []
+
+        # Previews are rendered on a background thread too, and kept here by row
+        self.thumbnails = {}
+        self.thumbnail_results = Queue()
+        self.thumbnails_pending = set()
 
         self._ensure_dirs()
         self._build_ui()
@@ -53,8 +90,11 @@ class FiscalPDFApp(tk.Tk):
 
         upload_frame = ttk.Frame(container)
         upload_frame.pack(fill="x")
-        self._single_upload(upload_frame)
-        self._bulk_upload(upload_frame)
+        self.upload_buttons = [
+            self._single_upload(upload_frame),
+            self._bulk_upload(upload_frame),
+        ]
+        self._progress_section(container)
         self._output_section()
 
     def _single_upload(self, parent):
@@ -62,42 +102,83 @@ class FiscalPDFApp(tk.Tk):
 
         ttk.Label(frame, text="Single PDF Upload", font=("", 12, "bold")).pack(pady=10)
         ttk.Label(frame, text="Upload one PDF to process").pack()
-        ttk.Button(
+        button = ttk.Button(
             frame,
             text="Select PDF",
             command=self._upload_single,
             bootstyle=(SUCCESS, OUTLINE),
-        ).pack(pady=10)
+        )
+        button.pack(pady=10)
         frame.pack(side="left", expand=True, fill="x", padx=10, pady=10)
+        return button
 
     def _bulk_upload(self, parent):
         frame = ttk.Frame(parent, border=10, relief="groove", padding=10)
 
         ttk.Label(frame, text="Bulk PDF Upload", font=("", 12, "bold")).pack(pady=10)
         ttk.Label(frame, text="Select multiple PDFs to process at once").pack()
-        ttk.Button(
+        button = ttk.Button(
             frame,
             text="Select PDFs",
             command=self._upload_bulk,
             bootstyle=(SUCCESS, OUTLINE),
-        ).pack(pady=10)
+        )
+        button.pack(pady=10)
         frame.pack(side="left", expand=True, fill="x", padx=10, pady=10)
+        return button
+
+    def _progress_section(self, parent):
+        frame = ttk.Frame(parent)
+        frame.pack(fill="x", padx=10)
+
+        self.progress = ttk.Progressbar(frame, mode="determinate", bootstyle=SUCCESS)
+        self.progress.pack(side="left", expand=True, fill="x", padx=(0, 10))
+        self.progress_label = ttk.Label(frame, width=24)
+        self.progress_label.pack(side="left")
+        self.cancel_button = ttk.Button(
+            frame,
+            text="Cancel",
+            command=self._cancel_processing,
+            bootstyle="outline-danger",
+            state="disabled",
+        )
+        self.cancel_button.pack(side="left", padx=(10, 0))
 
     def _output_section(self):
         frame = ttk.Label(self, text="Processed Files")
         frame.pack(fill="both", expand=True, padx=30, pady=20)
 
         columns = ("name", "date")
-        self.tree = ttk.Treeview(frame, columns=columns, show="headings", height=12)
+        ttk.Style().configure("Treeview", rowheight=self.ROW_HEIGHT)
+        self.tree = ttk.Treeview(
+            frame, columns=columns, show=("tree", "headings"), height=8
+        )
 
-        self.tree.heading("name", text="File Name")
-        self.tree.heading("date", text="Date Modified")
+        self.tree.heading(
+            "name", text="File Name", command=lambda: self._sort_table("name")
+        )
+        self.tree.heading(
+            "date", text="Date Modified", command=lambda: self._sort_table("date")
+        )
 
+        self.tree.column("#0", width=self.ROW_HEIGHT, stretch=False)
         self.tree.column("name", width=400, stretch=True)
         self.tree.column("date", width=200, stretch=True)
 
         self.tree.pack(fill="both", expand=True)
 
+        page_frame = ttk.Frame(frame)
+        page_frame.pack(pady=5)
+
+        ttk.Button(
+            page_frame, text="Previous", command=lambda: self._change_page(-1)
+        ).pack(side="left", padx=5)
+        self.page_label = ttk.Label(page_frame)
+        self.page_label.pack(side="left", padx=5)
+        ttk.Button(page_frame, text="Next", command=lambda: self._change_page(1)).pack(
+            side="left", padx=5
+        )
+
         btn_frame = ttk.Frame(frame)
         btn_frame.pack(pady=10)
 
@@ -138,50 +219,207 @@ class FiscalPDFApp(tk.Tk):
             self._process_and_refresh(files)
 
     def _process_and_refresh(self, files):
+        """
+        Starts processing the selected files on a worker thread, so the window stays
+        responsive. Progress is picked up by `_poll_results`.
+        """
+        if self.worker is not None:
+            return
+
+        self.cancelled.clear()
+        self.errors = []
+        self.progress.configure(maximum=len(files), value=0)
+        self.progress_label.configure(text=f"0 of {len(files)} files")
+        self.cancel_button.configure(state="normal")
+        for button in self.upload_buttons:
+            button.configure(state="disabled")
+
+        self.worker = Thread(target=self._process_files, args=(files,), daemon=True)
+        self.worker.start()
+        self.after(self.POLL_INTERVAL_MS, self._poll_results)
+
+    def _process_files(self, files):
+        """
+        Runs on the worker thread. Never touches the widgets; every outcome is put on
+        the results queue instead.
+
+        The selected files are processed where they are and only ever read, so even
+        very large statements are neither copied nor held in memory.
+        """
         try:
-            for file in files:
-                dest = self.input_dir / os.path.basename(file)
-                with open(file, "rb") as src, open(dest, "wb") as dst:
-                    dst.write(src.read())
-
-                error = self.file_service.handle_file_processing(dest)
-                if error:
-                    messagebox.showerror("Error", error)
+            for result in self.file_service.iter_batch(
+                files, cancelled=self.cancelled, keep_inputs=True
+            ):
+                self.results.put(("result", result))
         except Exception as e:
-            messagebox.showerror("Error", str(e))
+            self.results.put(("error", str(e)))
         finally:
+            self.results.put(("done", None))
+
+    def _poll_results(self):
+        finished = False
+        refresh = False
+        while True:
+            try:
+                kind, payload = self.results.get_nowait()
+            except Empty:
+                break
+
+            if kind == "result":
+                # Not `step`, which wraps back to zero on the last file
+                self.progress.configure(value=self.progress["value"] + 1)
+                if payload.error:
+                    self.errors.append(
+                        f"{os.path.basename(payload.file)}: {payload.error}"
+                    )
+                else:
+                    refresh = True
+            elif kind == "error":
+                self.errors.append(payload)
+            else:
+                finished = True
+
+        done = int(self.progress["value"])
+        self.progress_label.configure(
+            text=f"{done} of {int(self.progress['maximum'])} files"
+        )
+        if refresh:
             self._refresh_table()
+        if finished:
+            self._finish_processing()
+        else:
+            self.after(self.POLL_INTERVAL_MS, self._poll_results)
+
+    def _cancel_processing(self):
+        self.cancelled.set()
+        self.cancel_button.configure(state="disabled")
+        self.progress_label.configure(text="Cancelling...")
+
+    def _finish_processing(self):
+        self.worker = None
+        self.cancel_button.configure(state="disabled")
+        for button in self.upload_buttons:
+            button.configure(state="normal")
+        self._refresh_table()
+
+        if self.cancelled.is_set():
+            self.progress_label.configure(text="Cancelled")
+        if self.errors:
+            listed = self.errors[: self.MAX_LISTED_ERRORS]
+            if len(self.errors) > len(listed):
+                listed.append(f"... and {len(self.errors) - len(listed)} more")
+            messagebox.showerror(
+                "Error",
+                f"{len(self.errors)} file(s) could not be processed:\n\n"
+                + "\n".join(listed),
+            )
 
     def _refresh_table(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
-        for f in self.output_dir.iterdir():
-            if f.suffix == ".pdf":
-                self.tree.insert(
-                    "",
-                    "end",
-                    values=(
-                        f.name,
-                        datetime.fromtimestamp(f.stat().st_mtime).strftime(
-                            "%Y-%m-%d %H:%M:%S"
-                        ),
-                    ),
-                )
+        """
+        Shows the current page of processed files. Rows are keyed by file name and only
+        the rows that changed are touched, so refreshing a long list stays cheap.
+        """
+        entries, total = self.file_service.list_files(
+            self.page * self.PAGE_SIZE, self.PAGE_SIZE, self.sort, self.descending
+        )
+        pages = max((total + self.PAGE_SIZE - 1) // self.PAGE_SIZE, 1)
+        if self.page >= pages:
+            self.page = pages - 1
+            return self._refresh_table()
+
+        names = {entry.name for entry in entries}
+        stale = [row for row in self.tree.get_children() if row not in names]
+        if stale:
+            self.tree.delete(*stale)
+            for row in stale:
+                self.thumbnails.pop(row, None)
+
+        for index, entry in enumerate(entries):
+            values = (PurePosixPath(entry.name).name, entry.date_modified)
+            if not self.tree.exists(entry.name):
+                self.tree.insert("", index, iid=entry.name, values=values)
+                continue
+            if tuple(map(str, self.tree.item(entry.name, "values"))) != values:
+                self.tree.item(entry.name, values=values)
+                self.thumbnails.pop(entry.name, None)  # rewritten since its preview
+            if self.tree.index(entry.name) != index:
+                self.tree.move(entry.name, "", index)
+
+        self.page_label.configure(
+            text=f"Page {self.page + 1} of {pages} ({total} files)"
+        )
+        self._load_thumbnails([entry.name for entry in entries])
+
+    def _load_thumbnails(self, names):
+        """
+        Renders the previews of the given rows that have none yet, on a background
+        thread. They are attached to their rows by `_poll_thumbnails`.
+        """
+        names = [
+            name
+            for name in names
+            if name not in self.thumbnails and name not in self.thumbnails_pending
+        ]
+        if not names:
+            return
+
+        polling = bool(self.thumbnails_pending)
+        self.thumbnails_pending.update(names)
+        Thread(target=self._render_thumbnails, args=(names,), daemon=True).start()
+        if not polling:
+            self.after(self.POLL_INTERVAL_MS, self._poll_thumbnails)
+
+    def _render_thumbnails(self, names):
+        for name in names:
+            preview = self.file_service.get_thumbnail(self.output_dir / name)
+            self.thumbnail_results.put((name, preview))
+
+    def _poll_thumbnails(self):
+        while True:
+            try:
+                name, preview = self.thumbnail_results.get_nowait()
+            except Empty:
+                break
+
+            self.thumbnails_pending.discard(name)
+            if preview is None or not self.tree.exists(name):
+                continue
+            try:
+                image = tk.PhotoImage(file=preview).subsample(self.THUMBNAIL_SUBSAMPLE)
+            except tk.TclError:
+                continue
+            self.thumbnails[name] = image
+            self.tree.item(name, image=image)
+
+        if self.thumbnails_pending:
+            self.after(self.POLL_INTERVAL_MS, self._poll_thumbnails)
+
+    def _change_page(self, step):
+        self.page = max(0, self.page + step)
+        self._refresh_table()
+
+    def _sort_table(self, column):
+        if self.sort == column:
+            self.descending = not self.descending
+        else:
+            self.sort = column
+            self.descending = column == "date"
+        self.page = 0
+        self._refresh_table()
 
     def _selected_file(self):
         selected = self.tree.selection()
         if not selected:
             messagebox.showwarning("No selection", "Select a file first.")
             return None
-        return self.output_dir / self.tree.item(selected[0])["values"][0]
+        return self.output_dir / selected[0]
 
     def _selected_files(self):
         selected = self.tree.selection()
         if not selected:
             messagebox.showwarning("No selection", "Select file(s) first.")
             return None
-        return [self.output_dir / self.tree.item(s)["values"][0] for s in selected]
+        return [self.output_dir / s for s in selected]
 
     def _view_file(self):
         file = self._selected_file()
@@ -218,10 +456,22 @@ class FiscalPDFApp(tk.Tk):
 
 
 def main():
-    file_service = FileService(INPUT_DIR, OUTPUT_DIR)
+    file_service = FileService(
+        INPUT_DIR,
+        OUTPUT_DIR,
+        result_cache=ResultCache(CACHE_DIR),
+        catalog=Catalog(CATALOG_PATH, OUTPUT_DIR),
+        retention_days=RETENTION_DAYS,
+        scan_interval=SCAN_INTERVAL,
+        quota_bytes=OUTPUT_QUOTA_BYTES,
+        save_profile=SAVE_PROFILE,
+        thumbnail_cache=ThumbnailCache(THUMBNAIL_DIR, OUTPUT_DIR),
+        low_memory=LOW_MEMORY,
+    )
     app = FiscalPDFApp(file_service)
     app.mainloop()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
@@ -1,10 +1,30 @@
+import multiprocessing
 import sys
 
-from src.desktop.app import main as desktop_main
-from src.web.app import main as web_main
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "--web":
+def main(argv=None):
+    """
+    Starts FiscalPDF in the mode selected on the command line: the desktop app by
+    default, the web server with `--web`, or headless batch processing with `--batch`.
+    Only the front-end of the selected mode is imported.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    mode = argv[0] if argv else None
+
+    if mode == "--batch":
+        from src.cli.app import main as batch_main
+
+        sys.exit(batch_main(argv[1:]))
+    elif mode == "--web":
+        from src.web.app import main as web_main
+
         web_main()
     else:
+        from src.desktop.app import main as desktop_main
+
         desktop_main()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -1,45 +1,108 @@
 import os
-from datetime import datetime
+from io import BytesIO
+from pathlib import Path, PurePosixPath
+from tempfile import NamedTemporaryFile
+import zipfile
 
 from flask import (
     Flask,
+    Response,
     render_template,
     request,
+    abort,
     flash,
+    jsonify,
     send_from_directory,
     redirect,
+    send_file,
     url_for,
 )
+from werkzeug.security import safe_join
 
-from src.config import INPUT_DIR, OUTPUT_DIR
+from src.config import (
+    CACHE_DIR,
+    CATALOG_PATH,
+    INPUT_DIR,
+    LOW_MEMORY,
+    OUTPUT_DIR,
+    OUTPUT_QUOTA_BYTES,
+    RETENTION_DAYS,
+    SAVE_PROFILE,
+    SCAN_INTERVAL,
+    THUMBNAIL_DIR,
+)
+from src.core.archive import stream_zip
+from src.core.catalog import Catalog
+from src.core.error import ArchiveWithoutPDFsException
 from src.core.file_service import FileService
+from src.core.result_cache import ResultCache
+from src.core.thumbnail_cache import ThumbnailCache
+from src.core.job_service import JobService
+from src.core.metrics import METRICS
+from src.core.pdf_service import SAVE_PROFILES, get_output_path
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
-file_service: FileService = FileService(INPUT_DIR, OUTPUT_DIR)
+file_service: FileService = FileService(
+    INPUT_DIR,
+    OUTPUT_DIR,
+    result_cache=ResultCache(CACHE_DIR),
+    catalog=Catalog(CATALOG_PATH, OUTPUT_DIR),
+    retention_days=RETENTION_DAYS,
+    scan_interval=SCAN_INTERVAL,
+    quota_bytes=OUTPUT_QUOTA_BYTES,
+    save_profile=SAVE_PROFILE,
+    thumbnail_cache=ThumbnailCache(THUMBNAIL_DIR, OUTPUT_DIR),
+    low_memory=LOW_MEMORY,
+)
+job_service: JobService = JobService(file_service)
 
 
-def save_uploaded_file(file):
-    save_path = INPUT_DIR.joinpath(file.filename)
-    f = open(save_path, "wb")
-    f.write(file.stream.read())
-    f.close()
-    return save_path
+PAGE_SIZE = 50
 
 
 @app.route("/")
 def home():
+    page = max(request.args.get("page", 1, type=int), 1)
+    sort = request.args.get("sort", "date")
+    order = request.args.get("order", "desc")
+    entries, total = file_service.list_files(
+        offset=(page - 1) * PAGE_SIZE,
+        limit=PAGE_SIZE,
+        sort=sort,
+        descending=order == "desc",
+    )
     processed_files = [
         {
-            "name": f.name,
-            "date_modified": datetime.fromtimestamp(f.stat().st_mtime).strftime(
-                "%Y-%m-%d %H:%M:%S"
-            ),
+            "name": entry.name,
+            "label": PurePosixPath(entry.name).name,
+            "date_modified": entry.date_modified,
         }
-        for f in OUTPUT_DIR.iterdir()
-        if f.is_file() and f.suffix == ".pdf"
+        for entry in entries
     ]
-    return render_template("home.html", processed_files=processed_files)
+    job = job_service.get(request.args.get("job", ""))
+    return render_template(
+        "home.html",
+        processed_files=processed_files,
+        job=job.to_dict() if job else None,
+        page=page,
+        pages=max((total + PAGE_SIZE - 1) // PAGE_SIZE, 1),
+        total=total,
+        sort=sort,
+        order=order,
+        save_profiles=list(SAVE_PROFILES),
+        default_profile=file_service.save_profile,
+    )
+
+
+def requested_profile():
+    """
+    Returns the save profile selected for a request, or None for the default.
+    """
+    profile = request.values.get("profile") or None
+    if profile is not None and profile not in SAVE_PROFILES:
+        abort(400, f"Unknown save profile: {profile}")
+    return profile
 
 
 @app.post("/upload")
@@ -49,11 +112,33 @@ def upload():
         flash("A file is required to upload")
         return redirect(url_for("home"))
 
-    uploaded_file = save_uploaded_file(file).as_posix()
-    error = file_service.handle_file_processing(uploaded_file)
+    job = job_service.submit(
+        [(file.filename, file.stream.read())], save_profile=requested_profile()
+    )
+    return redirect(url_for("home", job=job.id))
+
+
+@app.post("/redact")
+def redact():
+    """
+    Redacts the uploaded PDF in memory and streams the result straight back,
+    without writing the upload or the output to disk.
+    """
+    file = request.files.get("file")
+    if not file:
+        return "A file is required to upload", 400
+
+    output, error = file_service.handle_bytes(
+        file.stream.read(), file.filename, save_profile=requested_profile()
+    )
     if error:
-        flash(error)
-    return redirect(url_for("home"))
+        return error, 422
+    return send_file(
+        BytesIO(output),
+        mimetype="application/pdf",
+        as_attachment=True,
+        download_name=get_output_path(file.filename).name,
+    )
 
 
 @app.post("/bulk-upload")
@@ -63,32 +148,113 @@ def bulk_upload():
         flash("No files uploaded")
         return redirect(url_for("home"))
 
-    for file in files:
-        uploaded_file = save_uploaded_file(file).as_posix()
-        error = file_service.handle_file_processing(uploaded_file)
-        if error:
-            flash(error)
-    return redirect(url_for("home"))
+    job = job_service.submit(
+        [(file.filename, file.stream.read()) for file in files],
+        save_profile=requested_profile(),
+    )
+    return redirect(url_for("home", job=job.id))
 
 
-@app.route("/delete/<filename>")
+@app.post("/zip-upload")
+def zip_upload():
+    """
+    Accepts a ZIP archive of PDFs. The archive is written to the input directory as it
+    is received, and its PDF files are then read and processed in the background one
+    at a time, rather than all extracted up front.
+    """
+    file = request.files.get("archive")
+    if not file:
+        flash("A ZIP archive is required to upload")
+        return redirect(url_for("home"))
+
+    save_profile = requested_profile()
+    with NamedTemporaryFile(dir=INPUT_DIR, suffix=".zip", delete=False) as archive:
+        file.save(archive)
+    try:
+        job = job_service.submit_archive(Path(archive.name), save_profile=save_profile)
+    except zipfile.BadZipFile:
+        flash(f"{file.filename} is not a ZIP archive")
+        return redirect(url_for("home"))
+    except ArchiveWithoutPDFsException:
+        flash(f"No PDF files in {file.filename}")
+        return redirect(url_for("home"))
+    return redirect(url_for("home", job=job.id))
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = job_service.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
+
+
+@app.route("/delete/<path:filename>")
 def delete_file(filename):
-    if OUTPUT_DIR.joinpath(filename).exists():
-        os.remove(OUTPUT_DIR.joinpath(filename))
+    path = safe_join(str(OUTPUT_DIR), filename)
+    if path is None:
+        abort(404)
+    file_service.handle_delete(Path(path))
     return redirect(url_for("home"))
 
 
-@app.route("/download/<filename>")
+@app.route("/download/<path:filename>")
 def download_file(filename):
     return send_from_directory(OUTPUT_DIR, filename, as_attachment=True)
 
 
-@app.route("/view/<filename>")
+@app.route("/download-zip")
+def download_zip():
+    """
+    Streams a ZIP archive of the selected processed files (one `files` parameter per
+    file), or of every processed file if none is selected. The archive is generated
+    as it is sent, so it is never held in memory or written to disk.
+    """
+    names = request.args.getlist("files")
+    if names:
+        paths = [safe_join(str(OUTPUT_DIR), name) for name in names]
+        if None in paths:
+            abort(404)
+        entries = zip(names, paths)
+    else:
+        entries = (
+            (entry.name, OUTPUT_DIR / entry.name) for entry in file_service.iter_files()
+        )
+    return Response(
+        stream_zip(entries),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=fiscalpdf.zip"},
+    )
+
+
+@app.route("/view/<path:filename>")
 def view_pdf(filename):
     return send_from_directory(OUTPUT_DIR, filename)
 
 
+@app.route("/thumbnail/<path:filename>")
+def thumbnail(filename):
+    """
+    Serves a small preview of the first page of a processed file, rendered on the
+    first request and cached until the file changes or is removed.
+    """
+    path = safe_join(str(OUTPUT_DIR), filename)
+    preview = path and file_service.get_thumbnail(Path(path))
+    if not preview:
+        abort(404)
+    return send_file(preview, mimetype="image/png", max_age=3600)
+
+
+@app.route("/metrics")
+def metrics():
+    """
+    Exposes the processing metrics in the Prometheus text format.
+    """
+    return METRICS.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
 def main():
     from waitress import serve
 
+    file_service.run()
     serve(app, host="0.0.0.0", port=5000)
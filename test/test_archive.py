@@ -0,0 +1,67 @@
+import io
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from unittest import TestCase
+
+from src.core.archive import pdf_members, stream_zip
+
+TEST_PATH = Path(__file__).parent
+TEST_INPUT_DIR = TEST_PATH.joinpath("in")
+
+
+class TestArchive(TestCase):
+    def test_pdf_members(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("a/", "")
+            archive.writestr("a/1.PDF", b"1")
+            archive.writestr("a/b/2.pdf", b"2")
+            archive.writestr("notes.txt", b"3")
+            self.assertEqual(
+                [name for _, name in pdf_members(archive)], ["1.PDF", "2.pdf"]
+            )
+
+    def test_pdf_members_of_the_same_name(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("jan/invoice.pdf", b"1")
+            archive.writestr("feb/invoice.pdf", b"2")
+            archive.writestr("../../jan_invoice.pdf", b"3")
+            archive.writestr("statement.pdf", b"4")
+            self.assertEqual(
+                [name for _, name in pdf_members(archive)],
+                [
+                    "jan_invoice.pdf",
+                    "feb_invoice.pdf",
+                    "jan_invoice (2).pdf",
+                    "statement.pdf",
+                ],
+            )
+
+    def test_stream_zip(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        first = shutil.copy(TEST_INPUT_DIR / "1.pdf", directory / "1.pdf")
+        second = shutil.copy(TEST_INPUT_DIR / "2.pdf", directory / "2.pdf")
+        entries = [
+            ("2024-01-01/1.pdf", first),
+            ("missing.pdf", directory / "missing.pdf"),
+            ("2024-01-02/2.pdf", second),
+        ]
+
+        chunk_size = 16 * 1024
+        with self.assertLogs("fiscalpdf.archive", "ERROR") as logs:
+            parts = list(stream_zip(entries, chunk_size=chunk_size))
+        self.assertIn("missing.pdf", logs.output[0])
+        self.assertLess(max(map(len, parts)), chunk_size * 2)
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(parts))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(
+                archive.namelist(), ["2024-01-01/1.pdf", "2024-01-02/2.pdf"]
+            )
+            self.assertEqual(
+                archive.read("2024-01-02/2.pdf"), Path(second).read_bytes()
+            )
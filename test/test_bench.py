@@ -0,0 +1,66 @@
+from unittest import TestCase
+
+from bench.invoices import InvoiceSpec, generate_invoice
+from bench.pipeline import STAGES, compare, run_scenario
+from bench.startup import parse_importtime
+from bench.text import bench_text
+from src.core.pdf_service import (
+    REDACT_ENGINE,
+    get_pages_with_credit_notes,
+    open_pdf_stream,
+)
+
+
+class TestBench(TestCase):
+    def test_generate_invoice(self):
+        spec = InvoiceSpec(pages=3, spans=10, paths=5, images=2, match_frequency=0.0)
+        with open_pdf_stream(generate_invoice(spec)) as document:
+            self.assertEqual(document.page_count, 3)
+            self.assertEqual(len(document[0].get_images()), 2)
+            self.assertEqual(len(document[0].get_drawings()), 5)
+            self.assertEqual(get_pages_with_credit_notes(document), [])
+
+        spec = spec._replace(match_frequency=1.0)
+        with open_pdf_stream(generate_invoice(spec)) as document:
+            self.assertEqual(get_pages_with_credit_notes(document), [0, 1, 2])
+
+    def test_generate_invoice_is_deterministic(self):
+        spec = InvoiceSpec(pages=2, seed=7)
+        self.assertEqual(generate_invoice(spec), generate_invoice(spec))
+
+    def test_run_scenario(self):
+        result = run_scenario(InvoiceSpec(pages=2, spans=10), repeat=1)
+        self.assertEqual(result["matched_pages"], 1)
+        self.assertEqual(set(result["seconds"]), set(STAGES))
+        for stage in ("open", "detect", "replace", "text", "save"):
+            self.assertGreater(result["seconds"][stage], 0)
+
+    def test_run_scenario_with_template_cache(self):
+        spec = InvoiceSpec(pages=3, spans=10, match_frequency=0.0, reference_line=2)
+        result = run_scenario(spec, repeat=1, engine=REDACT_ENGINE, template_cache=True)
+        self.assertEqual(result["matched_pages"], 3)
+        self.assertGreater(result["seconds"]["replace"], 0)
+
+    def test_compare(self):
+        baseline = {"scenarios": {"a": {"seconds": {"open": 0.01, "save": 0.0001}}}}
+        results = {"scenarios": {"a": {"seconds": {"open": 0.02, "save": 0.01}}}}
+        self.assertEqual(compare(results, baseline, 1.25), [("a", "open", 0.01, 0.02)])
+        self.assertEqual(compare(results, baseline, 3.0), [])
+
+    def test_batched_text_matches_per_span_text(self):
+        data = generate_invoice(InvoiceSpec(pages=1, spans=20, match_frequency=0.5))
+        results = bench_text(data, repeat=1)
+        _, per_span_content, per_span_size, per_span_words = results["per-span"]
+        _, batched_content, batched_size, batched_words = results["batched"]
+        self.assertEqual(batched_words, per_span_words)
+        self.assertLessEqual(batched_content, per_span_content)
+        self.assertLess(batched_size, per_span_size)
+
+    def test_parse_importtime(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   fitz\n"
+            "import time:        80 |        200 | src.cli.app\n"
+        )
+        self.assertEqual(parse_importtime(stderr, "src.cli.app"), 200)
+        self.assertIsNone(parse_importtime(stderr, "src.web.app"))
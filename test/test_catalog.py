@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from src.core.catalog import Catalog
+from src.core.file_service import FileService
+
+TEST_PATH = Path(__file__).parent
+TEST_INPUT_DIR = TEST_PATH.joinpath("in")
+
+
+class TestCatalog(TestCase):
+    def setUp(self):
+        self.db_dir = Path(tempfile.mkdtemp())
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.catalog = Catalog(self.db_dir / "catalog.sqlite3", self.output_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.db_dir, ignore_errors=True)
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def write(self, name, size, modified):
+        path = self.output_dir / name
+        path.write_bytes(b"x" * size)
+        os.utime(path, (modified, modified))
+        return path
+
+    def test_page_sorting(self):
+        self.catalog.add(self.write("b.pdf", 3, 100))
+        self.catalog.add(self.write("a.pdf", 1, 300))
+        self.catalog.add(self.write("c.pdf", 2, 200))
+
+        names = lambda entries: [entry.name for entry in entries]
+        self.assertEqual(names(self.catalog.page()), ["a.pdf", "c.pdf", "b.pdf"])
+        self.assertEqual(
+            names(self.catalog.page(sort="name", descending=False)),
+            ["a.pdf", "b.pdf", "c.pdf"],
+        )
+        self.assertEqual(
+            names(self.catalog.page(sort="size", descending=True)),
+            ["b.pdf", "c.pdf", "a.pdf"],
+        )
+        self.assertEqual(names(self.catalog.page(offset=1, limit=1)), ["c.pdf"])
+        self.assertEqual(self.catalog.count(), 3)
+
+    def test_remove(self):
+        path = self.write("a.pdf", 1, 100)
+        self.catalog.add(path)
+        self.catalog.remove(path)
+        self.assertEqual(self.catalog.count(), 0)
+
+    def test_sync(self):
+        stale = self.write("stale.pdf", 1, 100)
+        self.catalog.add(stale)
+        os.remove(stale)
+        self.write("new.pdf", 1, 200)
+        self.write("notes.txt", 1, 200)
+
+        self.catalog.sync()
+        self.assertEqual([entry.name for entry in self.catalog.page()], ["new.pdf"])
+
+    def test_file_service_records_outputs(self):
+        input_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, input_dir, ignore_errors=True)
+        file_service = FileService(input_dir, self.output_dir, catalog=self.catalog)
+
+        path = shutil.copy(TEST_INPUT_DIR / "1.pdf", input_dir / "1.pdf")
+        result = file_service.handle_batch([path])[0]
+        self.assertIsNone(result.error)
+
+        entries, total = file_service.list_files()
+        self.assertEqual(total, 1)
+        self.assertEqual(
+            entries[0].name, Path(result.output).relative_to(self.output_dir).as_posix()
+        )
+
+        file_service.handle_delete(Path(result.output))
+        self.assertEqual(file_service.list_files(), ([], 0))
+
+    def test_list_files_without_catalog(self):
+        file_service = FileService(self.output_dir, self.output_dir)
+        self.write("a.pdf", 2, 100)
+        self.write("b.pdf", 1, 200)
+
+        entries, total = file_service.list_files(sort="size", descending=False)
+        self.assertEqual(total, 2)
+        self.assertEqual([entry.name for entry in entries], ["b.pdf", "a.pdf"])
@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from src.cli.app import (
+    EXIT_FAILED,
+    EXIT_OK,
+    EXIT_USAGE,
+    FAILED,
+    MODIFIED,
+    find_collisions,
+    find_inputs,
+    main,
+    outcome_of,
+    run_batch,
+)
+from src.core.pdf_service import RECONSTRUCT_ENGINE
+from src.core.rules import DEFAULT_RULES
+
+TEST_PATH = Path(__file__).parent
+TEST_INPUT_DIR = TEST_PATH.joinpath("in")
+
+
+class TestBatchCLI(TestCase):
+    def setUp(self):
+        self.input_dir = Path(tempfile.mkdtemp())
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.input_dir.joinpath("sub").mkdir()
+        shutil.copy(TEST_INPUT_DIR / "1.pdf", self.input_dir / "1.pdf")
+        shutil.copy(TEST_INPUT_DIR / "2.pdf", self.input_dir / "sub" / "2.pdf")
+        self.input_dir.joinpath("notes.txt").write_text("not a pdf")
+
+    def tearDown(self):
+        shutil.rmtree(self.input_dir, ignore_errors=True)
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def names(self, items):
+        return [item.input_path.name for item in items]
+
+    def test_find_inputs(self):
+        directory = str(self.input_dir)
+        self.assertEqual(
+            self.names(find_inputs([directory], self.output_dir)), ["1.pdf"]
+        )
+
+        items = find_inputs([directory], self.output_dir, recursive=True)
+        self.assertEqual(self.names(items), ["1.pdf", "2.pdf"])
+        self.assertEqual(items[1].output_dir, self.output_dir / "sub")
+
+        pattern = str(self.input_dir / "**" / "*.pdf")
+        items = find_inputs([pattern, directory], self.output_dir, recursive=True)
+        self.assertEqual(self.names(items), ["1.pdf", "2.pdf"])
+
+    def test_main_keeps_inputs_and_mirrors_directories(self):
+        code = main([str(self.input_dir), "-r", "-o", str(self.output_dir), "-q"])
+        self.assertEqual(code, EXIT_OK)
+        self.assertTrue(self.input_dir.joinpath("1.pdf").exists())
+        self.assertTrue(self.input_dir.joinpath("sub", "2.pdf").exists())
+        self.assertTrue(self.output_dir.joinpath("modified_1.pdf").exists())
+        self.assertTrue(self.output_dir.joinpath("sub", "modified_2.pdf").exists())
+
+    def test_same_named_files_are_mirrored_apart(self):
+        for name in ("a", "b"):
+            self.input_dir.joinpath(name).mkdir()
+            shutil.copy(TEST_INPUT_DIR / "1.pdf", self.input_dir / name / "x.pdf")
+        pattern = str(self.input_dir / "**" / "x.pdf")
+        named = [str(self.input_dir / name / "x.pdf") for name in ("a", "b")]
+
+        for inputs in ([pattern], named):
+            items = find_inputs(inputs, self.output_dir, recursive=True)
+            self.assertEqual(
+                [item.output_dir for item in items],
+                [self.output_dir / "a", self.output_dir / "b"],
+            )
+            self.assertEqual(find_collisions(items), {})
+
+        code = main([pattern, "-r", "-o", str(self.output_dir), "-q"])
+        self.assertEqual(code, EXIT_OK)
+        self.assertTrue(self.output_dir.joinpath("a", "modified_x.pdf").exists())
+        self.assertTrue(self.output_dir.joinpath("b", "modified_x.pdf").exists())
+
+    def test_main_rejects_colliding_outputs(self):
+        other_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, other_dir, ignore_errors=True)
+        shutil.copy(TEST_INPUT_DIR / "2.pdf", other_dir / "1.pdf")
+
+        inputs = [str(self.input_dir), str(other_dir)]
+        items = find_inputs(inputs, self.output_dir)
+        self.assertEqual(
+            list(find_collisions(items)), [self.output_dir / "modified_1.pdf"]
+        )
+        self.assertEqual(main([*inputs, "-o", str(self.output_dir)]), EXIT_USAGE)
+        self.assertEqual(list(self.output_dir.iterdir()), [])
+
+    def test_main_reports_failures(self):
+        self.input_dir.joinpath("bad.pdf").write_bytes(b"not a pdf")
+        code = main([str(self.input_dir), "-o", str(self.output_dir), "-j", "2", "-q"])
+        self.assertEqual(code, EXIT_FAILED)
+
+    def test_main_without_inputs(self):
+        empty = str(self.input_dir / "missing" / "*.pdf")
+        self.assertEqual(main([empty, "-o", str(self.output_dir)]), EXIT_USAGE)
+
+    def test_fail_fast(self):
+        self.input_dir.joinpath("0.pdf").write_bytes(b"not a pdf")
+        items = find_inputs([str(self.input_dir)], self.output_dir)
+
+        results = run_batch(
+            items, DEFAULT_RULES, RECONSTRUCT_ENGINE, workers=1, fail_fast=True
+        )
+        self.assertEqual([outcome_of(result) for result in results], [FAILED])
+
+        results = run_batch(items, DEFAULT_RULES, RECONSTRUCT_ENGINE, workers=1)
+        self.assertEqual([outcome_of(result) for result in results], [FAILED, MODIFIED])
+
+    def test_worker_dying_fails_its_files_only(self):
+        for number in range(12):
+            shutil.copy(TEST_INPUT_DIR / "2.pdf", self.input_dir / f"{number}.pdf")
+        items = find_inputs([str(self.input_dir)], self.output_dir)
+
+        class KillWorkersOnce:
+            killed = False
+
+            def update(self, result):
+                if not self.killed:
+                    self.killed = True
+                    for worker in multiprocessing.active_children():
+                        try:
+                            os.kill(worker.pid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            continue  # already exited
+
+        results = run_batch(
+            items,
+            DEFAULT_RULES,
+            RECONSTRUCT_ENGINE,
+            workers=2,
+            progress=KillWorkersOnce(),
+        )
+        outcomes = [outcome_of(result) for result in results]
+        self.assertEqual(len(results), len(items))
+        self.assertIn(FAILED, outcomes)
+        self.assertEqual(outcomes[-1], MODIFIED)
+
+    def test_no_front_end_imports(self):
+        code = (
+            "import sys, src.cli.app; "
+            "print(any(m in sys.modules for m in "
+            "('tkinter', 'flask', 'src.web.app', 'platformdirs')))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=TEST_PATH.parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        self.assertEqual(output.splitlines()[-1], "False")
@@ -0,0 +1,206 @@
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from threading import Event
+from unittest import TestCase, mock
+
+from src.core.catalog import Catalog
+from src.core.file_service import FileService, get_shard_dir
+
+TEST_PATH = Path(__file__).parent
+TEST_INPUT_DIR = TEST_PATH.joinpath("in")
+
+
+class TestFileService(TestCase):
+    def setUp(self):
+        self.input_dir = Path(tempfile.mkdtemp())
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.file_service = FileService(self.input_dir, self.output_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.input_dir, ignore_errors=True)
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def stage(self, name):
+        return shutil.copy(TEST_INPUT_DIR / name, self.input_dir / name)
+
+    def test_handle_batch_preserves_input_order(self):
+        paths = [
+            self.stage("1.pdf"),
+            (self.input_dir / "missing.pdf").as_posix(),
+            self.stage("2.pdf"),
+        ]
+        results = self.file_service.handle_batch(paths, workers=2)
+
+        self.assertEqual([result.file for result in results], [str(p) for p in paths])
+        self.assertIsNone(results[0].error)
+        self.assertIsNotNone(results[1].error)
+        self.assertIsNone(results[2].error)
+        self.assertEqual(Path(results[0].output).parent.parent, self.output_dir)
+        self.assertTrue(Path(results[0].output).name.endswith("1.pdf"))
+        self.assertTrue(Path(results[2].output).name.endswith("2.pdf"))
+
+    def test_handle_batch_removes_inputs(self):
+        paths = [self.stage("3.pdf"), self.stage("4.pdf")]
+        self.file_service.handle_batch(paths, workers=2)
+
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+
+    def test_handle_batch_empty(self):
+        self.assertEqual(self.file_service.handle_batch([]), [])
+
+    def test_iter_batch_yields_every_result(self):
+        for workers in (1, 2):
+            paths = [self.stage("1.pdf"), self.stage("2.pdf"), self.stage("3.pdf")]
+            results = list(self.file_service.iter_batch(paths, workers=workers))
+            self.assertEqual(
+                sorted(result.file for result in results), sorted(map(str, paths))
+            )
+            self.assertTrue(all(result.error is None for result in results))
+
+    def test_iter_batch_stops_when_cancelled(self):
+        paths = [self.stage("1.pdf"), self.stage("2.pdf"), self.stage("3.pdf")]
+        cancelled = Event()
+        results = []
+        for result in self.file_service.iter_batch(
+            paths, workers=1, cancelled=cancelled
+        ):
+            results.append(result)
+            cancelled.set()
+
+        self.assertEqual([result.file for result in results], [str(paths[0])])
+        self.assertTrue(os.path.exists(paths[1]))
+
+    def test_iter_batch_survives_a_worker_dying(self):
+        paths = [
+            shutil.copy(TEST_INPUT_DIR / "2.pdf", self.input_dir / f"{number}.pdf")
+            for number in range(12)
+        ]
+        results = []
+        for result in self.file_service.iter_batch(paths, workers=2):
+            if not results:
+                for worker in multiprocessing.active_children():
+                    try:
+                        os.kill(worker.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        continue  # already exited
+            results.append(result)
+
+        self.assertEqual(
+            sorted(result.file for result in results), sorted(map(str, paths))
+        )
+        self.assertTrue(any(result.error for result in results))
+        self.assertIsNone(results[-1].error)
+
+    def test_iter_batch_keeps_inputs_in_place(self):
+        source_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source_dir, ignore_errors=True)
+        path = shutil.copy(TEST_INPUT_DIR / "1.pdf", source_dir / "1.pdf")
+        before = Path(path).read_bytes()
+
+        results = list(self.file_service.iter_batch([path], keep_inputs=True))
+        self.assertIsNone(results[0].error)
+        self.assertEqual(Path(path).read_bytes(), before)
+        self.assertEqual(list(self.input_dir.iterdir()), [])
+
+    def test_handle_batch_low_memory(self):
+        file_service = FileService(self.input_dir, self.output_dir, low_memory=True)
+        paths = [self.stage("1.pdf"), self.stage("2.pdf"), self.stage("3.pdf")]
+        for workers in (1, 2):
+            results = file_service.handle_batch(paths, workers=workers)
+            self.assertTrue(all(result.error is None for result in results))
+            self.assertTrue(all(result.metrics["peak_rss"] for result in results))
+            paths = [self.stage(name) for name in ("1.pdf", "2.pdf", "3.pdf")]
+
+    def test_handle_bytes(self):
+        data = TEST_INPUT_DIR.joinpath("5.pdf").read_bytes()
+        output, error = self.file_service.handle_bytes(data, "5.pdf")
+
+        self.assertIsNone(error)
+        self.assertTrue(output.startswith(b"%PDF"))
+        self.assertEqual(list(self.input_dir.iterdir()), [])
+        self.assertEqual(list(self.output_dir.iterdir()), [])
+
+    def test_handle_bytes_invalid_pdf(self):
+        output, error = self.file_service.handle_bytes(b"not a pdf", "bad.pdf")
+        self.assertIsNone(output)
+        self.assertIn("bad.pdf", error)
+
+    def write_output(self, days_ago, name, size=1):
+        date = datetime.now() - timedelta(days=days_ago)
+        path = get_shard_dir(self.output_dir, date).joinpath(name)
+        path.write_bytes(b"x" * size)
+        os.utime(path, (date.timestamp(), date.timestamp()))
+        return path
+
+    def test_handle_old_files_removes_expired_shards(self):
+        catalog = Catalog(self.input_dir / "catalog.sqlite3", self.output_dir)
+        file_service = FileService(
+            self.input_dir, self.output_dir, catalog=catalog, retention_days=7
+        )
+        expired = self.write_output(8, "old.pdf")
+        kept = self.write_output(6, "recent.pdf")
+        empty = get_shard_dir(self.output_dir, datetime.now() - timedelta(days=1))
+        legacy = self.output_dir.joinpath("legacy.pdf")
+        legacy.write_bytes(b"x")
+        stale = time.time() - 8 * 24 * 60 * 60
+        os.utime(legacy, (stale, stale))
+        catalog.sync()
+
+        file_service.handle_old_files()
+        self.assertFalse(expired.parent.exists())
+        self.assertFalse(empty.exists())
+        self.assertFalse(legacy.exists())
+        self.assertTrue(kept.exists())
+        self.assertEqual(
+            [entry.name for entry in file_service.list_files()[0]],
+            [kept.relative_to(self.output_dir).as_posix()],
+        )
+
+    def test_handle_old_files_catalogs_what_is_left_of_a_shard(self):
+        catalog = Catalog(self.input_dir / "catalog.sqlite3", self.output_dir)
+        file_service = FileService(
+            self.input_dir, self.output_dir, catalog=catalog, retention_days=7
+        )
+        removed = self.write_output(8, "a.pdf")
+        left = self.write_output(8, "b.pdf")
+        catalog.sync()
+
+        def remove_partly(shard):
+            os.remove(removed)
+            raise PermissionError(f"cannot remove {left}")
+
+        with mock.patch("shutil.rmtree", remove_partly):
+            with self.assertLogs("fiscalpdf.files", "ERROR"):
+                file_service.handle_old_files()
+        self.assertEqual(
+            [entry.name for entry in file_service.list_files()[0]],
+            [left.relative_to(self.output_dir).as_posix()],
+        )
+
+    def test_handle_old_files_enforces_quota_oldest_first(self):
+        for catalog in (
+            None,
+            Catalog(self.input_dir / "catalog.sqlite3", self.output_dir),
+        ):
+            with self.subTest(catalog=catalog):
+                file_service = FileService(
+                    self.input_dir, self.output_dir, catalog=catalog, quota_bytes=10
+                )
+                oldest = self.write_output(3, "a.pdf", size=5)
+                older = self.write_output(2, "b.pdf", size=5)
+                newest = self.write_output(1, "c.pdf", size=5)
+                if catalog:
+                    catalog.sync()
+
+                file_service.handle_old_files()
+                self.assertFalse(oldest.exists())
+                self.assertTrue(older.exists())
+                self.assertTrue(newest.exists())
+                self.assertEqual(file_service.list_files()[1], 2)
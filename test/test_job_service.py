@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import time
+import zipfile
+from concurrent.futures import wait
+from pathlib import Path
+from threading import Thread
+from unittest import TestCase
+
+from src.core.error import ArchiveWithoutPDFsException
+from src.core.file_service import FileService
+from src.core.job_service import DONE, FAILED, JobService
+from src.core.pdf_service import FITZ_LOCK
+
+TEST_PATH = Path(__file__).parent
+TEST_INPUT_DIR = TEST_PATH.joinpath("in")
+
+
+class TestJobService(TestCase):
+    def setUp(self):
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.file_service = FileService(self.output_dir, self.output_dir)
+        self.job_service = JobService(self.file_service, workers=2, max_jobs=1)
+
+    def tearDown(self):
+        self.job_service.shutdown()
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def wait_for(self, job):
+        wait([file.future for file in job.files])
+
+    def test_submit_reports_per_file_results(self):
+        uploads = [
+            ("1.pdf", TEST_INPUT_DIR.joinpath("1.pdf").read_bytes()),
+            ("bad.pdf", b"not a pdf"),
+        ]
+        job = self.job_service.submit(uploads)
+        self.assertIs(self.job_service.get(job.id), job)
+
+        self.wait_for(job)
+        status = job.to_dict()
+        self.assertTrue(status["finished"])
+        self.assertEqual((status["completed"], status["failed"]), (2, 1))
+        self.assertEqual(
+            [file["name"] for file in status["files"]], ["1.pdf", "bad.pdf"]
+        )
+        self.assertEqual([file["state"] for file in status["files"]], [DONE, FAILED])
+        self.assertEqual(status["files"][0]["output"], "modified_1.pdf")
+        self.assertEqual(len(list(self.output_dir.rglob("modified_1.pdf"))), 1)
+        self.assertIsNotNone(status["files"][1]["error"])
+
+    def test_pool_is_replaced_after_a_worker_dies(self):
+        upload = ("1.pdf", TEST_INPUT_DIR.joinpath("1.pdf").read_bytes())
+        self.wait_for(self.job_service.submit([upload]))
+        for worker in multiprocessing.active_children():
+            try:
+                os.kill(worker.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                continue  # already exited
+            worker.join()
+
+        # Files already queued when the pool breaks fail, later files are processed
+        states = []
+        for _ in range(3):
+            job = self.job_service.submit([upload])
+            self.wait_for(job)
+            states.append(job.files[0].state)
+            if states[-1] == DONE:
+                break
+        self.assertEqual(states[-1], DONE)
+        self.assertTrue(set(states) <= {DONE, FAILED})
+
+    def test_workers_started_while_another_thread_uses_pymupdf(self):
+        upload = ("1.pdf", TEST_INPUT_DIR.joinpath("1.pdf").read_bytes())
+        jobs = []
+        with FITZ_LOCK:
+            thread = Thread(
+                target=lambda: jobs.append(self.job_service.submit([upload]))
+            )
+            thread.start()
+            thread.join()
+
+        done, _ = wait([jobs[0].files[0].future], timeout=60)
+        self.assertEqual(len(done), 1)
+        self.assertEqual(jobs[0].files[0].state, DONE)
+
+    def test_finished_jobs_are_forgotten(self):
+        first = self.job_service.submit([("bad.pdf", b"")])
+        self.wait_for(first)
+        second = self.job_service.submit([("bad.pdf", b"")])
+
+        self.assertIsNone(self.job_service.get(first.id))
+        self.assertIs(self.job_service.get(second.id), second)
+
+    def test_submit_archive_processes_pdf_members(self):
+        archive_path = self.output_dir / "upload.zip"
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.write(TEST_INPUT_DIR / "1.pdf", "1.pdf")
+            archive.write(TEST_INPUT_DIR / "2.pdf", "march/2.pdf")
+            archive.writestr("notes.txt", "not a pdf")
+            archive.writestr("bad.pdf", b"not a pdf")
+
+        job = self.job_service.submit_archive(archive_path)
+        self.assertEqual(
+            [file.name for file in job.files], ["1.pdf", "2.pdf", "bad.pdf"]
+        )
+
+        deadline = time.monotonic() + 60
+        while not job.finished and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual([file.state for file in job.files], [DONE, DONE, FAILED])
+        self.assertFalse(archive_path.exists())
+
+    def test_submit_archive_keeps_members_of_the_same_name(self):
+        archive_path = self.output_dir / "upload.zip"
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.write(TEST_INPUT_DIR / "1.pdf", "jan/invoice.pdf")
+            archive.write(TEST_INPUT_DIR / "2.pdf", "feb/invoice.pdf")
+
+        job = self.job_service.submit_archive(archive_path)
+        deadline = time.monotonic() + 60
+        while not job.finished and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual([file.state for file in job.files], [DONE, DONE])
+        self.assertEqual(
+            sorted(path.name for path in self.output_dir.rglob("modified_*.pdf")),
+            ["modified_feb_invoice.pdf", "modified_jan_invoice.pdf"],
+        )
+
+    def test_submit_archive_rejects_other_files(self):
+        archive_path = self.output_dir / "upload.zip"
+        archive_path.write_bytes(b"not a zip")
+        with self.assertRaises(zipfile.BadZipFile):
+            self.job_service.submit_archive(archive_path)
+        self.assertFalse(archive_path.exists())
+
+    def test_submit_archive_rejects_archives_without_pdfs(self):
+        archive_path = self.output_dir / "upload.zip"
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.writestr("notes.txt", "not a pdf")
+        with self.assertRaises(ArchiveWithoutPDFsException):
+            self.job_service.submit_archive(archive_path)
+        self.assertFalse(archive_path.exists())
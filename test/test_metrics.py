@@ -0,0 +1,96 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from src.core.file_service import ProcessingOptions, process_file, process_upload
+from src.core.metrics import (
+    DocumentMetrics,
+    MetricsRegistry,
+    count,
+    merge,
+    peak_rss,
+    record_document,
+    timer,
+)
+
+TEST_PATH = Path(__file__).parent
+TEST_INPUT_DIR = TEST_PATH.joinpath("in")
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.options = ProcessingOptions(self.output_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_timers_and_counters_need_a_recorded_document(self):
+        with timer("open"):
+            count("pages", 3)
+
+        metrics = DocumentMetrics("a.pdf")
+        with record_document(metrics):
+            with timer("open"):
+                count("pages", 3)
+            with timer("open"):
+                pass
+        self.assertEqual(list(metrics.seconds), ["open"])
+        self.assertEqual(metrics.counts["pages"], 3)
+        self.assertGreaterEqual(metrics.total, metrics.seconds["open"])
+
+    def test_process_file_collects_stages(self):
+        input_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, input_dir, ignore_errors=True)
+        path = shutil.copy(TEST_INPUT_DIR / "1.pdf", input_dir / "1.pdf")
+
+        result = process_file(path, self.options)
+        self.assertIsNone(result.error)
+        self.assertEqual(
+            set(result.metrics["seconds"]),
+            {"open", "detect", "graphics", "images", "text", "save"},
+        )
+        counts = result.metrics["counts"]
+        self.assertGreater(counts["pages"], 0)
+        self.assertGreater(counts["spans"], 0)
+        self.assertGreater(counts["matches"], 0)
+        self.assertAlmostEqual(result.seconds, result.metrics["total"], places=5)
+
+    def test_record_document_measures_peak_rss(self):
+        if peak_rss() is None:
+            self.skipTest("peak RSS cannot be measured on this platform")
+
+        worker = DocumentMetrics("a.pdf")
+        worker.peak_rss = 1 << 50
+        metrics = DocumentMetrics("a.pdf")
+        with record_document(metrics):
+            merge(worker)
+        self.assertEqual(metrics.peak_rss, 1 << 50)
+
+        metrics = DocumentMetrics("b.pdf")
+        with record_document(metrics):
+            data = bytearray(32 * 1024**2)
+        del data
+        self.assertGreaterEqual(metrics.to_dict()["peak_rss"], 32 * 1024**2)
+        self.assertLess(metrics.peak_rss, 1 << 50)
+
+    def test_process_upload_records_error_type(self):
+        result = process_upload(b"not a pdf", "bad.pdf", self.options)
+        self.assertEqual(result.metrics["error"], "PathNotPDFFileException")
+
+    def test_render(self):
+        registry = MetricsRegistry()
+        data = TEST_INPUT_DIR.joinpath("2.pdf").read_bytes()
+        registry.observe(process_upload(data, "2.pdf", self.options).metrics)
+        registry.observe(process_upload(b"", "bad.pdf", self.options).metrics)
+
+        text = registry.render()
+        self.assertIn('fiscalpdf_stage_seconds_count{stage="text"} 1', text)
+        self.assertIn('fiscalpdf_stage_seconds_bucket{stage="open",le="+Inf"} 2', text)
+        self.assertIn("fiscalpdf_document_seconds_count 2", text)
+        self.assertIn('fiscalpdf_documents_total{outcome="processed"} 1', text)
+        self.assertIn('fiscalpdf_documents_total{outcome="failed"} 1', text)
+        self.assertIn('fiscalpdf_errors_total{type="PathNotPDFFileException"} 1', text)
+        self.assertIn('fiscalpdf_errors_total{type="PDFCreationFailException"} 0', text)
+        self.assertRegex(text, r"fiscalpdf_document_peak_rss_bytes \d+")
@@ -1,15 +1,34 @@
 import os
 import re
+import tempfile
 from pathlib import Path
 from unittest import TestCase
+from unittest import mock
+import fitz
 from parameterized import parameterized
 
+from src.core.error import NothingToModifyException, PathNotPDFFileException
+from src.core.image_cache import IMAGE_CACHE, ImageCache
+from src.core.metrics import DocumentMetrics, record_document
+from src.core import pdf_service
 from src.core.pdf_service import (
-    CREDIT_NOTE_PATTERN,
+    COMPACT_PROFILE,
+    FAST_PROFILE,
+    RECONSTRUCT_ENGINE,
+    REDACT_ENGINE,
+    SEARCH_DETECTION,
+    XOBJECT_ENGINE,
+    find_matches,
     get_pages_with_credit_notes,
     open_pdf_document,
+    open_pdf_stream,
+    process_pdf_bytes,
     replace_matches_in_pdf,
+    save_modified_document,
+    split_page_ranges,
 )
+from src.core.rules import DEFAULT_RULES
+from src.core.text_cache import text_cache_for
 
 TEST_PATH = Path(__file__).parent
 TEST_INPUT_DIR = TEST_PATH.joinpath("in")
@@ -38,16 +57,48 @@ class TestPDF(TestCase):
             self.assertEqual(pages, [0])
 
     @parameterized.expand([(file,) for file in get_input_files()])
-    def test_replace_matches_in_pdf(self, file):
+    def test_search_detection(self, file):
+        with open_pdf_document((TEST_INPUT_DIR / file).as_posix()) as doc:
+            found = find_matches(doc, strategy=SEARCH_DETECTION)
+            self.assertEqual([matches.page for matches in found], [0])
+            self.assertTrue(found[0].rects)
+            for rect in found[0].rects:
+                text = doc[0].get_textbox(rect)
+                self.assertTrue(DEFAULT_RULES.may_match(text), text)
+
+    def test_search_detection_rejects_pages_without_anchor(self):
+        document = fitz.open()
+        document.new_page().insert_text((50, 100), "Tax Invoice 123/45/C")
+        document.new_page().insert_text((50, 100), "Credit notes are issued monthly")
+        document.new_page().insert_text((50, 100), "Ref Credit Note:")
+        document[2].insert_text((50, 112), "123/45/C")
+
+        found = find_matches(document, strategy=SEARCH_DETECTION)
+        self.assertEqual([matches.page for matches in found], [2])
+        self.assertEqual(len(found[0].rects), 2)  # the match spans two lines
+        self.assertEqual(get_pages_with_credit_notes(document), [2])
+
+    def test_unknown_detection_strategy(self):
+        with self.assertRaises(ValueError):
+            find_matches(fitz.open(), strategy="ocr")
+
+    @parameterized.expand(
+        [
+            (file, engine)
+            for file in get_input_files()
+            for engine in (RECONSTRUCT_ENGINE, XOBJECT_ENGINE)
+        ]
+    )
+    def test_replace_matches_in_pdf(self, file, engine):
         with open_pdf_document((TEST_INPUT_DIR / file).as_posix()) as doc:
             pages = get_pages_with_credit_notes(doc)
-            processed_doc = replace_matches_in_pdf(doc, pages, "CN")
+            processed_doc = replace_matches_in_pdf(doc, pages, engine=engine)
 
             expected = ""
             for page_num in pages:
                 page = doc.load_page(page_num)
                 text: str = page.get_text()  # type: ignore
-                expected += re.sub(CREDIT_NOTE_PATTERN, "CN", text, flags=re.IGNORECASE)
+                expected += DEFAULT_RULES.sub(text)
             expected = re.sub(r"\s+", " ", expected)
 
             actual = ""
@@ -56,3 +107,230 @@ class TestPDF(TestCase):
                 text = page.get_text()  # type: ignore
                 actual += re.sub(r"\s+", " ", text)
             self.assertEqual(expected, actual)
+
+    @parameterized.expand([(file,) for file in get_input_files()])
+    def test_replace_matches_in_pdf_redact_engine(self, file):
+        with open_pdf_document((TEST_INPUT_DIR / file).as_posix()) as doc:
+            pages = get_pages_with_credit_notes(doc)
+            processed_doc = replace_matches_in_pdf(doc, pages, engine=REDACT_ENGINE)
+
+            # Replacement text is appended to the page content, so compare the
+            # text in reading order rather than in content-stream order.
+            expected = []
+            actual = []
+            for index, page_num in enumerate(pages):
+                text: str = doc.load_page(page_num).get_text(sort=True)  # type: ignore
+                expected += DEFAULT_RULES.sub(text).split()
+                actual += processed_doc.load_page(index).get_text(sort=True).split()  # type: ignore
+            self.assertEqual(expected, actual)
+            self.assertEqual(len(processed_doc), len(pages))
+
+    @parameterized.expand([(REDACT_ENGINE,), (XOBJECT_ENGINE,)])
+    def test_shared_resources_copied_once(self, engine):
+        with fitz.open(TEST_INPUT_DIR / "2.pdf") as document:
+            for _ in range(9):
+                document.fullcopy_page(0)  # shares the fonts and images of the page
+            data = document.tobytes(deflate=True)
+
+        output = process_pdf_bytes(data, engine=engine)
+        self.assertLess(len(output), len(data))
+        with open_pdf_stream(output) as processed_doc:
+            self.assertEqual(len(processed_doc), 10)
+
+    @parameterized.expand([(file,) for file in get_input_files()])
+    def test_text_cache_shared_between_detection_and_rewrite(self, file):
+        with open_pdf_document((TEST_INPUT_DIR / file).as_posix()) as doc:
+            with text_cache_for(doc) as text_cache:
+                pages = get_pages_with_credit_notes(doc)
+                self.assertEqual(len(text_cache), len(pages))
+                for page_num in pages:
+                    self.assertIn(page_num, text_cache)
+
+                replace_matches_in_pdf(doc, pages)
+                self.assertEqual(len(text_cache), 0)
+
+    @parameterized.expand([(file,) for file in get_input_files()])
+    def test_process_pdf_bytes(self, file):
+        path = TEST_INPUT_DIR / file
+        output = process_pdf_bytes(path.read_bytes(), name=file)
+
+        with open_pdf_document(path.as_posix()) as doc:
+            expected = DEFAULT_RULES.sub(doc.load_page(0).get_text()).split()  # type: ignore
+        with fitz.open(stream=output, filetype="pdf") as processed_doc:
+            actual = processed_doc.load_page(0).get_text().split()  # type: ignore
+        self.assertEqual(expected, actual)
+
+    def test_process_pdf_bytes_without_matches(self):
+        document = fitz.open()
+        document.new_page().insert_text((50, 50), "Tax Invoice")
+        with self.assertRaises(NothingToModifyException):
+            process_pdf_bytes(document.tobytes(), name="plain.pdf")
+
+    def test_process_pdf_bytes_invalid_data(self):
+        with self.assertRaises(PathNotPDFFileException):
+            process_pdf_bytes(b"", name="empty.pdf")
+
+    def test_save_profiles(self):
+        data = TEST_INPUT_DIR.joinpath("1.pdf").read_bytes()
+        fast = process_pdf_bytes(data, profile=FAST_PROFILE)
+        balanced = process_pdf_bytes(data)
+        compact = process_pdf_bytes(data, profile=COMPACT_PROFILE)
+        self.assertGreater(len(fast), len(balanced))
+        self.assertGreater(len(balanced), len(compact))
+
+        texts = set()
+        for output in (fast, balanced, compact):
+            with fitz.open(stream=output, filetype="pdf") as processed_doc:
+                texts.add(processed_doc.load_page(0).get_text())  # type: ignore
+        self.assertEqual(len(texts), 1)
+
+    def test_unknown_save_profile(self):
+        with self.assertRaises(ValueError):
+            save_modified_document(fitz.open(), "x.pdf", TEST_OUTPUT_DIR, "tiny")
+
+
+class TestPageRanges(TestCase):
+    def setUp(self):
+        document = fitz.open()
+        for number in range(20):
+            page = document.new_page()
+            page.draw_rect(fitz.Rect(20, 20, 200, 60 + number))
+            page.insert_text((50, 200), f"Credit Note: {number}/45/C")
+            page.insert_text((50, 220), f"Page {number}")
+
+        handle, self.path = tempfile.mkstemp(suffix=".pdf")
+        os.close(handle)
+        document.save(self.path)
+        document.close()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_split_page_ranges(self):
+        pages = list(range(20))
+        self.assertEqual(split_page_ranges(pages, 1), [pages])
+        self.assertEqual(split_page_ranges(pages, 4), [pages[:10], pages[10:]])
+        self.assertEqual(
+            split_page_ranges(pages, 4, min_pages=5),
+            [pages[:5], pages[5:10], pages[10:15], pages[15:]],
+        )
+        self.assertEqual(split_page_ranges([1, 2, 3], 4), [[1, 2, 3]])
+
+    def rebuild(self, engine, page_workers):
+        metrics = DocumentMetrics(self.path)
+        with record_document(metrics), open_pdf_document(self.path) as doc:
+            pages = get_pages_with_credit_notes(doc)
+            modified = replace_matches_in_pdf(
+                doc, pages, engine=engine, page_workers=page_workers
+            )
+        pages = [
+            (page.rect, page.get_text("words"), len(page.get_drawings()))
+            for page in modified
+        ]
+        modified.close()
+        return pages, metrics.counts
+
+    @parameterized.expand([(RECONSTRUCT_ENGINE,), (REDACT_ENGINE,)])
+    def test_page_ranges_match_serial_output(self, engine):
+        serial, serial_counts = self.rebuild(engine, page_workers=1)
+        parallel, parallel_counts = self.rebuild(engine, page_workers=2)
+        self.assertEqual(len(parallel), 20)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(parallel_counts, serial_counts)
+
+
+class TestLowMemory(TestCase):
+    def setUp(self):
+        document = fitz.open()
+        for number in range(20):
+            page = document.new_page()
+            page.draw_rect(fitz.Rect(20, 20, 200, 60 + number))
+            page.insert_text((50, 200), f"Credit Note: {number}/45/C")
+        self.data = document.tobytes()
+        document.close()
+
+    def test_low_memory_detection_keeps_no_text(self):
+        with open_pdf_stream(self.data) as doc:
+            pages = get_pages_with_credit_notes(doc, low_memory=True)
+            with text_cache_for(doc) as text_cache:
+                self.assertEqual(len(text_cache), 0)
+        self.assertEqual(pages, list(range(20)))
+
+    @parameterized.expand([(RECONSTRUCT_ENGINE,), (REDACT_ENGINE,), (XOBJECT_ENGINE,)])
+    def test_low_memory_matches_default_output(self, engine):
+        expected = process_pdf_bytes(self.data, engine=engine)
+        with mock.patch.object(pdf_service, "LOW_MEMORY_SPILL_INTERVAL", 8):
+            output = process_pdf_bytes(self.data, engine=engine, low_memory=True)
+
+        with open_pdf_stream(expected) as a, open_pdf_stream(output) as b:
+            self.assertEqual(len(b), 20)
+            for page_a, page_b in zip(a, b):
+                self.assertEqual(page_b.get_text("words"), page_a.get_text("words"))
+                self.assertEqual(len(page_b.get_drawings()), len(page_a.get_drawings()))
+
+
+class TestImages(TestCase):
+    def setUp(self):
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), False)
+        pixmap.clear_with(120)
+        logo = pixmap.tobytes("png")
+
+        document = fitz.open()
+        for _ in range(5):
+            page = document.new_page()
+            page.insert_image(fitz.Rect(20, 20, 100, 100), stream=logo)
+            page.insert_image(fitz.Rect(120, 20, 200, 100), stream=logo)
+            page.insert_text((50, 200), "Credit Note: 123/45/C")
+
+        handle, self.path = tempfile.mkstemp(suffix=".pdf")
+        os.close(handle)
+        document.save(self.path)
+        document.close()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_xobject_engine_keeps_graphics_and_images(self):
+        with open_pdf_document(self.path) as doc:
+            pages = get_pages_with_credit_notes(doc)
+            processed_doc = replace_matches_in_pdf(doc, pages, engine=XOBJECT_ENGINE)
+            for page in processed_doc:
+                self.assertEqual(len(page.get_image_info()), 2)
+                self.assertEqual(page.get_text().split(), ["CN"])
+
+    def test_images_embedded_once_per_document(self):
+        with open_pdf_document(self.path) as doc:
+            pages = get_pages_with_credit_notes(doc)
+            processed_doc = replace_matches_in_pdf(doc, pages)
+
+            xrefs = {image[0] for page in processed_doc for image in page.get_images()}
+            self.assertEqual(len(xrefs), 1)
+            for page in processed_doc:
+                self.assertEqual(len(page.get_image_info()), 2)
+
+    def test_decoded_images_cached_across_documents(self):
+        IMAGE_CACHE.clear()
+        for _ in range(3):
+            with open_pdf_document(self.path) as doc:
+                replace_matches_in_pdf(doc, get_pages_with_credit_notes(doc))
+        self.assertEqual(IMAGE_CACHE.misses, 1)
+        self.assertEqual(IMAGE_CACHE.hits, 2)
+
+    def test_image_cache_is_bounded(self):
+        with open_pdf_document(TEST_INPUT_DIR.joinpath("1.pdf").as_posix()) as first:
+            with open_pdf_document(self.path) as second:
+                sizes = [
+                    fitz.Pixmap(first, 11).size,
+                    fitz.Pixmap(second, 5).size,
+                ]
+                cache = ImageCache(max_bytes=max(sizes))
+                cache.get_pixmap(first, 11)
+                cache.get_pixmap(second, 5)
+                cache.get_pixmap(first, 11)
+                self.assertEqual(len(cache), 1)
+                self.assertLessEqual(cache.size, cache.max_bytes)
+                self.assertEqual((cache.hits, cache.misses), (0, 3))
+
+                cache = ImageCache(max_bytes=min(sizes) - 1)
+                cache.get_pixmap(first, 11)
+                self.assertEqual((len(cache), cache.size), (0, 0))
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from src.core.file_service import (
+    FileService,
+    ProcessingOptions,
+    process_file,
+    process_upload,
+)
+from src.core.result_cache import ResultCache
+from src.core.pdf_service import COMPACT_PROFILE, REDACT_ENGINE
+
+TEST_PATH = Path(__file__).parent
+TEST_INPUT_DIR = TEST_PATH.joinpath("in")
+
+
+class TestResultCache(TestCase):
+    def setUp(self):
+        self.cache_dir = Path(tempfile.mkdtemp())
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.result_cache = ResultCache(self.cache_dir)
+        self.options = ProcessingOptions(
+            self.output_dir, result_cache=self.result_cache
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_upload_result_is_reused(self):
+        data = TEST_INPUT_DIR.joinpath("1.pdf").read_bytes()
+        first = process_upload(data, "1.pdf", self.options)
+        self.assertIsNone(first.error)
+        output = Path(first.output).read_bytes()
+        os.remove(first.output)
+
+        second = process_upload(data, "1.pdf", self.options)
+        self.assertIsNone(second.error)
+        self.assertEqual(Path(second.output).read_bytes(), output)
+
+    def test_hit_does_not_open_document(self):
+        data = b"not a pdf, but already processed"
+        key = self.options.cache_key(ResultCache.digest_bytes(data))
+        self.result_cache.store_bytes(key, b"%PDF cached")
+
+        result = process_upload(data, "cached.pdf", self.options)
+        self.assertIsNone(result.error)
+        self.assertEqual(Path(result.output).read_bytes(), b"%PDF cached")
+
+    def test_key_depends_on_engine(self):
+        data = b"not a pdf"
+        key = self.options.cache_key(ResultCache.digest_bytes(data))
+        self.result_cache.store_bytes(key, b"%PDF cached")
+
+        options = self.options._replace(engine=REDACT_ENGINE)
+        self.assertIsNotNone(process_upload(data, "x.pdf", options).error)
+
+    def test_key_depends_on_save_profile(self):
+        options = self.options._replace(save_profile=COMPACT_PROFILE)
+        self.assertNotEqual(
+            options.cache_key("digest"), self.options.cache_key("digest")
+        )
+
+    def test_file_result_is_reused(self):
+        input_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, input_dir, ignore_errors=True)
+
+        for _ in range(2):
+            path = shutil.copy(TEST_INPUT_DIR / "2.pdf", input_dir / "2.pdf")
+            result = process_file(path, self.options)
+            self.assertIsNone(result.error)
+            self.assertFalse(os.path.exists(path))
+        self.assertEqual(len(list(self.cache_dir.iterdir())), 1)
+
+    def test_handle_bytes_uses_cache(self):
+        file_service = FileService(
+            self.output_dir, self.output_dir, result_cache=self.result_cache
+        )
+        data = TEST_INPUT_DIR.joinpath("3.pdf").read_bytes()
+        output, _ = file_service.handle_bytes(data, "3.pdf")
+        self.assertEqual(file_service.handle_bytes(data, "3.pdf"), (output, None))
+
+    def test_evict_by_age(self):
+        self.result_cache.store_bytes("old", b"x")
+        self.result_cache.store_bytes("new", b"x")
+        stale = time.time() - 31 * 24 * 60 * 60
+        os.utime(self.cache_dir / "old.pdf", (stale, stale))
+
+        self.result_cache.evict()
+        self.assertEqual(sorted(f.name for f in self.cache_dir.iterdir()), ["new.pdf"])
+
+    def test_evict_by_size_least_recently_used_first(self):
+        self.result_cache.max_bytes = 10
+        for index, key in enumerate(["a", "b", "c"]):
+            self.result_cache.store_bytes(key, b"12345")
+            used = time.time() - 100 + index
+            os.utime(self.cache_dir / f"{key}.pdf", (used, used))
+        self.result_cache.read("a")
+
+        self.result_cache.evict()
+        self.assertEqual(
+            sorted(f.name for f in self.cache_dir.iterdir()), ["a.pdf", "c.pdf"]
+        )
@@ -0,0 +1,51 @@
+import pickle
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from src.core.rules import DEFAULT_RULES, RedactionRule, RuleSet
+
+
+class TestRules(TestCase):
+    @parameterized.expand(
+        [
+            ("Credit Note: 12345/123456/12345/C", "CN"),
+            ("Ref credit note:12345/C paid", "Ref CN paid"),
+            ("Credit Note No. 4567/C", "CN"),
+            ("Credit Note Ref: A12/C", "CN"),
+            ("Credit Note Number", "Credit Note Number"),
+            ("Tax Invoice 12345", "Tax Invoice 12345"),
+        ]
+    )
+    def test_default_rules_sub(self, text, expected):
+        self.assertEqual(DEFAULT_RULES.sub(text), expected)
+
+    def test_sub_uses_replacement_of_matching_rule(self):
+        rules = RuleSet(
+            [
+                RedactionRule(r"Credit Note:\s*\d+", "CN", "credit"),
+                RedactionRule(r"Debit Note:\s*\d+", "DN", "debit"),
+            ]
+        )
+        self.assertEqual(rules.sub("Credit Note: 1, Debit Note: 2"), "CN, DN")
+        self.assertEqual(rules.findall("debit note: 7"), ["debit note: 7"])
+
+    def test_prefilter_rejects_text_without_anchor(self):
+        rules = RuleSet([RedactionRule(r"\d+", "#", "ref")])
+        self.assertFalse(rules.may_match("Invoice 123"))
+        self.assertIsNone(rules.search("Invoice 123"))
+        self.assertEqual(rules.sub("Invoice 123"), "Invoice 123")
+        self.assertEqual(rules.sub("REF 123"), "REF #")
+
+    def test_replacement_is_literal(self):
+        rules = RuleSet([RedactionRule(r"Credit Note:\s*\d+", r"\1\g<0>", "credit")])
+        self.assertEqual(rules.sub("Credit Note: 1"), r"\1\g<0>")
+
+    def test_rule_set_is_picklable(self):
+        rules = pickle.loads(pickle.dumps(DEFAULT_RULES))
+        self.assertEqual(rules, DEFAULT_RULES)
+        self.assertEqual(rules.fingerprint, DEFAULT_RULES.fingerprint)
+
+    def test_empty_rule_set(self):
+        with self.assertRaises(ValueError):
+            RuleSet([])
@@ -0,0 +1,90 @@
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest import mock
+
+import fitz
+
+from src.core import pdf_service
+from src.core.pdf_service import (
+    REDACT_ENGINE,
+    open_pdf_document,
+    open_pdf_stream,
+    process_pdf_bytes,
+)
+from src.core.template_cache import TemplateCache
+
+TEST_PATH = Path(__file__).parent
+TEST_INPUT_DIR = TEST_PATH.joinpath("in")
+
+
+def page_texts(data):
+    with open_pdf_stream(data) as document:
+        return [page.get_text() for page in document]
+
+
+class TestTemplateCache(TestCase):
+    def setUp(self):
+        self.cache_dir = Path(tempfile.mkdtemp())
+        self.path = self.cache_dir / "templates.json"
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_record_pads_regions_and_persists(self):
+        templates = TemplateCache(self.path)
+        self.assertIsNone(templates.region("a"))
+
+        templates.record("a", [fitz.Rect(100, 100, 200, 110)])
+        templates.record("a", [fitz.Rect(100, 300, 150, 310)])
+        templates.record("b", [])
+        self.assertEqual(templates.region("a"), fitz.Rect(64, 96, 236, 314))
+        self.assertIsNone(templates.region("b"))
+
+        reloaded = pickle.loads(pickle.dumps(TemplateCache(self.path)))
+        self.assertEqual(reloaded.region("a"), templates.region("a"))
+
+    def test_oldest_templates_are_forgotten(self):
+        templates = TemplateCache(self.path, max_templates=2)
+        for name in "abc":
+            templates.record(name, [fitz.Rect(0, 0, 10, 10)])
+        self.assertEqual(len(templates), 2)
+        self.assertIsNone(templates.region("a"))
+
+    def test_fingerprint_groups_pages_of_a_template(self):
+        fingerprints = {}
+        for name in ("1.pdf", "3.pdf", "4.pdf"):
+            with open_pdf_document(str(TEST_INPUT_DIR / name)) as document:
+                fingerprints[name] = TemplateCache.fingerprint(document[0])
+        self.assertEqual(fingerprints["3.pdf"], fingerprints["4.pdf"])
+        self.assertNotEqual(fingerprints["1.pdf"], fingerprints["3.pdf"])
+
+    def test_redact_engine_extracts_known_regions(self):
+        templates = TemplateCache(self.path)
+        learned = TEST_INPUT_DIR.joinpath("3.pdf").read_bytes()
+        process_pdf_bytes(learned, engine=REDACT_ENGINE, templates=templates)
+        self.assertEqual(len(templates), 1)
+
+        data = TEST_INPUT_DIR.joinpath("4.pdf").read_bytes()
+        expected = page_texts(process_pdf_bytes(data, engine=REDACT_ENGINE))
+        find_matches_on_page = pdf_service._find_matches_on_page
+        with mock.patch.object(
+            pdf_service, "_find_matches_on_page", wraps=find_matches_on_page
+        ) as find:
+            output = process_pdf_bytes(data, engine=REDACT_ENGINE, templates=templates)
+        self.assertEqual(page_texts(output), expected)
+        self.assertEqual(find.call_count, 1)  # the clipped region was enough
+
+    def test_redact_engine_falls_back_to_whole_page(self):
+        templates = TemplateCache(self.path)
+        data = TEST_INPUT_DIR.joinpath("3.pdf").read_bytes()
+        with open_pdf_stream(data) as document:
+            fingerprint = TemplateCache.fingerprint(document[0])
+        templates.record(fingerprint, [fitz.Rect(0, 0, 10, 10)])
+
+        expected = page_texts(process_pdf_bytes(data, engine=REDACT_ENGINE))
+        output = process_pdf_bytes(data, engine=REDACT_ENGINE, templates=templates)
+        self.assertEqual(page_texts(output), expected)
+        self.assertNotEqual(templates.region(fingerprint), fitz.Rect(-36, -4, 46, 14))
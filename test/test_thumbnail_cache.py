@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from threading import Thread
+from unittest import TestCase
+
+import fitz
+
+from src.core.file_service import FileService, get_shard_dir
+from src.core.pdf_service import FITZ_LOCK
+from src.core.thumbnail_cache import ThumbnailCache
+
+TEST_PATH = Path(__file__).parent
+TEST_INPUT_DIR = TEST_PATH.joinpath("in")
+
+
+class TestThumbnailCache(TestCase):
+    def setUp(self):
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.cache_dir = Path(tempfile.mkdtemp())
+        self.thumbnails = ThumbnailCache(self.cache_dir, self.output_dir, width=80)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def write_output(self, name, days_ago=0):
+        date = datetime.now() - timedelta(days=days_ago)
+        path = get_shard_dir(self.output_dir, date).joinpath(name)
+        shutil.copy(TEST_INPUT_DIR / "1.pdf", path)
+        return path
+
+    def test_get_renders_first_page_once(self):
+        pdf = self.write_output("1.pdf")
+        thumbnail = self.thumbnails.get(pdf)
+
+        self.assertEqual(
+            thumbnail,
+            self.cache_dir.joinpath(pdf.parent.name, "1.png"),
+        )
+        self.assertEqual(fitz.Pixmap(str(thumbnail)).width, 80)
+        rendered = thumbnail.stat().st_mtime_ns
+        self.assertEqual(self.thumbnails.get(pdf), thumbnail)
+        self.assertEqual(thumbnail.read_bytes()[:4], b"\x89PNG")
+        self.assertGreaterEqual(thumbnail.stat().st_mtime_ns, rendered)
+
+    def test_get_renders_again_when_file_is_newer(self):
+        pdf = self.write_output("1.pdf")
+        thumbnail = self.thumbnails.get(pdf)
+        stale = time.time() - 60
+        os.utime(thumbnail, (stale, stale))
+
+        shutil.copy(TEST_INPUT_DIR / "2.pdf", pdf)
+        self.assertEqual(self.thumbnails.get(pdf), thumbnail)
+        self.assertGreater(thumbnail.stat().st_mtime, stale)
+
+    def test_get_waits_for_documents_being_processed(self):
+        pdf = self.write_output("1.pdf")
+        thumbnails = []
+        with FITZ_LOCK:
+            thread = Thread(target=lambda: thumbnails.append(self.thumbnails.get(pdf)))
+            thread.start()
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+        thread.join()
+        self.assertEqual(
+            thumbnails, [self.cache_dir.joinpath(pdf.parent.name, "1.png")]
+        )
+
+    def test_get_invalid_pdf(self):
+        pdf = get_shard_dir(self.output_dir, datetime.now()).joinpath("bad.pdf")
+        pdf.write_bytes(b"not a pdf")
+        with self.assertLogs("fiscalpdf.thumbnails", "ERROR"):
+            self.assertIsNone(self.thumbnails.get(pdf))
+
+    def test_remove(self):
+        first, second = self.write_output("1.pdf"), self.write_output("2.pdf", 1)
+        self.thumbnails.get(first)
+        other = self.thumbnails.get(second)
+
+        self.thumbnails.remove(first)
+        self.thumbnails.remove(first)  # already removed
+        self.thumbnails.remove_shard(second.parent)
+        self.assertEqual(list(self.cache_dir.rglob("*.png")), [])
+        self.assertFalse(other.parent.exists())
+
+    def test_evict_removes_orphans_then_least_recently_used(self):
+        pdfs = [self.write_output(f"{i}.pdf") for i in range(3)]
+        thumbnails = [self.thumbnails.get(pdf) for pdf in pdfs]
+        for age, thumbnail in zip((30, 20, 10), thumbnails):
+            used = time.time() - age
+            os.utime(thumbnail, (used, used))
+
+        os.remove(pdfs[2])
+        self.thumbnails.max_bytes = thumbnails[1].stat().st_size
+        self.thumbnails.evict()
+        self.assertEqual(list(self.cache_dir.rglob("*.png")), [thumbnails[1]])
+
+
+class TestFileServiceThumbnails(TestCase):
+    def setUp(self):
+        self.input_dir = Path(tempfile.mkdtemp())
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.cache_dir = Path(tempfile.mkdtemp())
+        self.file_service = FileService(
+            self.input_dir,
+            self.output_dir,
+            retention_days=7,
+            thumbnail_cache=ThumbnailCache(self.cache_dir, self.output_dir),
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.input_dir, ignore_errors=True)
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_get_thumbnail_missing_file(self):
+        self.assertIsNone(
+            self.file_service.get_thumbnail(self.output_dir.joinpath("missing.pdf"))
+        )
+        without_cache = FileService(self.input_dir, self.output_dir)
+        pdf = self.output_dir.joinpath("1.pdf")
+        shutil.copy(TEST_INPUT_DIR / "1.pdf", pdf)
+        self.assertIsNone(without_cache.get_thumbnail(pdf))
+
+    def test_delete_and_expiry_remove_thumbnails(self):
+        date = datetime.now() - timedelta(days=8)
+        expired = get_shard_dir(self.output_dir, date).joinpath("old.pdf")
+        deleted = get_shard_dir(self.output_dir, datetime.now()).joinpath("new.pdf")
+        for pdf in (expired, deleted):
+            shutil.copy(TEST_INPUT_DIR / "1.pdf", pdf)
+            self.assertIsNotNone(self.file_service.get_thumbnail(pdf))
+
+        self.file_service.handle_delete(deleted)
+        self.file_service.handle_old_files()
+        self.assertEqual(list(self.cache_dir.rglob("*.png")), [])